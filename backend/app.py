@@ -4,13 +4,21 @@ from flask import Flask
 from flask_cors import CORS
 from config import Config
 from routes.summarize_route import summarize_bp
+from routes.jobs_route import jobs_bp
+from routes.metrics_route import metrics_bp
+from routes.health_route import health_bp
 
 # Initialize the Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
+# Larger bodies get 413 from the Content-Length header, before anything is read or parsed
+app.config["MAX_CONTENT_LENGTH"] = Config.MAX_UPLOAD_BYTES
 
-# Register the summarize route
+# Register the summarize, background job, metrics and health routes
 app.register_blueprint(summarize_bp)
+app.register_blueprint(jobs_bp)
+app.register_blueprint(metrics_bp)
+app.register_blueprint(health_bp)
 
 if __name__ == '__main__':
     app.run(host=Config.HOST, port=Config.PORT, debug=Config.DEBUG)
\ No newline at end of file
@@ -0,0 +1,294 @@
+# batch_runner.py
+"""
+Offline corpus summarization without the HTTP layer.
+
+Reads a directory (*.txt, *.xml / *.tei.xml from GROBID, *.pdf through GROBID) or a JSONL file
+of {"id", "text"} or {"id", "tei"} records, and writes one JSONL line per document:
+    {"id", "summary" or "section_summaries", "citations", "entities", "chars", "batch_seconds"}
+or {"id", "error"} when a document fails.
+
+Documents are sorted by length and handed out in batches of similar length, so a batched
+generate call pads little. Worker processes load the models once and each get their share of
+the cores. Results are appended to the output as they finish; with --resume, documents already
+in the output are skipped (failed ones are retried), so an interrupted run picks up where it stopped.
+
+Usage (from backend/):
+    python batch_runner.py papers/ --output summaries.jsonl --workers 4
+    python batch_runner.py corpus.jsonl --output sections.jsonl --mode sectional --resume
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+TEXT_SUFFIXES = (".txt",)
+TEI_SUFFIXES = (".tei.xml", ".xml")
+PDF_SUFFIXES = (".pdf",)
+
+# Set in worker processes by _init_worker
+_worker = None
+
+
+# --- Inputs ---
+
+def scan_inputs(path):
+    """
+    Lists the documents without reading them into memory.
+
+    :return: List of (doc_id, source, size) where source is ("file", path) or ("jsonl", path, offset)
+    """
+    documents = []
+    if os.path.isdir(path):
+        for root, _, filenames in os.walk(path):
+            for filename in sorted(filenames):
+                lowered = filename.lower()
+                if not lowered.endswith(TEXT_SUFFIXES + TEI_SUFFIXES + PDF_SUFFIXES):
+                    continue
+                full_path = os.path.join(root, filename)
+                doc_id = os.path.relpath(full_path, path)
+                documents.append((doc_id, ("file", full_path), os.path.getsize(full_path)))
+        return documents
+
+    with open(path, "rb") as f:
+        offset = 0
+        for line_number, line in enumerate(f, start=1):
+            if line.strip():
+                record_id = json.loads(line).get("id")
+                doc_id = str(record_id) if record_id is not None else str(line_number)
+                documents.append((doc_id, ("jsonl", path, offset), len(line)))
+            offset += len(line)
+    return documents
+
+
+def load_text(source):
+    """
+    Reads one document and returns (plain text, headings); headings are the (start offset, title)
+    pairs of a PDF's or TEI document's sections, None for plain text.
+    """
+    from utils.file_parser import PDFParser
+
+    if source[0] == "jsonl":
+        _, path, offset = source
+        with open(path, "rb") as f:
+            f.seek(offset)
+            record = json.loads(f.readline())
+        if record.get("text"):
+            return record["text"], None
+        if record.get("tei"):
+            return PDFParser.sections_to_clean_text(PDFParser.parse_tei_sections(record["tei"]))
+        raise ValueError("Record has neither 'text' nor 'tei'.")
+
+    path = source[1]
+    lowered = path.lower()
+    with open(path, "rb") as f:
+        data = f.read()
+    if lowered.endswith(PDF_SUFFIXES):
+        return PDFParser.extract_document_from_bytes(os.path.basename(path), data)
+    if lowered.endswith(TEI_SUFFIXES):
+        return PDFParser.sections_to_clean_text(PDFParser.parse_tei_sections(data))
+    return data.decode("utf-8", errors="replace"), None
+
+
+def completed_ids(output_path):
+    """Ids of documents already written successfully to the output. Drops a torn last line."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "rb+") as f:
+        valid_end = 0
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            valid_end += len(line)
+            if "error" not in record:
+                done.add(record["id"])
+        f.truncate(valid_end)
+    return done
+
+
+def make_batches(documents, batch_size):
+    """Sorts by size so each batch holds documents of similar length, longest first."""
+    ordered = sorted(documents, key=lambda document: document[2], reverse=True)
+    return [ordered[start:start + batch_size] for start in range(0, len(ordered), batch_size)]
+
+
+# --- Worker ---
+
+class Worker:
+    """The models of one worker process, loaded once."""
+
+    def __init__(self, mode, model_name, profile, entities, threads):
+        import torch
+        from config import Config
+
+        torch.set_num_threads(threads)
+        # Batches come whole from the runner; the micro-batcher would only add its wait
+        Config.BATCHING_ENABLED = False
+        self.mode = mode
+        self.profile = profile
+        if mode == "sectional":
+            from models.sectionsum import load_local_summarizer
+            self.summarizer = load_local_summarizer()
+        else:
+            from models.summarizer import TextSummarizer
+            self.summarizer = TextSummarizer(Config.MODEL_PATHS[model_name], name=model_name)
+        self.ner = None
+        if entities:
+            from models.NERProcessor import NERProcessor
+            self.ner = NERProcessor(Config.NER_PATH)
+
+    def run(self, batch):
+        from models.sectionsum import generate_section_summaries
+        from utils.citation_analyzer import analyze_citations
+
+        started = time.perf_counter()
+        results, texts = [], []
+        for doc_id, source, _ in batch:
+            try:
+                text, headings = load_text(source)
+                if not text.strip():
+                    raise ValueError("no text")
+                citations, stripped_text = analyze_citations(text, sections=headings, return_stripped_text=True)
+                results.append({"id": doc_id, "citations": citations, "chars": len(text)})
+                texts.append(stripped_text.strip())
+            except Exception as e:
+                results.append({"id": doc_id, "error": f"Failed to read document: {e}"})
+                texts.append(None)
+
+        pending = [i for i, text in enumerate(texts) if text]
+        if self.mode == "summary" and pending:
+            try:
+                summaries = self.summarizer.summarize_batch([texts[i] for i in pending], profile=self.profile)
+                for i, summary in zip(pending, summaries):
+                    results[i]["summary"] = summary
+            except Exception as e:
+                for i in pending:
+                    results[i]["error"] = f"Summarization failed: {e}"
+
+        for i, text in enumerate(texts):
+            result = results[i]
+            if not text or "error" in result:
+                continue
+            try:
+                if self.mode == "sectional":
+                    result["section_summaries"] = generate_section_summaries(text, self.summarizer, profile=self.profile)
+                if self.ner is not None:
+                    result["entities"] = self.ner.extract_entities(text)
+            except Exception as e:
+                result["error"] = str(e)
+
+        elapsed = round(time.perf_counter() - started, 3)
+        for result in results:
+            result["batch_seconds"] = elapsed
+        return results
+
+
+def _init_worker(*args):
+    global _worker
+    logging.basicConfig(level=logging.WARNING)
+    _worker = Worker(*args)
+
+
+def _run_batch(batch):
+    return _worker.run(batch)
+
+
+# --- Runner ---
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="directory of documents or a JSONL file")
+    parser.add_argument("--output", required=True, help="JSONL file the results are appended to")
+    parser.add_argument("--mode", choices=("summary", "sectional"), default="summary")
+    parser.add_argument("--model", default="Computer Science", help="domain model for --mode summary")
+    parser.add_argument("--profile", default=None, help="decoding profile (default: DECODING_PROFILE)")
+    parser.add_argument("--no-entities", action="store_true", help="skip NER")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) // 2))
+    parser.add_argument("--batch-size", type=int, default=8, help="documents per task")
+    parser.add_argument("--resume", action="store_true", help="skip documents already in the output")
+    parser.add_argument("--report-every", type=float, default=30, help="seconds between progress lines")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # Fast tokenizers start their own thread pool; the workers already split the cores
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+    from config import Config
+    from models.decoding import resolve_profile
+
+    if args.mode == "summary" and args.model not in Config.MODEL_PATHS:
+        parser.error(f"Unknown model '{args.model}'.")
+    try:
+        profile, _ = resolve_profile(args.profile)
+    except ValueError as e:
+        parser.error(str(e))
+
+    documents = scan_inputs(args.input)
+    total = len(documents)
+    if args.resume:
+        done = completed_ids(args.output)
+        documents = [document for document in documents if document[0] not in done]
+        logging.info(f"Resuming: {total - len(documents)} of {total} documents already done")
+    elif os.path.exists(args.output) and os.path.getsize(args.output):
+        parser.error(f"{args.output} exists; pass --resume to continue it or remove it.")
+    if not documents:
+        logging.info("Nothing to do")
+        return
+
+    batches = make_batches(documents, args.batch_size)
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+    logging.info(f"{len(documents)} documents in {len(batches)} batches on {args.workers} workers x {threads} threads")
+
+    started = time.perf_counter()
+    last_report = started
+    finished = failed = 0
+    with open(args.output, "a", encoding="utf-8") as output, ProcessPoolExecutor(
+        max_workers=args.workers,
+        # Spawned, not forked, so no torch state of this process leaks into the workers
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(args.mode, args.model, profile, not args.no_entities, threads),
+    ) as pool:
+        queue = iter(batches)
+        running = set()
+        # A few batches in flight per worker keep them busy without queueing the whole corpus
+        for batch in queue:
+            running.add(pool.submit(_run_batch, batch))
+            if len(running) >= args.workers * 2:
+                break
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                for result in future.result():
+                    output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    finished += 1
+                    failed += "error" in result
+                output.flush()
+                next_batch = next(queue, None)
+                if next_batch is not None:
+                    running.add(pool.submit(_run_batch, next_batch))
+
+            now = time.perf_counter()
+            if now - last_report >= args.report_every or not running:
+                rate = finished / (now - started) * 60
+                remaining = (len(documents) - finished) / rate if rate else float("inf")
+                logging.info(
+                    f"{finished}/{len(documents)} documents ({failed} failed), "
+                    f"{rate:.1f} docs/min, ~{remaining:.0f} min left"
+                )
+                last_report = now
+
+    elapsed = time.perf_counter() - started
+    logging.info(f"Done: {finished} documents in {elapsed:.0f}s ({finished / elapsed * 60:.1f} docs/min)")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compares the single-pass citation scan with the previous implementation
+(uncompiled regexes, deduplicated matches, plus a separate preprocess_text pass).
+
+Reports time and throughput per document size, so linear scaling is visible as a
+constant MB/s, and checks that unclosed brackets don't blow up.
+
+Usage (from backend/):
+    python -m benchmarks.bench_citations --sizes 100000 1000000 4000000
+"""
+import argparse
+import json
+import re
+import time
+from collections import Counter
+
+from benchmarks.synthetic import make_document
+from utils.citation_analyzer import analyze_citations
+
+
+def legacy_analyze(text):
+    """The previous extraction + counting + preprocess_text, without logging."""
+    numeric_refs = re.findall(r'\[(?:\d+[–\-,;\s]*)+\]', text)
+    author_refs = re.findall(r'\b[A-Z][a-z]+(?:\s(?:et al\.|and\s[A-Z][a-z]+))?\s*\(\d{4}\)', text)
+    numeric_refs = list(set(ref.strip() for ref in numeric_refs))
+    author_refs = list(set(author.strip() for author in author_refs))
+    counts = (Counter(numeric_refs), Counter(author_refs))
+    stripped = re.sub(r'\[\d+[,\s–\-]*\d*\]', '', text).strip()
+    return counts, stripped
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 4_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        text = make_document(size, seed=size)
+        new_s = best_of(lambda: analyze_citations(text, return_stripped_text=True), args.repeat)
+        old_s = best_of(lambda: legacy_analyze(text), args.repeat)
+        analysis, _ = analyze_citations(text, return_stripped_text=True)
+        results.append({
+            "bytes": len(text),
+            "single_pass_ms": round(new_s * 1000, 1),
+            "single_pass_mb_per_s": round(len(text) / new_s / 1e6, 1),
+            "legacy_ms": round(old_s * 1000, 1),
+            "legacy_mb_per_s": round(len(text) / old_s / 1e6, 1),
+            "reference_ids": analysis["total_references"],
+            "max_reference_frequency": max((r["Frequency"] for r in analysis["references"]), default=0),
+        })
+
+    # Pathological input: a long run of digits after an unclosed bracket
+    hostile = "[" + "1" * 5000
+    hostile_s = best_of(lambda: analyze_citations(hostile, return_stripped_text=True), 1)
+
+    print(json.dumps({"documents": results, "unclosed_bracket_ms": round(hostile_s * 1000, 2)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Insert and lookup throughput of HistoryDB on a large history table.
+
+Compares the original access pattern (a new connection per call, rollback journal,
+no index) with the current HistoryDB (reused connections, WAL, (ip_address, timestamp)
+index) and its write-behind mode.
+
+Usage (from backend/):
+    python -m benchmarks.bench_history_db --rows 1000000 --inserts 2000 --lookups 200
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from database.history_db import HistoryDB, _store_document, register_functions
+
+LEGACY_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ip_address TEXT NOT NULL,
+        original_text TEXT NOT NULL,
+        summary TEXT NOT NULL,
+        citations TEXT,
+        entities TEXT,
+        section_summaries TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+class LegacyHistoryDB:
+    """The access pattern HistoryDB had before: one connection per call, default journal, no index."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(LEGACY_SCHEMA)
+
+    def save_summary(self, ip_address, original_text, summary, citations=None, entities=None, section_summaries=None):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                INSERT INTO history (ip_address, original_text, summary, citations, entities, section_summaries, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (ip_address, original_text, summary, citations, entities, section_summaries, datetime.now()))
+            conn.commit()
+
+    def get_history_by_ip(self, ip_address):
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute("""
+                SELECT id, original_text, summary, citations, entities, section_summaries, timestamp
+                FROM history WHERE ip_address = ? ORDER BY timestamp DESC
+            """, (ip_address,)).fetchall()
+
+
+def random_ip(rng, n_ips):
+    i = rng.randrange(n_ips)
+    return f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+
+
+def populate(db_path, rows, n_ips, legacy=False, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    text = "lorem ipsum dolor sit amet " * 8
+    with sqlite3.connect(db_path) as conn:
+        if legacy:
+            insert = """
+                INSERT INTO history (ip_address, original_text, summary, citations, entities, section_summaries, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """
+            body = text
+        else:
+            # Current schema: texts live deduplicated in 'documents'
+            insert = """
+                INSERT INTO history (ip_address, document_id, summary, citations, entities, section_summaries, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """
+            body = _store_document(conn, text)
+            register_functions(conn)  # the full-text index triggers call them
+        batch = []
+        for i in range(rows):
+            batch.append((random_ip(rng, n_ips), body, "summary", "{}", "[]", None, start + timedelta(seconds=i)))
+            if len(batch) == 50000:
+                conn.executemany(insert, batch)
+                batch = []
+        if batch:
+            conn.executemany(insert, batch)
+        conn.commit()
+
+
+def bench_inserts(db, count, n_ips, flush=None):
+    rng = random.Random(1)
+    started = time.perf_counter()
+    for _ in range(count):
+        db.save_summary(random_ip(rng, n_ips), "new paper text " * 20, "new summary", "{}", "[]")
+    if flush:
+        flush()
+    return count / (time.perf_counter() - started)
+
+
+def bench_lookups(db, count, n_ips):
+    rng = random.Random(2)
+    started = time.perf_counter()
+    for _ in range(count):
+        db.get_history_by_ip(random_ip(rng, n_ips))
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows in the history table")
+    parser.add_argument("--ips", type=int, default=20_000, help="distinct client IPs")
+    parser.add_argument("--inserts", type=int, default=2000)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--dir", default=None, help="directory for the database files (default: a temp dir)")
+    args = parser.parse_args()
+
+    workdir = args.dir or tempfile.mkdtemp(prefix="bench_history_")
+    results = {"rows": args.rows, "ips": args.ips}
+
+    legacy_path = os.path.join(workdir, "legacy.db")
+    legacy = LegacyHistoryDB(legacy_path)
+    populate(legacy_path, args.rows, args.ips, legacy=True)
+    results["legacy"] = {
+        "inserts_per_s": round(bench_inserts(legacy, args.inserts, args.ips), 1),
+        "lookups_per_s": round(bench_lookups(legacy, args.lookups, args.ips), 1),
+    }
+
+    current_path = os.path.join(workdir, "current.db")
+    HistoryDB(current_path)  # create the schema before the bulk load
+    populate(current_path, args.rows, args.ips)
+    current = HistoryDB(current_path)
+    results["current"] = {
+        "inserts_per_s": round(bench_inserts(current, args.inserts, args.ips), 1),
+        "lookups_per_s": round(bench_lookups(current, args.lookups, args.ips), 1),
+    }
+
+    write_behind = HistoryDB(current_path, write_behind=True)
+    results["current_write_behind"] = {
+        "inserts_per_s": round(bench_inserts(write_behind, args.inserts, args.ips, flush=write_behind.flush), 1),
+    }
+    write_behind.close()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
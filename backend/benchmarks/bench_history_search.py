@@ -0,0 +1,156 @@
+"""
+Full-text search latency over a large history table.
+
+Fills a throwaway HistoryDB with --rows history rows spread over --ips client IPs, plus one
+heavy client owning --heavy-share of the rows. Texts and summaries are drawn from a synthetic
+Zipf-distributed vocabulary, so common words match most rows and rare ones a handful, as in
+real text. The full-text index is kept up by its insert trigger during the load, as in production.
+
+Queries are run through HistoryDB.search_history (first page, BM25 order, snippets) for:
+
+    rare      a word from one of the caller's own rows
+    common    one of the ten most frequent words; matches nearly every row of the caller
+    two_words a common and a rarer word
+    miss      a word that isn't in the vocabulary
+    heavy     a common word for the heavy client
+
+Usage (from backend/):
+    python -m benchmarks.bench_history_search --rows 1000000 --queries 300
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.bench_history_db import random_ip
+from benchmarks.suite import percentile
+from database.history_db import SEARCH_SHARDS, HistoryDB, _store_document, register_functions
+
+HEAVY_IP = "10.255.255.255"
+
+
+def make_vocabulary(size, rng):
+    syllables = ["ka", "lo", "mi", "ne", "ru", "ta", "vo", "si", "de", "po", "gri", "tho", "bel", "mor", "xan", "qui"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    words = sorted(words)
+    rng.shuffle(words)
+    cumulative = list(itertools.accumulate(1 / rank for rank in range(1, size + 1)))
+    return words, cumulative
+
+
+def populate(db_path, rows, n_ips, heavy_share, documents, words_per_text, vocabulary, seed=0):
+    words, cumulative = vocabulary
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+
+    def text(n):
+        return " ".join(rng.choices(words, cum_weights=cumulative, k=n))
+
+    started = time.perf_counter()
+    with sqlite3.connect(db_path) as conn:
+        register_functions(conn)  # the full-text index triggers call them
+        document_ids = [_store_document(conn, text(words_per_text)) for _ in range(documents)]
+        batch = []
+        for i in range(rows):
+            ip = HEAVY_IP if rng.random() < heavy_share else random_ip(rng, n_ips)
+            entities = json.dumps([{"term": term} for term in text(3).split()])
+            batch.append((ip, rng.choice(document_ids), text(30), None, entities, None, start + timedelta(seconds=i)))
+            if len(batch) == 20000:
+                conn.executemany("""
+                    INSERT INTO history (ip_address, document_id, summary, citations, entities, section_summaries, timestamp)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, batch)
+                conn.commit()
+                batch = []
+                print(f"  {i + 1} rows, {time.perf_counter() - started:.0f}s", file=sys.stderr)
+        if batch:
+            conn.executemany("""
+                INSERT INTO history (ip_address, document_id, summary, citations, entities, section_summaries, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, batch)
+        conn.commit()
+        # A freshly loaded index has many small segments; production indexes merge them over time
+        for shard in range(SEARCH_SHARDS):
+            conn.execute(f"INSERT INTO history_fts_{shard} (history_fts_{shard}) VALUES ('optimize')")
+        conn.commit()
+    return time.perf_counter() - started
+
+
+def make_queries(db_path, count, n_ips, vocabulary, seed=1):
+    words, _ = vocabulary
+    rng = random.Random(seed)
+    queries = {kind: [] for kind in ("rare", "common", "two_words", "miss", "heavy")}
+    with sqlite3.connect(db_path) as conn:
+        while len(queries["rare"]) < count:
+            ip = random_ip(rng, n_ips)
+            row = conn.execute(
+                "SELECT summary FROM history WHERE ip_address = ? ORDER BY random() LIMIT 1", (ip,)
+            ).fetchone()
+            if row is None:
+                continue
+            summary_words = row[0].split()
+            queries["rare"].append((ip, min(summary_words, key=words.index)))
+            queries["common"].append((ip, rng.choice(words[:10])))
+            queries["two_words"].append((ip, f"{rng.choice(words[:10])} {rng.choice(words[50:500])}"))
+            queries["miss"].append((ip, "zzyzx"))
+            queries["heavy"].append((HEAVY_IP, rng.choice(words[:10])))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows in the history table")
+    parser.add_argument("--ips", type=int, default=20_000, help="distinct client IPs")
+    parser.add_argument("--heavy-share", type=float, default=0.01, help="share of the rows owned by one client")
+    parser.add_argument("--documents", type=int, default=50_000, help="distinct original texts")
+    parser.add_argument("--words", type=int, default=150, help="words per original text")
+    parser.add_argument("--vocabulary", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=300, help="queries per kind")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--dir", default=None, help="directory for the database file (default: a temp dir)")
+    args = parser.parse_args()
+
+    workdir = args.dir or tempfile.mkdtemp(prefix="bench_history_search_")
+    db_path = os.path.join(workdir, "history.db")
+    vocabulary = make_vocabulary(args.vocabulary, random.Random(0))
+
+    HistoryDB(db_path)  # create the schema before the bulk load
+    print("Loading:", file=sys.stderr)
+    load_seconds = populate(db_path, args.rows, args.ips, args.heavy_share, args.documents, args.words, vocabulary)
+    db = HistoryDB(db_path)
+    results = {
+        "rows": args.rows,
+        "ips": args.ips,
+        "load_seconds": round(load_seconds, 1),
+        "db_mb": round(os.path.getsize(db_path) / 2**20, 1),
+    }
+
+    for kind, queries in make_queries(db_path, args.queries, args.ips, vocabulary).items():
+        db.search_history(*queries[0], limit=args.page_size)  # warm the connection
+        latencies, hits = [], 0
+        for ip, query in queries:
+            started = time.perf_counter()
+            page, _ = db.search_history(ip, query, limit=args.page_size)
+            latencies.append((time.perf_counter() - started) * 1000)
+            hits += len(page)
+        results[kind] = {
+            "p50_ms": round(statistics.median(latencies), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "mean_results": round(hits / len(queries), 1),
+        }
+        print(f"  {kind}: {results[kind]}", file=sys.stderr)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
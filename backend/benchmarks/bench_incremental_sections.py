@@ -0,0 +1,91 @@
+"""
+Resubmitting an edited document to the sectional pipeline: full recompute vs chunk reuse.
+
+Each synthetic document is summarized once (cold), then again after --edit of its sentences
+were rewritten, as a user fixing typos or a paragraph would. Both go through process_text
+(citations, sectional summary and NER) with the result cache on, in two modes:
+
+    tokens   fixed token windows (SECTION_INCREMENTAL=0): any edit shifts the windows after it,
+             so the resubmission misses the cache and is recomputed whole
+    content  content-defined chunks (SECTION_INCREMENTAL=1): only the chunks holding an edit
+             go through the models, the rest come from the per-chunk store
+
+Near-duplicate reuse is off, so the tokens mode recomputes instead of returning the stale
+result of the original. Without --models-dir the tiny offline models are used, which makes
+the speedup a lower bound: real models spend more of the time in the chunks that are skipped.
+
+Usage (from backend/):
+    python -m benchmarks.bench_incremental_sections --documents 5 --size 40000 --edit 0.01
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_near_duplicates import rewrite_sentences
+from benchmarks.suite import configure_environment
+from benchmarks.synthetic import make_document
+from benchmarks.tiny_models import build_model_tree
+
+
+def run_mode(mode, documents, share):
+    from config import Config
+    from models.sectionsum import SECTION_MODEL_NAME
+    from routes.summarize_route import process_text, result_cache
+
+    Config.SECTION_INCREMENTAL = mode == "content"
+    result_cache.clear()
+    rng = random.Random(1)
+    cold, resubmit, reused, chunks = [], [], [], []
+    for text in documents:
+        edited = rewrite_sentences(text, share, rng)
+        for latencies, document in ((cold, text), (resubmit, edited)):
+            started = time.perf_counter()
+            result = process_text(document, SECTION_MODEL_NAME, sectional=True)
+            latencies.append((time.perf_counter() - started) * 1000)
+        stats = result["chunk_stats"] or {}
+        chunks.append(stats.get("chunks", 0))
+        reused.append(stats.get("chunks_reused", 0))
+
+    return {
+        "cold_p50_ms": round(statistics.median(cold), 1),
+        "resubmit_p50_ms": round(statistics.median(resubmit), 1),
+        "speedup": round(statistics.median(cold) / statistics.median(resubmit), 2),
+        "chunks": round(statistics.mean(chunks), 1),
+        "chunks_reused": round(statistics.mean(reused), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=5)
+    parser.add_argument("--size", type=int, default=40_000, help="document size in bytes")
+    parser.add_argument("--edit", type=float, default=0.01, help="share of the sentences rewritten")
+    parser.add_argument("--models-dir", default=None, help="model base path (default: build tiny models)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_incremental_")
+    if args.models_dir is None:
+        args.models_dir = build_model_tree(os.path.join(workdir, "model"))
+    configure_environment(workdir, args.models_dir)
+    os.environ["CACHE_ENABLED"] = "1"  # chunk reuse works through the cache
+    os.environ["NEAR_DUPLICATE_ENABLED"] = "0"
+    os.environ["BATCHING_ENABLED"] = "0"
+
+    documents = [make_document(args.size, seed=i) for i in range(args.documents)]
+    results = {"documents": args.documents, "size": args.size, "edit": args.edit}
+    for mode in ("tokens", "content"):
+        results[mode] = run_mode(mode, documents, args.edit)
+        print(f"  {mode}: {results[mode]}", file=sys.stderr)
+    results["resubmit_speedup_vs_tokens"] = round(
+        results["tokens"]["resubmit_p50_ms"] / results["content"]["resubmit_p50_ms"], 2
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
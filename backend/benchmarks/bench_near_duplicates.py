@@ -0,0 +1,202 @@
+"""
+Near-duplicate index: detection accuracy on synthetic perturbations and lookup latency at scale.
+
+Accuracy: --documents synthetic papers are stored in a throwaway HistoryDB, then perturbed
+copies are looked up. A perturbed copy must be found as its original (otherwise it is a false
+negative); unrelated documents must find nothing (otherwise a false positive). The mean exact
+Jaccard similarity of each perturbation is reported next to its rates, for picking
+NEAR_DUPLICATE_THRESHOLD.
+
+    whitespace  re-wrapped lines, doubled spaces, as after clean_pdf_text
+    grobid      headings dropped, citations stripped, hyphenated line breaks, as GROBID vs pasted text
+    revision    ~5% of the sentences rewritten and a paragraph appended, as arXiv v1 vs v2
+    rewrite     ~40% of the sentences rewritten; a different paper as far as reuse goes, so a match counts as false positive
+    unrelated   another document of the same synthetic vocabulary; any match is a false positive
+
+Latency: the index is filled with --index-size random signatures (no documents, only the
+fingerprint tables) and lookups of precomputed signatures are timed, hits and misses alike.
+
+Usage (from backend/):
+    python -m benchmarks.bench_near_duplicates --documents 300 --index-size 1000000
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.suite import percentile
+from benchmarks.synthetic import make_document, sentence
+
+POSITIVE = ("whitespace", "grobid", "revision")
+NEGATIVE = ("rewrite", "unrelated")
+
+
+def rewrite_sentences(text, share, rng):
+    sentences = re.split(r"(?<=\.) ", text)
+    for i in range(len(sentences)):
+        if rng.random() < share:
+            sentences[i] = sentence(rng)
+    return " ".join(sentences)
+
+
+def perturb(text, kind, rng, seed):
+    if kind == "whitespace":
+        words = text.split()
+        lines, line = [], []
+        for word in words:
+            line.append(word)
+            if sum(len(w) + 1 for w in line) > rng.randint(60, 90):
+                lines.append("  ".join(line) if rng.random() < 0.3 else " ".join(line))
+                line = []
+        lines.append(" ".join(line))
+        return "\n".join(lines)
+    if kind == "grobid":
+        from utils.citation_analyzer import analyze_citations
+        _, stripped = analyze_citations(text, return_stripped_text=True)
+        lines = [line for line in stripped.splitlines() if not line.isupper()]
+        text = "\n".join(lines)
+        return re.sub(r"(\w{4})(\w{4,}) ", lambda m: f"{m.group(1)}-\n{m.group(2)} " if rng.random() < 0.02 else m.group(0), text)
+    if kind == "revision":
+        extra = " ".join(sentence(rng) for _ in range(6))
+        return rewrite_sentences(text, 0.05, rng) + "\n" + extra
+    if kind == "rewrite":
+        return rewrite_sentences(text, 0.4, rng)
+    return make_document(len(text), seed=seed)
+
+
+def exact_jaccard(a, b):
+    from utils.fingerprint import shingle_hashes
+    a, b = shingle_hashes(a), shingle_hashes(b)
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def bench_accuracy(workdir, documents, size, threshold):
+    from database.history_db import HistoryDB, content_hash
+
+    db = HistoryDB(os.path.join(workdir, "accuracy.db"))
+    originals = [make_document(size, seed=i) for i in range(documents)]
+    for text in originals:
+        db.save_summary("bench", text, "")
+    ids = {}
+    with sqlite3.connect(db.db_path) as conn:
+        for document_id, digest in conn.execute("SELECT id, content_hash FROM documents"):
+            ids[digest] = document_id
+
+    results = {}
+    rng = random.Random(0)
+    for kind in POSITIVE + NEGATIVE:
+        matched, wrong, similarities, latencies = 0, 0, [], []
+        for i, original in enumerate(originals):
+            copy = perturb(original, kind, rng, seed=1_000_000 + i)
+            similarities.append(exact_jaccard(original, copy))
+            started = time.perf_counter()
+            match = db.find_near_duplicate(copy, threshold)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if match is None:
+                continue
+            if match["document_id"] == ids[content_hash(original)]:
+                matched += 1
+            else:
+                wrong += 1
+        entry = {
+            "mean_jaccard": round(statistics.mean(similarities), 3),
+            "lookup_with_fingerprint_ms_p50": round(statistics.median(latencies), 2),
+        }
+        if kind in POSITIVE:
+            entry["false_negative_rate"] = round((documents - matched) / documents, 4)
+            entry["false_positive_rate"] = round(wrong / documents, 4)
+        else:
+            entry["false_positive_rate"] = round((matched + wrong) / documents, 4)
+        results[kind] = entry
+        print(f"  {kind}: {entry}", file=sys.stderr)
+    return results
+
+
+def bench_latency(workdir, index_size, lookups):
+    from database.history_db import HistoryDB
+    from utils.fingerprint import NUM_BINS, band_keys, pack_signature
+
+    db = HistoryDB(os.path.join(workdir, "latency.db"))
+    rng = random.Random(1)
+
+    def random_signature():
+        return [rng.getrandbits(57) for _ in range(NUM_BINS)]
+
+    # Hits look up a stored signature with a few bins changed, so keep some of them
+    hit_ids = set(rng.sample(range(1, index_size + 1), min(lookups, index_size)))
+    stored = {}
+
+    started = time.perf_counter()
+    conn = sqlite3.connect(db.db_path)
+    batch_size = 10_000
+    for start in range(0, index_size, batch_size):
+        end = min(start + batch_size, index_size)
+        signatures = [(document_id, random_signature()) for document_id in range(start + 1, end + 1)]
+        stored.update((document_id, signature) for document_id, signature in signatures if document_id in hit_ids)
+        conn.executemany(
+            "INSERT INTO document_fingerprints (document_id, signature) VALUES (?, ?)",
+            [(document_id, pack_signature(signature)) for document_id, signature in signatures]
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO document_bands (band_key, document_id) VALUES (?, ?)",
+            [(key, document_id) for document_id, signature in signatures for key in band_keys(signature)]
+        )
+        conn.commit()
+    conn.close()
+    fill_seconds = time.perf_counter() - started
+    print(f"  filled {index_size} signatures in {fill_seconds:.0f}s", file=sys.stderr)
+
+    misses = [random_signature() for _ in range(lookups)]
+    hits = []
+    for signature in stored.values():
+        signature = list(signature)
+        for index in rng.sample(range(NUM_BINS), 8):
+            signature[index] = rng.getrandbits(57)
+        hits.append(signature)
+
+    result = {"index_size": index_size, "fill_seconds": round(fill_seconds, 1),
+              "db_mb": round(os.path.getsize(db.db_path) / 2**20, 1)}
+    for name, signatures in (("miss", misses), ("hit", hits)):
+        db.find_near_duplicate("", signature=signatures[0])  # open the connection
+        latencies, found = [], 0
+        for signature in signatures:
+            started = time.perf_counter()
+            found += db.find_near_duplicate("", signature=signature) is not None
+            latencies.append((time.perf_counter() - started) * 1000)
+        result[name] = {
+            "p50_ms": round(statistics.median(latencies), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "found": found,
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=300, help="originals for the accuracy part")
+    parser.add_argument("--size", type=int, default=12_000, help="document size in bytes")
+    parser.add_argument("--threshold", type=float, default=None, help="default: NEAR_DUPLICATE_THRESHOLD")
+    parser.add_argument("--index-size", type=int, default=1_000_000, help="signatures for the latency part (0 skips it)")
+    parser.add_argument("--lookups", type=int, default=2_000)
+    args = parser.parse_args()
+
+    from config import Config
+    threshold = Config.NEAR_DUPLICATE_THRESHOLD if args.threshold is None else args.threshold
+    workdir = tempfile.mkdtemp(prefix="bench_near_duplicates_")
+
+    print("Accuracy:", file=sys.stderr)
+    output = {"threshold": threshold, "accuracy": bench_accuracy(workdir, args.documents, args.size, threshold)}
+    if args.index_size:
+        print("Latency:", file=sys.stderr)
+        output["latency"] = bench_latency(workdir, args.index_size, args.lookups)
+    print(json.dumps(output, indent=2))
+
+
+if __name__ == "__main__":
+    main()
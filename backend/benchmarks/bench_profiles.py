@@ -0,0 +1,108 @@
+"""
+Latency and ROUGE of every decoding profile in Config.DECODING_PROFILES.
+
+Each profile summarizes the same documents. ROUGE-1/2/L F1 is computed against the reference
+summaries when the samples have them ("<name>.summary.txt", see eval_quantization.py), and
+against the output of the --baseline profile otherwise, which shows how far the cheaper
+profiles drift from it. Without --samples, synthetic documents of --sizes bytes are used
+(short abstract-like inputs up to full papers) with the tiny offline models.
+
+Usage (from backend/):
+    python -m benchmarks.bench_profiles --samples ../samples --models-dir ../model
+    python -m benchmarks.bench_profiles --target sectional --sizes 1500 6000 24000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.suite import configure_environment, percentile
+from benchmarks.synthetic import make_document
+from benchmarks.tiny_models import build_model_tree
+
+
+def build_runner(target, model_name):
+    from config import Config
+    from models.sectionsum import load_local_summarizer, generate_section_summaries
+    from models.summarizer import TextSummarizer
+
+    if target == "sectional":
+        summarizer = load_local_summarizer()
+        return lambda text, profile: " ".join(generate_section_summaries(text, summarizer, profile=profile).values())
+    # The domain models are only registered by the routes, so load this one directly
+    summarizer = TextSummarizer(Config.MODEL_PATHS[model_name], name=model_name)
+    return lambda text, profile: summarizer.summarize(text, profile=profile)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=("summary", "sectional"), default="summary")
+    parser.add_argument("--model", default="Computer Science", help="domain model for --target summary")
+    parser.add_argument("--samples", default=None, help="directory of *.txt samples (default: synthetic documents)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_500, 4_000, 12_000], help="synthetic document sizes")
+    parser.add_argument("--per-size", type=int, default=5, help="synthetic documents per size")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--baseline", default="quality", help="profile the others are scored against without references")
+    parser.add_argument("--models-dir", default=None, help="model base path (default: build tiny models)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_profiles_")
+    if args.models_dir is None:
+        args.models_dir = build_model_tree(os.path.join(workdir, "model"))
+    configure_environment(workdir, args.models_dir)
+    os.environ["BATCHING_ENABLED"] = "0"  # one request at a time; the batcher would only add its wait
+
+    # Both import config, so only after the environment points it at the models
+    from config import Config
+    from benchmarks.eval_quantization import load_samples, rouge, mean_scores
+
+    if args.samples:
+        samples = load_samples(args.samples, args.limit)
+    else:
+        samples = [
+            {"name": f"synthetic-{size}-{i}", "text": make_document(size, seed=i), "reference": None}
+            for size in args.sizes for i in range(args.per_size)
+        ]
+    run = build_runner(args.target, args.model)
+    run(samples[0]["text"], args.baseline)  # warm up
+
+    profiles = [args.baseline] + [name for name in Config.DECODING_PROFILES if name != args.baseline]
+    outputs, results = {}, {}
+    for profile in profiles:
+        latencies, lengths = [], []
+        outputs[profile] = []
+        for sample in samples:
+            started = time.perf_counter()
+            summary = run(sample["text"], profile) or ""
+            latencies.append((time.perf_counter() - started) * 1000)
+            lengths.append(len(summary.split()))
+            outputs[profile].append(summary)
+        references = [
+            sample["reference"] if sample["reference"] is not None else outputs[args.baseline][i]
+            for i, sample in enumerate(samples)
+        ]
+        results[profile] = {
+            "settings": Config.DECODING_PROFILES[profile],
+            "p50_ms": round(statistics.median(latencies), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+            "mean_words": round(statistics.mean(lengths), 1),
+            "rouge": mean_scores([rouge(out, ref) for out, ref in zip(outputs[profile], references)]),
+        }
+        print(f"  {profile}: p50 {results[profile]['p50_ms']} ms", file=sys.stderr)
+
+    baseline_p50 = results[args.baseline]["p50_ms"]
+    for result in results.values():
+        result["speedup_p50"] = round(baseline_p50 / result["p50_ms"], 2) if result["p50_ms"] else None
+    print(json.dumps({
+        "target": args.target,
+        "documents": len(samples),
+        "rouge_against": "references" if all(s["reference"] for s in samples) else f"'{args.baseline}' output where no reference",
+        "profiles": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Startup time: how long until the server answers /healthz and /readyz.
+
+Three numbers per mode, all measured from process start:
+    import_s   importing the app with model loading turned off (the heavy imports left at import time)
+    healthz_s  the port is bound and the app answers (liveness)
+    readyz_s   every model in PRELOAD_MODELS is loaded and warmed up (readiness)
+
+Modes:
+    eager       serve.py --preload: models load and warm up in the master before the port is
+                served, which is how the app started before models loaded in the background
+    background  serve.py --no-preload: the worker serves right away and loads models on a thread
+
+Runs offline on the tiny models from tiny_models.py unless --models-dir points at real checkpoints.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup --repeat 3
+"""
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.load_test import free_port
+from benchmarks.suite import configure_environment
+from benchmarks.tiny_models import build_model_tree
+
+MODES = {"eager": "--preload", "background": "--no-preload"}
+
+
+def measure_import(backend_dir):
+    code = "import time; started = time.perf_counter(); import app; print(time.perf_counter() - started)"
+    env = dict(os.environ, WARMUP_AUTOSTART="0", JOB_QUEUE_AUTOSTART="0")
+    output = subprocess.run([sys.executable, "-c", code], cwd=backend_dir, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def poll(url, started, timeout):
+    """Seconds since `started` until `url` answers 200."""
+    while time.perf_counter() - started < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                if response.status == 200:
+                    return time.perf_counter() - started
+        except (urllib.error.HTTPError, OSError):
+            pass
+        time.sleep(0.05)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def measure_startup(backend_dir, mode, timeout):
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port), "--workers", "1", MODES[mode]],
+        cwd=backend_dir, env=dict(os.environ), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        healthz = poll(f"{base_url}/healthz", started, timeout)
+        readyz = poll(f"{base_url}/readyz", started, timeout)
+        with urllib.request.urlopen(f"{base_url}/readyz", timeout=5) as response:
+            models = json.loads(response.read())["models"]
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=120)
+    return {"healthz_s": healthz, "readyz_s": readyz, "models": models}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--models-dir", default=None, help="model base path (default: build tiny models)")
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_startup_")
+    models_dir = args.models_dir or build_model_tree(os.path.join(workdir, "model"))
+    configure_environment(workdir, models_dir)
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    imports = [measure_import(backend_dir) for _ in range(args.repeat)]
+    result = {"import_s": round(statistics.median(imports), 3), "preload_models": os.environ["PRELOAD_MODELS"]}
+    for mode in args.modes:
+        runs = []
+        for i in range(args.repeat):
+            runs.append(measure_startup(backend_dir, mode, args.timeout))
+            print(f"  {mode} {i + 1}/{args.repeat}", file=sys.stderr)
+        result[mode] = {
+            "healthz_s": round(statistics.median(run["healthz_s"] for run in runs), 3),
+            "readyz_s": round(statistics.median(run["readyz_s"] for run in runs), 3),
+            "models": runs[-1]["models"],
+        }
+    if "eager" in result and "background" in result:
+        result["healthz_speedup"] = round(result["eager"]["healthz_s"] / result["background"]["healthz_s"], 2)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
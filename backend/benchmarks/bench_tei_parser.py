@@ -0,0 +1,115 @@
+"""
+Compares the streaming TEI parser and merged cleaning passes with the previous
+BeautifulSoup parser and four-pass cleaning. Checks both produce the same words,
+then exercises GrobidClient against the local stub GROBID server.
+
+Usage (from backend/):
+    python -m benchmarks.bench_tei_parser --sizes 100000 1000000 5000000
+"""
+import argparse
+import json
+import re
+import threading
+import time
+
+from benchmarks.stub_grobid import make_server
+from benchmarks.synthetic import make_tei
+from utils.file_parser import PDFParser
+from utils.grobid_client import GrobidClient
+
+
+def legacy_parse_tei_to_text(tei_xml):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(tei_xml, "lxml-xml")
+    body = soup.find("body")
+    if not body:
+        return ""
+    text_parts = []
+    for element in body.find_all(["p", "head"]):
+        content = element.get_text(separator=" ", strip=True)
+        if element.name == "head":
+            content = f"\n\n{content.upper()}\n"
+        text_parts.append(content)
+    return "\n".join(text_parts).strip()
+
+
+def legacy_clean_pdf_text(text):
+    text = re.sub(r"-\s*\n", "", text)
+    text = re.sub(r"\n+", " ", text)
+    text = re.sub(r"\s{2,}", " ", text)
+    text = re.sub(r"[^\w\s.,;:'\"!?()\[\]{}—–\-]", "", text)
+    return text.strip()
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000, result
+
+
+def bench_parsers(sizes, repeat):
+    results = []
+    for size in sizes:
+        tei = make_tei(size, seed=size)
+        entry = {"tei_bytes": len(tei)}
+        new_ms, new_text = best_of(lambda: PDFParser.clean_pdf_text(PDFParser.parse_tei_to_text(tei)), repeat)
+        entry["streaming_ms"] = round(new_ms, 1)
+        try:
+            old_ms, old_text = best_of(lambda: legacy_clean_pdf_text(legacy_parse_tei_to_text(tei)), repeat)
+            entry["beautifulsoup_ms"] = round(old_ms, 1)
+            entry["speedup"] = round(old_ms / new_ms, 2)
+            # The merged cleaning pass also collapses whitespace left behind by removed characters
+            entry["same_output"] = old_text.split() == new_text.split()
+        except ImportError:
+            entry["beautifulsoup_ms"] = None  # bs4/lxml not installed
+        results.append(entry)
+    return results
+
+
+def bench_grobid_client(documents, concurrency, latency):
+    server = make_server(fail_first=2, latency=latency)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        client = GrobidClient(
+            f"http://127.0.0.1:{server.server_port}/api/processFulltextDocument",
+            max_concurrency=concurrency, retries=3, backoff=0.05,
+        )
+        pdfs = [(f"paper_{i}.pdf", b"%PDF-1.4 stub") for i in range(documents)]
+        started = time.perf_counter()
+        responses = client.process_many(pdfs)
+        elapsed = time.perf_counter() - started
+        client.close()
+    finally:
+        server.shutdown()
+    return {
+        "documents": documents,
+        "max_concurrency": concurrency,
+        "stub_latency_s": latency,
+        "failed": sum(isinstance(r, Exception) for r in responses),
+        "requests_incl_retries": server.stats["requests"],
+        "max_in_flight": server.stats["max_in_flight"],
+        "elapsed_s": round(elapsed, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--documents", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+    print(json.dumps({
+        "parsers": bench_parsers(args.sizes, args.repeat),
+        "grobid_client": bench_grobid_client(args.documents, args.concurrency, args.latency),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
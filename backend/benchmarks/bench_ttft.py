@@ -0,0 +1,104 @@
+"""
+Time to first token: the blocking /summarize endpoint against /summarize/stream.
+
+For /summarize the first summary text arrives with the whole response, so its time to
+first token is the full latency. For /summarize/stream it is the time until the first
+'token' event. Runs offline on the tiny models from tiny_models.py unless --models-dir
+points at real checkpoints.
+
+Usage (from backend/):
+    python -m benchmarks.bench_ttft --requests 20 --size 4000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.suite import configure_environment, percentile
+from benchmarks.synthetic import make_document
+from benchmarks.tiny_models import build_model_tree
+
+
+def blocking_request(client, text, model):
+    started = time.perf_counter()
+    response = client.post("/summarize", data={"text": text, "model": model})
+    elapsed = (time.perf_counter() - started) * 1000
+    if response.status_code != 200:
+        raise RuntimeError(f"/summarize answered {response.status_code}")
+    return {"first_token_ms": elapsed, "total_ms": elapsed}
+
+
+def streaming_request(client, text, model, decoding):
+    started = time.perf_counter()
+    response = client.post("/summarize/stream", data={"text": text, "model": model, "decoding": decoding},
+                           buffered=False)
+    if response.status_code != 200:
+        raise RuntimeError(f"/summarize/stream answered {response.status_code}")
+    first_token_ms = None
+    for chunk in response.iter_encoded():
+        if first_token_ms is None and b"event: token" in chunk:
+            first_token_ms = (time.perf_counter() - started) * 1000
+        if b"event: error" in chunk:
+            raise RuntimeError(chunk.decode("utf-8", "replace"))
+    response.close()
+    return {"first_token_ms": first_token_ms, "total_ms": (time.perf_counter() - started) * 1000}
+
+
+def summarize(runs):
+    result = {}
+    for metric in ("first_token_ms", "total_ms"):
+        values = [run[metric] for run in runs if run[metric] is not None]
+        result[metric] = {
+            "p50": round(statistics.median(values), 1),
+            "p95": round(percentile(values, 95), 1),
+        } if values else None
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--size", type=int, default=4_000, help="document size in bytes")
+    parser.add_argument("--model", default="Computer Science")
+    parser.add_argument("--decoding", choices=("greedy", "sample"), default="greedy")
+    parser.add_argument("--models-dir", default=None, help="model base path (default: build tiny models)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_ttft_")
+    models_dir = args.models_dir or build_model_tree(os.path.join(workdir, "model"))
+    configure_environment(workdir, models_dir)
+
+    from app import app
+    client = app.test_client()
+
+    # Warm up both paths so model loading isn't measured
+    warmup = make_document(args.size, seed=-1)
+    blocking_request(client, warmup, args.model)
+    streaming_request(client, make_document(args.size, seed=-2), args.model, args.decoding)
+
+    # Distinct documents keep the in-process caches out of the measurement
+    blocking, streaming = [], []
+    for i in range(args.requests):
+        blocking.append(blocking_request(client, make_document(args.size, seed=i), args.model))
+        streaming.append(streaming_request(client, make_document(args.size, seed=100_000 + i), args.model, args.decoding))
+        print(f"  {i + 1}/{args.requests}", file=sys.stderr)
+
+    result = {
+        "requests": args.requests,
+        "document_bytes": args.size,
+        "decoding": args.decoding,
+        "blocking": summarize(blocking),
+        "streaming": summarize(streaming),
+    }
+    if result["blocking"]["first_token_ms"] and result["streaming"]["first_token_ms"]:
+        result["ttft_speedup_p50"] = round(
+            result["blocking"]["first_token_ms"]["p50"] / result["streaming"]["first_token_ms"]["p50"], 2
+        )
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
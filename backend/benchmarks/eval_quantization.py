@@ -0,0 +1,266 @@
+"""
+Compares fp32 and int8 (dynamic quantization) variants of one model on a local sample set.
+
+Reports per variant: load time, RSS after loading and after running the samples, peak RSS
+and per-document latency. fp32 weights are memory-mapped from safetensors and only become
+resident as they are used, so compare the RSS after the run rather than after loading.
+For summarizers it also reports ROUGE-1/2/L F1 of int8 against fp32, and of both against
+reference summaries when present. For NER it reports the overlap of the extracted entity sets.
+Each variant runs in its own subprocess so their memory numbers don't mix.
+
+Samples are the *.txt files of a directory; "<name>.summary.txt" next to "<name>.txt"
+is used as its reference summary.
+
+Usage (from backend/):
+    python -m benchmarks.eval_quantization --model "Computer Science" --samples ../samples
+    python -m benchmarks.eval_quantization --model NER --samples ../samples --limit 20
+"""
+import argparse
+import json
+import os
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from config import Config
+
+VARIANTS = ("fp32", "int8")
+
+
+# --- Samples and scoring ---
+
+def load_samples(directory, limit=None):
+    samples = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".txt") or filename.endswith(".summary.txt"):
+            continue
+        name = filename[:-len(".txt")]
+        with open(os.path.join(directory, filename), encoding="utf-8") as f:
+            text = f.read()
+        reference_path = os.path.join(directory, f"{name}.summary.txt")
+        reference = None
+        if os.path.isfile(reference_path):
+            with open(reference_path, encoding="utf-8") as f:
+                reference = f.read()
+        samples.append({"name": name, "text": text, "reference": reference})
+        if limit and len(samples) >= limit:
+            break
+    return samples
+
+
+def tokens(text):
+    return re.findall(r"\w+", text.lower())
+
+
+def f1(overlap, candidate_total, reference_total):
+    if not overlap:
+        return 0.0
+    precision, recall = overlap / candidate_total, overlap / reference_total
+    return 2 * precision * recall / (precision + recall)
+
+
+def rouge_n(candidate, reference, n):
+    def ngrams(words):
+        return Counter(tuple(words[i:i + n]) for i in range(len(words) - n + 1))
+    cand, ref = ngrams(candidate), ngrams(reference)
+    return f1(sum((cand & ref).values()), sum(cand.values()), sum(ref.values()))
+
+
+def rouge_l(candidate, reference):
+    previous = [0] * (len(reference) + 1)
+    for word in candidate:
+        current = [0]
+        for j, ref_word in enumerate(reference):
+            current.append(previous[j] + 1 if word == ref_word else max(previous[j + 1], current[j]))
+        previous = current
+    return f1(previous[-1], len(candidate), len(reference))
+
+
+def rouge(candidate, reference):
+    cand, ref = tokens(candidate or ""), tokens(reference or "")
+    return {"rouge1": rouge_n(cand, ref, 1), "rouge2": rouge_n(cand, ref, 2), "rougeL": rouge_l(cand, ref)}
+
+
+def mean_scores(scores):
+    if not scores:
+        return None
+    return {key: round(statistics.mean(score[key] for score in scores), 4) for key in scores[0]}
+
+
+def entity_overlap(a, b):
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+# --- Worker: runs one variant ---
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return None
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def build_runner(model_name, quantize):
+    """Returns (run(text) -> output, quantized cache file or None)."""
+    from models.quantization import quantized_cache_path
+
+    if model_name == Config.NER_MODEL_NAME:
+        from transformers import AutoModelForTokenClassification
+        from models.NERProcessor import NERProcessor
+        processor = NERProcessor(Config.NER_PATH, name=f"{model_name} ({'int8' if quantize else 'fp32'})", quantize=quantize)
+        processor.ner_pipeline  # load now so the load time isn't counted as latency
+        cache = quantized_cache_path(AutoModelForTokenClassification, Config.NER_PATH)
+
+        def run(text):
+            return sorted(f"{e['term']}|{e['type']}" for e in processor.extract_entities(text))
+        return run, cache
+
+    path = Config.MODEL_PATHS[model_name]
+    if model_name == "Sectional Summarizer":
+        from transformers import AutoModelForSeq2SeqLM
+        from models.sectionsum import build_summarization_pipeline, generate_section_summaries
+        summarizer = build_summarization_pipeline(path, quantize=quantize)
+        cache = quantized_cache_path(AutoModelForSeq2SeqLM, path)
+
+        def run(text):
+            return " ".join(generate_section_summaries(text, summarizer).values())
+        return run, cache
+
+    from transformers import T5ForConditionalGeneration
+    from models.summarizer import TextSummarizer
+    summarizer = TextSummarizer(path, name=model_name, quantize=quantize)
+    cache = quantized_cache_path(T5ForConditionalGeneration, path)
+
+    def run(text):
+        return summarizer.summarize_batch([text])[0]
+    return run, cache
+
+
+def run_variant(model_name, variant, samples_dir, limit, threads, output_path):
+    import torch
+    if threads:
+        torch.set_num_threads(threads)
+    quantize = variant == "int8"
+    samples = load_samples(samples_dir, limit)
+
+    rss_start = current_rss_mb()
+    started = time.perf_counter()
+    run, cache = build_runner(model_name, quantize)
+    load_seconds = time.perf_counter() - started
+    rss_loaded = current_rss_mb()
+
+    outputs, latencies = {}, []
+    for sample in samples:
+        started = time.perf_counter()
+        outputs[sample["name"]] = run(sample["text"])
+        latencies.append((time.perf_counter() - started) * 1000)
+    rss_run = current_rss_mb()
+
+    report = {
+        "variant": variant,
+        "load_seconds": round(load_seconds, 2),
+        "quantized_cache": cache if quantize else None,
+        "rss_model_mb": round(rss_loaded - rss_start, 1) if rss_start is not None else None,
+        "rss_after_run_mb": round(rss_run - rss_start, 1) if rss_start is not None else None,
+        "rss_peak_mb": round(peak_rss_mb(), 1),
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies), 1) if latencies else None,
+            "p50": round(statistics.median(latencies), 1) if latencies else None,
+            "max": round(max(latencies), 1) if latencies else None,
+        },
+        "outputs": outputs,
+    }
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f)
+
+
+# --- Driver ---
+
+def compare(model_name, samples, reports):
+    fp32, int8 = reports["fp32"]["outputs"], reports["int8"]["outputs"]
+    comparison = {}
+    if model_name == Config.NER_MODEL_NAME:
+        overlaps = [entity_overlap(fp32[s["name"]], int8[s["name"]]) for s in samples]
+        comparison["entity_overlap_int8_vs_fp32"] = round(statistics.mean(overlaps), 4) if overlaps else None
+        return comparison
+
+    comparison["rouge_int8_vs_fp32"] = mean_scores([rouge(int8[s["name"]], fp32[s["name"]]) for s in samples])
+    with_reference = [s for s in samples if s["reference"]]
+    if with_reference:
+        for variant in VARIANTS:
+            outputs = reports[variant]["outputs"]
+            comparison[f"rouge_{variant}_vs_reference"] = mean_scores(
+                [rouge(outputs[s["name"]], s["reference"]) for s in with_reference]
+            )
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", required=True,
+                        help=f"one of: {', '.join(list(Config.MODEL_PATHS) + [Config.NER_MODEL_NAME])}")
+    parser.add_argument("--samples", required=True, help="directory with *.txt samples")
+    parser.add_argument("--limit", type=int, default=None, help="use at most this many samples")
+    parser.add_argument("--threads", type=int, default=0, help="torch threads (default: torch's choice)")
+    parser.add_argument("--output", default=None, help="also write the JSON report to this file")
+    parser.add_argument("--worker", choices=VARIANTS, help=argparse.SUPPRESS)
+    parser.add_argument("--worker-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.model != Config.NER_MODEL_NAME and args.model not in Config.MODEL_PATHS:
+        parser.error(f"unknown model '{args.model}'")
+
+    if args.worker:
+        run_variant(args.model, args.worker, args.samples, args.limit, args.threads, args.worker_output)
+        return
+
+    samples = load_samples(args.samples, args.limit)
+    if not samples:
+        parser.error(f"no *.txt samples in {args.samples}")
+
+    reports = {}
+    with tempfile.TemporaryDirectory(prefix="eval_quantization_") as workdir:
+        for variant in VARIANTS:
+            worker_output = os.path.join(workdir, f"{variant}.json")
+            command = [
+                sys.executable, "-m", "benchmarks.eval_quantization",
+                "--model", args.model, "--samples", args.samples, "--threads", str(args.threads),
+                "--worker", variant, "--worker-output", worker_output,
+            ]
+            if args.limit:
+                command += ["--limit", str(args.limit)]
+            subprocess.run(command, check=True, stdout=sys.stderr)
+            with open(worker_output, encoding="utf-8") as f:
+                reports[variant] = json.load(f)
+
+    result = {
+        "model": args.model,
+        "samples": len(samples),
+        **{variant: {k: v for k, v in reports[variant].items() if k != "outputs"} for variant in VARIANTS},
+        **compare(args.model, samples, reports),
+    }
+    fp32_latency, int8_latency = reports["fp32"]["latency_ms"]["mean"], reports["int8"]["latency_ms"]["mean"]
+    if fp32_latency and int8_latency:
+        result["speedup"] = round(fp32_latency / int8_latency, 2)
+
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
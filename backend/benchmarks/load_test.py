@@ -0,0 +1,165 @@
+"""
+Load test for serve.py: throughput and latency of /summarize as the worker count grows.
+
+For every worker count a fresh pre-fork server is started on the tiny offline models
+(or --models-dir), warmed up, and hit with --concurrency parallel clients for --duration
+seconds of distinct documents. The result shows how throughput scales relative to one worker.
+Requests shed by admission control (503 or 429) are counted apart from other errors.
+"server_counted" is the number of /summarize requests the server's /metrics saw during the
+load, added up across its workers; it should equal requests + errors + shed.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --workers 1 2 4 --concurrency 16 --duration 30
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from benchmarks.suite import configure_environment, percentile
+from benchmarks.synthetic import make_document
+from benchmarks.tiny_models import build_model_tree
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=5):
+                return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"Server at {url} not ready after {timeout}s")
+
+
+def post_summarize(base_url, text, model):
+    data = urllib.parse.urlencode({"text": text, "model": model}).encode("utf-8")
+    started = time.perf_counter()
+    with urllib.request.urlopen(f"{base_url}/summarize", data=data, timeout=600) as response:
+        response.read()
+    return (time.perf_counter() - started) * 1000
+
+
+def scraped_requests(base_url, endpoint="/summarize"):
+    """Requests to `endpoint` in the server's /metrics, all statuses, across every worker."""
+    with urllib.request.urlopen(f"{base_url}/metrics", timeout=30) as response:
+        body = response.read().decode("utf-8")
+    prefix = "summarizer_http_request_duration_seconds_count{"
+    return int(sum(
+        float(line.rsplit(" ", 1)[1])
+        for line in body.splitlines()
+        if line.startswith(prefix) and f'endpoint="{endpoint}"' in line
+    ))
+
+
+def run_load(base_url, concurrency, duration, size, model):
+    latencies, errors, shed = [], [], []
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+
+    def client(index):
+        i = 0
+        while time.time() < stop_at:
+            # Distinct documents so neither the result cache nor the lru_caches answer
+            text = make_document(size, seed=index * 1_000_000 + i)
+            i += 1
+            try:
+                latency = post_summarize(base_url, text, model)
+                with lock:
+                    latencies.append(latency)
+            except urllib.error.HTTPError as e:
+                with lock:
+                    (shed if e.code in (429, 503) else errors).append(str(e))
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "shed": len(shed),
+        "throughput_per_s": round(len(latencies) / wall, 2),
+        "p50_ms": round(percentile(latencies, 50), 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95), 1) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load per worker count")
+    parser.add_argument("--size", type=int, default=4_000, help="document size in bytes")
+    parser.add_argument("--model", default="Computer Science")
+    parser.add_argument("--models-dir", default=None, help="model base path (default: build tiny models)")
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    models_dir = args.models_dir or build_model_tree(os.path.join(workdir, "model"))
+    configure_environment(workdir, models_dir)
+    # Workers publish their metrics this often; the check below waits for one round
+    os.environ.setdefault("METRICS_SNAPSHOT_INTERVAL", "0.5")
+    snapshot_interval = float(os.environ["METRICS_SNAPSHOT_INTERVAL"])
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    results = []
+    for workers in args.workers:
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+             "--max-requests", "0"],
+            cwd=backend_dir, env=dict(os.environ), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            wait_until_ready(f"{base_url}/models", args.startup_timeout)
+            # Warm up every worker (loads the domain model and fills its first batch)
+            run_load(base_url, workers * 2, 3, args.size, args.model)
+            time.sleep(2 * snapshot_interval)
+            counted_before = scraped_requests(base_url)
+            result = run_load(base_url, args.concurrency, args.duration, args.size, args.model)
+            time.sleep(2 * snapshot_interval)
+            result["server_counted"] = scraped_requests(base_url) - counted_before
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=120)
+        result["workers"] = workers
+        results.append(result)
+        print(f"  {workers} workers: {result['throughput_per_s']} req/s, p50 {result['p50_ms']} ms", file=sys.stderr)
+
+    base = results[0]["throughput_per_s"] or None
+    for result in results:
+        result["scaling"] = round(result["throughput_per_s"] / base, 2) if base else None
+    print(json.dumps({
+        "cpus": os.cpu_count(),
+        "concurrency": args.concurrency,
+        "document_bytes": args.size,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
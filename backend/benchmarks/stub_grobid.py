@@ -0,0 +1,70 @@
+"""
+Local stand-in for GROBID's processFulltextDocument endpoint.
+
+Answers every POST with synthetic TEI XML. It can fail the first N requests with 503
+and add latency, to exercise GrobidClient's retries and concurrency limit.
+
+Usage (from backend/):
+    python -m benchmarks.stub_grobid --port 8070 --fail-first 2 --latency 0.2
+    GROBID_URL=http://localhost:8070/api/processFulltextDocument python app.py
+"""
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.synthetic import make_tei
+
+
+def make_server(port=0, fail_first=0, latency=0.0, tei_bytes=20_000):
+    """Returns a ready-to-serve stub server; `server.server_port` holds the bound port."""
+    tei = make_tei(tei_bytes).encode("utf-8")
+    state = {"requests": 0, "in_flight": 0, "max_in_flight": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with lock:
+                state["requests"] += 1
+                state["in_flight"] += 1
+                state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+                failing = state["requests"] <= fail_first
+            try:
+                time.sleep(latency)
+                if failing:
+                    self.send_response(503)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/xml")
+                self.send_header("Content-Length", str(len(tei)))
+                self.end_headers()
+                self.wfile.write(tei)
+            finally:
+                with lock:
+                    state["in_flight"] -= 1
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.stats = state
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8070)
+    parser.add_argument("--fail-first", type=int, default=0, help="answer the first N requests with 503")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before answering")
+    parser.add_argument("--tei-bytes", type=int, default=20_000, help="approximate size of the TEI body")
+    args = parser.parse_args()
+    server = make_server(args.port, args.fail_first, args.latency, args.tei_bytes)
+    print(f"Stub GROBID listening on http://127.0.0.1:{server.server_port}/api/processFulltextDocument")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
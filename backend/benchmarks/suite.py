@@ -0,0 +1,270 @@
+"""
+Offline benchmark suite for every pipeline stage and the HTTP endpoints.
+
+Builds tiny randomly initialized T5 and token-classification models (see tiny_models.py),
+points Config at them and measures, on synthetic documents:
+  - stages: TextSummarizer.summarize, generate_section_summaries, NERProcessor.extract_entities,
+    analyze_citations, PDFParser.parse_tei_to_text + clean_pdf_text, HistoryDB writes and reads;
+  - http: /summarize and /sectional_summary through the Flask test client at several
+    concurrency levels.
+Every measurement reports p50/p95/p99 latency, throughput and peak RSS.
+
+Compare mode flags results that got slower than a stored baseline by more than the threshold
+and exits with status 1 if there are any.
+
+Usage (from backend/):
+    python -m benchmarks.suite --output bench.json
+    python -m benchmarks.suite --sizes 1000 10000 --concurrency 1 4 --baseline bench.json
+    python -m benchmarks.suite --compare old.json new.json --threshold 0.15
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.synthetic import make_document, make_tei
+from benchmarks.tiny_models import build_model_tree
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_CONCURRENCY = [1, 2, 4, 8, 16, 32]
+HTTP_ENDPOINTS = ("/summarize", "/sectional_summary")
+# Model stages are slow on large inputs, so they get fewer repetitions than the pure-Python ones
+MODEL_STAGES = ("summarize", "sectional", "ner")
+
+
+# --- Measurement helpers ---
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 2**20 if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def summarize_latencies(latencies_ms, wall_seconds, items=None):
+    return {
+        "count": len(latencies_ms),
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p95_ms": round(percentile(latencies_ms, 95), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "throughput_per_s": round((items or len(latencies_ms)) / wall_seconds, 2) if wall_seconds else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def measure(fn, inputs):
+    """Calls fn once per input, sequentially."""
+    latencies = []
+    started = time.perf_counter()
+    for value in inputs:
+        call_started = time.perf_counter()
+        fn(value)
+        latencies.append((time.perf_counter() - call_started) * 1000)
+    return summarize_latencies(latencies, time.perf_counter() - started)
+
+
+# --- Environment ---
+
+def configure_environment(workdir, models_dir):
+    """Points Config at the tiny models and throwaway databases. Must run before importing the app."""
+    os.environ["MODEL_BASE_PATH"] = models_dir
+    os.environ["HISTORY_DB_PATH"] = os.path.join(workdir, "history.db")
+    os.environ["CACHE_PATH"] = os.path.join(workdir, "result_cache.db")
+    # Every request must reach the models, otherwise the suite measures the cache
+    os.environ["CACHE_ENABLED"] = "0"
+    os.environ.setdefault("PRELOAD_MODELS", "Sectional Summarizer,NER,Computer Science")
+    os.environ.setdefault("JOB_WORKERS", "0")
+    # Load the models before the app is used, as the suite assumes they are resident
+    os.environ.setdefault("WARMUP_IN_BACKGROUND", "0")
+    # Benchmark clients all share one address, which the per-client admission limit would throttle
+    os.environ.setdefault("ADMISSION_MAX_PER_IP", "1000")
+
+
+# --- Stage benchmarks ---
+
+def bench_stages(sizes, repeat, model_repeat):
+    from config import Config
+    from database.history_db import HistoryDB
+    from models.registry import model_registry
+    from models.sectionsum import load_local_summarizer, generate_section_summaries
+    from routes.summarize_route import ner_processor
+    from utils.citation_analyzer import analyze_citations
+    from utils.file_parser import PDFParser
+
+    summarizer = model_registry.get("Computer Science")
+    section_summarizer = load_local_summarizer()
+
+    stages = {
+        "summarize": summarizer.summarize,
+        "sectional": lambda text: generate_section_summaries(text, section_summarizer),
+        "ner": ner_processor.extract_entities,
+        "citations": analyze_citations,
+    }
+
+    results = {}
+    for size in sizes:
+        # A distinct document per call keeps the lru_caches in the route module out of the picture
+        for stage, fn in stages.items():
+            count = model_repeat if stage in MODEL_STAGES else repeat
+            documents = [make_document(size, seed=size * 1000 + i) for i in range(count)]
+            results[f"stage:{stage}:{size}"] = measure(fn, documents)
+            print(f"  {stage} {size}B: {results[f'stage:{stage}:{size}']['p50_ms']} ms p50", file=sys.stderr)
+
+        teis = [make_tei(size, seed=size * 1000 + i) for i in range(repeat)]
+        results[f"stage:tei:{size}"] = measure(lambda tei: PDFParser.clean_pdf_text(PDFParser.parse_tei_to_text(tei)), teis)
+
+        history_db = HistoryDB(os.path.join(os.path.dirname(Config.HISTORY_DB_PATH), f"history_{size}.db"))
+        document = make_document(size, seed=size)
+        writes = [(f"10.0.0.{i % 16}", f"{document} {i}") for i in range(repeat)]
+        results[f"stage:history_write:{size}"] = measure(
+            lambda row: history_db.save_summary(row[0], row[1], "summary", "{}", "[]"), writes
+        )
+        results[f"stage:history_read:{size}"] = measure(
+            lambda ip: history_db.get_history_page(ip, limit=20), [f"10.0.0.{i % 16}" for i in range(repeat)]
+        )
+    return results
+
+
+# --- HTTP benchmarks ---
+
+def bench_http(concurrency_levels, size, requests_per_level):
+    from app import app
+
+    results = {}
+    for endpoint in HTTP_ENDPOINTS:
+        for concurrency in concurrency_levels:
+            total = max(requests_per_level, concurrency)
+            documents = [make_document(size, seed=concurrency * 10_000 + i) for i in range(total)]
+            errors = []
+
+            def call(text):
+                # The test client isn't meant to be shared between threads, so each call gets its own
+                client = app.test_client()
+                call_started = time.perf_counter()
+                response = client.post(endpoint, data={"text": text, "model": "Computer Science"})
+                if response.status_code != 200:
+                    errors.append(response.status_code)
+                return (time.perf_counter() - call_started) * 1000
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                latencies = list(executor.map(call, documents))
+            result = summarize_latencies(latencies, time.perf_counter() - started)
+            result["errors"] = len(errors)
+            results[f"http:{endpoint}:c{concurrency}"] = result
+            print(f"  {endpoint} c={concurrency}: {result['p50_ms']} ms p50, "
+                  f"{result['throughput_per_s']} req/s", file=sys.stderr)
+    return results
+
+
+# --- Compare mode ---
+
+def compare(baseline, current, threshold):
+    """
+    Lists measurements whose p50 or p95 grew, or whose throughput dropped, by more than `threshold`.
+    Peak RSS is reported but not flagged, since it is shared by the whole run.
+    """
+    regressions, improvements = [], []
+    for key, new in current["results"].items():
+        old = baseline["results"].get(key)
+        if old is None:
+            continue
+        for metric, higher_is_worse in (("p50_ms", True), ("p95_ms", True), ("throughput_per_s", False)):
+            before, after = old.get(metric), new.get(metric)
+            if not before or not after:
+                continue
+            change = (after - before) / before
+            worse = change > threshold if higher_is_worse else change < -threshold
+            better = change < -threshold if higher_is_worse else change > threshold
+            entry = {"key": key, "metric": metric, "baseline": before, "current": after,
+                     "change_pct": round(change * 100, 1)}
+            if worse:
+                regressions.append(entry)
+            elif better:
+                improvements.append(entry)
+    return {
+        "threshold_pct": round(threshold * 100, 1),
+        "regressions": regressions,
+        "improvements": improvements,
+        "peak_rss_mb": {"baseline": baseline["meta"].get("peak_rss_mb"), "current": current["meta"].get("peak_rss_mb")},
+    }
+
+
+def load_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="document sizes in bytes")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--http-size", type=int, default=4_000, help="document size for the HTTP runs")
+    parser.add_argument("--http-requests", type=int, default=32, help="requests per concurrency level")
+    parser.add_argument("--repeat", type=int, default=20, help="calls per size for the non-model stages")
+    parser.add_argument("--model-repeat", type=int, default=3, help="calls per size for the model stages")
+    parser.add_argument("--skip", choices=("stages", "http"), action="append", default=[])
+    parser.add_argument("--models-dir", default=None, help="reuse tiny models built by an earlier run")
+    parser.add_argument("--output", default=None, help="write the JSON results to this file")
+    parser.add_argument("--baseline", default=None, help="compare the run against this results file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="only compare two results files")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        report = compare(load_json(args.compare[0]), load_json(args.compare[1]), args.threshold)
+        print(json.dumps(report, indent=2))
+        sys.exit(1 if report["regressions"] else 0)
+
+    workdir = tempfile.mkdtemp(prefix="bench_suite_")
+    models_dir = args.models_dir or os.path.join(workdir, "model")
+    print(f"Building tiny models in {models_dir}", file=sys.stderr)
+    build_model_tree(models_dir)
+    configure_environment(workdir, models_dir)
+
+    results = {}
+    if "stages" not in args.skip:
+        print("Stages:", file=sys.stderr)
+        results.update(bench_stages(args.sizes, args.repeat, args.model_repeat))
+    if "http" not in args.skip:
+        print("HTTP:", file=sys.stderr)
+        results.update(bench_http(args.concurrency, args.http_size, args.http_requests))
+
+    import torch
+    output = {
+        "meta": {
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "cpus": os.cpu_count(),
+            "torch_threads": torch.get_num_threads(),
+            "sizes": args.sizes,
+            "concurrency": args.concurrency,
+            "peak_rss_mb": peak_rss_mb(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2)
+
+    if args.baseline:
+        report = compare(load_json(args.baseline), output, args.threshold)
+        print(json.dumps(report, indent=2))
+        sys.exit(1 if report["regressions"] else 0)
+    print(json.dumps(output, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Synthetic inputs shared by the benchmarks: paper-like text and GROBID-style TEI XML.
+"""
+import random
+from xml.sax.saxutils import escape
+
+WORDS = (
+    "model data results method analysis network learning performance training proposed "
+    "approach error distribution function parameters estimation sample signal energy "
+    "theorem proof equation system optimal algorithm dataset experiment baseline accuracy"
+).split()
+NAMES = ["Smith", "Brown", "Taylor", "Garcia", "Chen", "Müller", "Novak", "Kim"]
+
+
+def sentence(rng, citations=True):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+    words[0] = words[0].capitalize()
+    if citations and rng.random() < 0.3:
+        words.insert(rng.randrange(len(words)), f"[{rng.randint(1, 60)}]")
+    if citations and rng.random() < 0.1:
+        a, b = sorted(rng.sample(range(1, 60), 2))
+        words.insert(rng.randrange(len(words)), f"[{a}–{b}, {b + 2}]")
+    if citations and rng.random() < 0.15:
+        words.insert(rng.randrange(len(words)), f"{rng.choice(NAMES)} et al. ({rng.randint(1990, 2024)})")
+    return " ".join(words) + "."
+
+
+def make_document(size_bytes, seed=0, citations=True):
+    """Returns paper-like text of roughly `size_bytes` characters with section headings."""
+    rng = random.Random(seed)
+    parts = []
+    total = 0
+    section = 0
+    while total < size_bytes:
+        if not parts or rng.random() < 0.05:
+            section += 1
+            heading = f"{section} {rng.choice(WORDS).upper()} {rng.choice(WORDS).upper()}"
+            parts.append(heading)
+            total += len(heading) + 1
+        paragraph = " ".join(sentence(rng, citations) for _ in range(rng.randint(3, 8)))
+        parts.append(paragraph)
+        total += len(paragraph) + 1
+    return "\n".join(parts)[:size_bytes]
+
+
+def make_tei(size_bytes, seed=0):
+    """Returns GROBID-style TEI XML whose body holds roughly `size_bytes` of text."""
+    rng = random.Random(seed)
+    divs = []
+    total = 0
+    while total < size_bytes:
+        paragraphs = []
+        for _ in range(rng.randint(2, 6)):
+            text = escape(" ".join(sentence(rng) for _ in range(rng.randint(3, 8))))
+            ref = f'<ref type="bibr" target="#b{rng.randint(0, 40)}">[{rng.randint(1, 40)}]</ref>'
+            paragraphs.append(f"<p>{text} {ref} {escape(sentence(rng))}</p>")
+            total += len(text)
+        divs.append(f"<div><head n=\"{len(divs) + 1}\">{escape(rng.choice(WORDS))} {escape(rng.choice(WORDS))}</head>{''.join(paragraphs)}</div>")
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<TEI xmlns="http://www.tei-c.org/ns/1.0"><teiHeader><fileDesc><titleStmt>'
+        '<title level="a" type="main">Synthetic paper</title></titleStmt></fileDesc>'
+        '<profileDesc><abstract><p>Abstract text that is not part of the body.</p></abstract></profileDesc>'
+        '</teiHeader><text><body>'
+        + "".join(divs)
+        + '<figure xml:id="fig_0"><head>Figure 1</head><figDesc>A figure.</figDesc></figure>'
+        '</body><back><div type="references"><listBibl><biblStruct><analytic><title>Ref</title></analytic>'
+        '</biblStruct></listBibl></div></back></text></TEI>'
+    )
@@ -0,0 +1,85 @@
+"""
+Tiny randomly initialized models laid out like MODEL_BASE_PATH, so benchmarks run
+without network access or the real checkpoints. Their outputs are gibberish; only
+their cost profile (tokenization, beam search, pipelines) matches the real models.
+
+Layout written by build_model_tree(base):
+    <base>/model_cs/                               T5 domain summarizer
+    <base>/section_sum_model/t5-small-local/       T5 sectional summarizer
+    <base>/ner_model/                              BERT token classifier
+"""
+import os
+import random
+
+from benchmarks.synthetic import WORDS, NAMES, make_document
+
+NER_LABELS = ["O", "B-PER", "I-PER", "B-ORG", "I-ORG", "B-LOC", "I-LOC", "B-MISC", "I-MISC"]
+
+
+def _corpus(lines=2000, seed=0):
+    rng = random.Random(seed)
+    for i in range(lines):
+        yield make_document(400, seed=rng.randrange(1 << 30)).replace("\n", " ")
+
+
+def build_t5(path, seed=0, d_model=64, layers=2, heads=4, vocab_size=800):
+    import sentencepiece as spm
+    import torch
+    from transformers import T5Config, T5ForConditionalGeneration, T5Tokenizer
+
+    os.makedirs(path, exist_ok=True)
+    prefix = os.path.join(path, "spiece")
+    # T5 convention: pad=0, eos=1, unk=2, no bos
+    spm.SentencePieceTrainer.train(
+        sentence_iterator=_corpus(seed=seed), model_prefix=prefix, vocab_size=vocab_size,
+        model_type="unigram", pad_id=0, eos_id=1, unk_id=2, bos_id=-1, hard_vocab_limit=False, minloglevel=2,
+    )
+    os.remove(f"{prefix}.vocab")
+    tokenizer = T5Tokenizer(f"{prefix}.model", model_max_length=512)
+
+    torch.manual_seed(seed)
+    config = T5Config(
+        vocab_size=len(tokenizer), d_model=d_model, d_kv=d_model // heads, d_ff=d_model * 2,
+        num_layers=layers, num_decoder_layers=layers, num_heads=heads,
+        pad_token_id=tokenizer.pad_token_id, eos_token_id=tokenizer.eos_token_id,
+        decoder_start_token_id=tokenizer.pad_token_id,
+    )
+    T5ForConditionalGeneration(config).eval().save_pretrained(path)
+    tokenizer.save_pretrained(path)
+
+
+def build_ner(path, seed=0, hidden=64, layers=2, heads=4):
+    import torch
+    from transformers import BertConfig, BertForTokenClassification, BertTokenizerFast
+
+    os.makedirs(path, exist_ok=True)
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+    chars = list("abcdefghijklmnopqrstuvwxyzäöüé0123456789.,;:()[]-–'\"!?")
+    vocab += chars + [f"##{c}" for c in chars]
+    vocab += sorted({w.lower() for w in WORDS + NAMES + ["et", "al"]} - set(vocab))
+    vocab_file = os.path.join(path, "vocab.txt")
+    with open(vocab_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(vocab) + "\n")
+    tokenizer = BertTokenizerFast(vocab_file, do_lower_case=True, model_max_length=512)
+
+    torch.manual_seed(seed)
+    config = BertConfig(
+        vocab_size=len(vocab), hidden_size=hidden, num_hidden_layers=layers, num_attention_heads=heads,
+        intermediate_size=hidden * 2, max_position_embeddings=512,
+        id2label=dict(enumerate(NER_LABELS)), label2id={label: i for i, label in enumerate(NER_LABELS)},
+    )
+    BertForTokenClassification(config).eval().save_pretrained(path)
+    tokenizer.save_pretrained(path)
+
+
+def build_model_tree(base, seed=0):
+    """Writes the tiny models under `base` unless they're already there; returns `base`."""
+    targets = {
+        os.path.join(base, "model_cs"): build_t5,
+        os.path.join(base, "section_sum_model", "t5-small-local"): build_t5,
+        os.path.join(base, "ner_model"): build_ner,
+    }
+    for path, build in targets.items():
+        if not os.path.isfile(os.path.join(path, "config.json")):
+            build(path, seed=seed)
+    return base
@@ -22,4 +22,129 @@ class Config:
     }
 
     # Refactored NER path to use the base path
-    NER_PATH = os.path.join(MODEL_BASE_PATH, "ner_model")
\ No newline at end of file
+    NER_PATH = os.path.join(MODEL_BASE_PATH, "ner_model")
+
+    # Dynamic micro-batching for the domain summarizers (per worker process)
+    BATCHING_ENABLED = os.getenv("BATCHING_ENABLED", "1") == "1"
+    BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))         # requests per generate call
+    BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "20"))  # how long to wait for a batch to fill
+    BATCH_MAX_QUEUE = int(os.getenv("BATCH_MAX_QUEUE", "64"))       # pending requests per model
+
+    # Admission control for the model routes: requests beyond the queue get 503 with Retry-After.
+    # Like the batching limits above, these hold per serve.py worker: with N workers a model
+    # admits N x ADMISSION_MAX_ACTIVE requests and a client may have N x ADMISSION_MAX_PER_IP in flight.
+    ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+    ADMISSION_MAX_ACTIVE = int(os.getenv("ADMISSION_MAX_ACTIVE", "8"))  # requests working per model
+    ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))   # requests waiting per model
+    ADMISSION_MAX_PER_IP = int(os.getenv("ADMISSION_MAX_PER_IP", "4"))  # in flight per client, 429 beyond
+    ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "5"))  # seconds, until hold times are known
+    # Seconds from arrival until generate stops and the partial result is returned; 0 for none.
+    # Clients can ask for less with the 'deadline' form field.
+    REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "120"))
+    # Input limits: request bodies are refused before they are read, extracted texts before the models
+    MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "50")) * 1024 * 1024
+    MAX_INPUT_CHARS = int(os.getenv("MAX_INPUT_CHARS", "1000000"))
+
+    # Sectional summarization: token-bounded chunks summarized in batches
+    SECTION_MAX_CONTEXT = int(os.getenv("SECTION_MAX_CONTEXT", "512"))      # model context in tokens
+    SECTION_CHUNK_TOKENS = int(os.getenv("SECTION_CHUNK_TOKENS", "0")) or None  # None fills the context
+    SECTION_CHUNK_OVERLAP = int(os.getenv("SECTION_CHUNK_OVERLAP", "32"))  # fixed windows only
+    # Content-defined chunk boundaries; per-chunk results are reused when an edited text is resubmitted
+    SECTION_INCREMENTAL = os.getenv("SECTION_INCREMENTAL", "1") == "1"
+    SECTION_BATCH_SIZE = int(os.getenv("SECTION_BATCH_SIZE", "4"))
+
+    # Decoding profiles, picked per request with the 'profile' form field. Output length bounds
+    # are these ratios of the input token count, capped at the *_LENGTH settings below.
+    DECODING_PROFILES = {
+        "fast": {"num_beams": 1, "length_penalty": 1.0, "max_ratio": 0.3, "min_ratio": 0.05},
+        "balanced": {"num_beams": 2, "length_penalty": 1.5, "max_ratio": 0.4, "min_ratio": 0.08},
+        "quality": {"num_beams": 4, "length_penalty": 2.0, "max_ratio": 0.5, "min_ratio": 0.1},
+    }
+    DECODING_PROFILE = os.getenv("DECODING_PROFILE", "quality")
+    SUMMARY_MAX_LENGTH = int(os.getenv("SUMMARY_MAX_LENGTH", "250"))
+    SUMMARY_MIN_LENGTH = int(os.getenv("SUMMARY_MIN_LENGTH", "50"))
+    SECTION_SUMMARY_MAX_LENGTH = int(os.getenv("SECTION_SUMMARY_MAX_LENGTH", "100"))
+    SECTION_SUMMARY_MIN_LENGTH = int(os.getenv("SECTION_SUMMARY_MIN_LENGTH", "30"))
+
+    # Persistent result cache shared by all worker processes
+    CACHE_ENABLED = os.getenv("CACHE_ENABLED", "1") == "1"
+    CACHE_PATH = os.getenv("CACHE_PATH", "result_cache.db")
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+    CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_MB", "512")) * 1024 * 1024
+    CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    CACHE_TOUCH_INTERVAL = float(os.getenv("CACHE_TOUCH_INTERVAL", "60"))  # seconds; hits refresh LRU order at most this often
+    # Reuse cached results of a stored near-duplicate (arXiv v1/v2, PDF vs pasted text, ...)
+    NEAR_DUPLICATE_ENABLED = os.getenv("NEAR_DUPLICATE_ENABLED", "1") == "1"
+    NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.7"))  # estimated Jaccard of word 3-grams
+
+    # Model registry: LRU eviction within a RAM budget
+    MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "4096"))
+    NER_MODEL_NAME = "NER"
+    # Comma-separated model names; these two serve every request so they stay resident by default
+    PINNED_MODELS = [m.strip() for m in os.getenv("PINNED_MODELS", "Sectional Summarizer,NER").split(",") if m.strip()]
+    # Loaded at startup in this order, so list the most needed models first
+    PRELOAD_MODELS = [m.strip() for m in os.getenv("PRELOAD_MODELS", "Sectional Summarizer,NER").split(",") if m.strip()]
+    WARMUP_IN_BACKGROUND = os.getenv("WARMUP_IN_BACKGROUND", "1") == "1"  # serve right away; /readyz reports progress
+    WARMUP_AUTOSTART = os.getenv("WARMUP_AUTOSTART", "1") == "1"  # load PRELOAD_MODELS when the app is created
+    WARMUP_INFERENCE = os.getenv("WARMUP_INFERENCE", "1") == "1"  # one tiny inference after each load
+
+    # Background jobs for long documents
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))      # seconds between queue/progress polls
+    JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(24 * 3600)))
+    JOB_QUEUE_AUTOSTART = os.getenv("JOB_QUEUE_AUTOSTART", "1") == "1"  # start job workers when the app is created
+    JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "100"))          # queued jobs in total, 503 beyond
+    JOB_MAX_QUEUED_PER_IP = int(os.getenv("JOB_MAX_QUEUED_PER_IP", "10"))  # queued jobs per client, 429 beyond
+
+    # Summary, NER and citation stages run concurrently; set PARALLEL_STAGES=0 on small boxes
+    PARALLEL_STAGES = os.getenv("PARALLEL_STAGES", "1") == "1"
+    STAGE_WORKERS = int(os.getenv("STAGE_WORKERS", "0")) or max(3, os.cpu_count() or 1)
+    TORCH_THREADS = int(os.getenv("TORCH_THREADS", "0"))  # 0 splits the cores between the model stages
+
+    # Windowed NER over full documents
+    NER_WINDOW_TOKENS = int(os.getenv("NER_WINDOW_TOKENS", "256"))  # 0 sends the whole text in one call
+    NER_WINDOW_OVERLAP = int(os.getenv("NER_WINDOW_OVERLAP", "32"))
+    NER_BATCH_SIZE = int(os.getenv("NER_BATCH_SIZE", "8"))
+
+    # History database
+    HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", "history.db")
+    HISTORY_WRITE_BEHIND = os.getenv("HISTORY_WRITE_BEHIND", "0") == "1"  # batch inserts on a background thread
+    HISTORY_WRITE_BATCH = int(os.getenv("HISTORY_WRITE_BATCH", "100"))
+    HISTORY_FLUSH_INTERVAL = float(os.getenv("HISTORY_FLUSH_INTERVAL", "0.2"))
+    HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "50"))
+    HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "200"))
+
+    # GROBID PDF parsing
+    GROBID_URL = os.getenv("GROBID_URL", "http://localhost:8070/api/processFulltextDocument")
+    GROBID_MAX_CONCURRENCY = int(os.getenv("GROBID_MAX_CONCURRENCY", "4"))
+    GROBID_RETRIES = int(os.getenv("GROBID_RETRIES", "3"))
+    GROBID_BACKOFF = float(os.getenv("GROBID_BACKOFF", "0.5"))   # seconds, doubled after each retry
+    GROBID_TIMEOUT = float(os.getenv("GROBID_TIMEOUT", "30"))
+    MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", "20"))
+
+    # Dynamic int8 quantization of the Linear layers (CPU only), opted into per model name
+    QUANTIZED_MODELS = [m.strip() for m in os.getenv("QUANTIZED_MODELS", "").split(",") if m.strip()]
+    QUANTIZED_CACHE_DIR = os.getenv("QUANTIZED_CACHE_DIR", os.path.join(MODEL_BASE_PATH, "quantized_cache"))
+
+    # Per-request stage breakdown in a Server-Timing response header (metrics are always on at /metrics)
+    SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "0") == "1"
+    # Directory where each serve.py process writes its metrics so /metrics adds them all up;
+    # serve.py makes a temporary one when unset. Empty under `python app.py` (one process).
+    METRICS_DIR = os.getenv("METRICS_DIR", "")
+    METRICS_SNAPSHOT_INTERVAL = float(os.getenv("METRICS_SNAPSHOT_INTERVAL", "5"))  # seconds between writes
+
+    # Hierarchical map-reduce summaries for documents longer than the domain models' context
+    HIERARCHICAL_CHUNK_TOKENS = int(os.getenv("HIERARCHICAL_CHUNK_TOKENS", "0")) or None  # None fills the context
+    HIERARCHICAL_OVERLAP = int(os.getenv("HIERARCHICAL_OVERLAP", "32"))
+    HIERARCHICAL_FAN_IN = int(os.getenv("HIERARCHICAL_FAN_IN", "4"))      # partial summaries per reduce input
+    HIERARCHICAL_MAX_DEPTH = int(os.getenv("HIERARCHICAL_MAX_DEPTH", "3"))  # map level + reduce levels
+    HIERARCHICAL_MAP_WORKERS = int(os.getenv("HIERARCHICAL_MAP_WORKERS", "0"))  # 0 maps in-process
+    HIERARCHICAL_PARTIAL_LENGTH = int(os.getenv("HIERARCHICAL_PARTIAL_LENGTH", "120"))  # max tokens per partial summary
+    HIERARCHICAL_PARTIAL_MIN_LENGTH = int(os.getenv("HIERARCHICAL_PARTIAL_MIN_LENGTH", "30"))
+
+    # Pre-fork serving (serve.py)
+    SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "0")) or max(1, (os.cpu_count() or 1) // 2)
+    SERVE_MAX_REQUESTS = int(os.getenv("SERVE_MAX_REQUESTS", "1000"))  # recycle a worker after this many requests; 0 never
+    SERVE_MAX_REQUESTS_JITTER = int(os.getenv("SERVE_MAX_REQUESTS_JITTER", "100"))  # so workers don't recycle together
+    SERVE_PRELOAD = os.getenv("SERVE_PRELOAD", "1") == "1"  # load models in the master so workers share them
+    SERVE_GRACEFUL_TIMEOUT = float(os.getenv("SERVE_GRACEFUL_TIMEOUT", "30"))  # seconds to finish in-flight requests
@@ -1,94 +1,799 @@
 # database/history_db.py
 
+import atexit
+import base64
+import hashlib
+import html
+import logging
+import os
+import queue
 import sqlite3
+import threading
+import time
 from datetime import datetime
 import json
+import re
+import zlib
+from utils.fingerprint import minhash_signature, band_keys, similarity, pack_signature, unpack_signature
+
+# Text blobs above this size are stored zlib-compressed
+COMPRESS_MIN_BYTES = 256
+PREVIEW_CHARS = 200
+
+# Full-text search: words of a query, the highlight markers and the snippet length in tokens.
+# snippet() marks matches with private-use characters; the text around them is HTML-escaped
+# before they become the <mark> tags, since it is the user's own raw input.
+SEARCH_WORD = re.compile(r"\w+")
+SNIPPET_MARKERS = ("\ue000", "\ue001")
+HIGHLIGHT = ("<mark>", "</mark>")
+SNIPPET_TOKENS = 16
+# The full-text index is split by IP address into this many FTS5 tables. BM25 counts the rows
+# holding each query term across the table it searches, a walk over the term's whole posting
+# list; a shard has a sixteenth of it, and its rows are a random sample of all rows, so the
+# ranking doesn't change. Changing it needs a migration that rebuilds the index.
+SEARCH_SHARDS = 16
+
+def pack_blob(text):
+    """
+    Compresses large text for storage. Compressed values are stored as BLOBs and small
+    ones as TEXT, so `unpack_blob` can tell them apart by type.
+    """
+    if text is None:
+        return None
+    data = text.encode("utf-8")
+    if len(data) < COMPRESS_MIN_BYTES:
+        return text
+    return zlib.compress(data, 6)
+
+def unpack_blob(value):
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode("utf-8")
+    return value
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def section_text(value):
+    """Section summaries as plain text for the full-text index: the values of the stored JSON object."""
+    try:
+        sections = json.loads(unpack_blob(value) or "{}")
+    except ValueError:
+        return value
+    if isinstance(sections, dict):
+        return " ".join(str(summary) for summary in sections.values())
+    return " ".join(map(str, sections)) if isinstance(sections, list) else str(sections)
+
+def entity_terms(value):
+    """The terms of the stored entities JSON, space separated, for the full-text index."""
+    try:
+        entities = json.loads(unpack_blob(value) or "[]")
+    except ValueError:
+        return None
+    if not isinstance(entities, list):
+        return None
+    return " ".join(entity["term"] for entity in entities if isinstance(entity, dict) and entity.get("term"))
+
+def search_shard(ip_address):
+    """The full-text index table holding the history of this IP address."""
+    return zlib.crc32(ip_address.encode("utf-8")) % SEARCH_SHARDS
+
+
+def highlight_snippet(snippet):
+    """HTML-escapes a snippet from snippet() and turns its match markers into HIGHLIGHT tags."""
+    if snippet is None:
+        return None
+    escaped = html.escape(snippet, quote=False)
+    return escaped.replace(SNIPPET_MARKERS[0], HIGHLIGHT[0]).replace(SNIPPET_MARKERS[1], HIGHLIGHT[1])
+
+def register_functions(conn):
+    """
+    SQL functions the schema relies on: the full-text index triggers read texts through them,
+    so every connection that writes history needs them.
+    """
+    conn.create_function("unpack_blob", 1, unpack_blob, deterministic=True)
+    conn.create_function("section_text", 1, section_text, deterministic=True)
+    conn.create_function("entity_terms", 1, entity_terms, deterministic=True)
+    conn.create_function("search_shard", 1, search_shard, deterministic=True)
+
+def _migrate_compressed_storage(conn):
+    """
+    Moves original texts into a content-addressed 'documents' table and compresses
+    original texts, citations and entities.
+    """
+    conn.execute("""
+        CREATE TABLE documents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            content_hash TEXT NOT NULL UNIQUE,
+            body BLOB NOT NULL,
+            preview TEXT NOT NULL,
+            size INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE history_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ip_address TEXT NOT NULL,
+            document_id INTEGER NOT NULL REFERENCES documents (id),
+            summary TEXT NOT NULL,
+            citations BLOB,
+            entities BLOB,
+            section_summaries TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    rows = conn.execute("""
+        SELECT id, ip_address, original_text, summary, citations, entities, section_summaries, timestamp
+        FROM history ORDER BY id
+    """)
+    while True:
+        batch = rows.fetchmany(1000)
+        if not batch:
+            break
+        for row in batch:
+            document_id = _store_document(conn, row[2])
+            conn.execute("""
+                INSERT INTO history_new (id, ip_address, document_id, summary, citations, entities, section_summaries, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (row[0], row[1], document_id, row[3], pack_blob(row[4]), pack_blob(row[5]), row[6], row[7]))
+    conn.execute("DROP TABLE history")
+    conn.execute("ALTER TABLE history_new RENAME TO history")
+    conn.execute("CREATE INDEX idx_history_ip_timestamp ON history (ip_address, timestamp)")
+    conn.execute("CREATE INDEX idx_history_document ON history (document_id)")
+    # Drop a document once no history row references it any more
+    conn.execute("""
+        CREATE TRIGGER history_document_gc AFTER DELETE ON history
+        WHEN NOT EXISTS (SELECT 1 FROM history WHERE document_id = old.document_id)
+        BEGIN
+            DELETE FROM documents WHERE id = old.document_id;
+        END
+    """)
+
+def _store_document(conn, text, index=False):
+    """
+    Stores the text once per distinct content and returns its document id.
+
+    :param index: Also add a new document to the near-duplicate index (schema version 4)
+    """
+    digest = content_hash(text)
+    row = conn.execute("SELECT id FROM documents WHERE content_hash = ?", (digest,)).fetchone()
+    if row is not None:
+        return row[0]
+    cursor = conn.execute(
+        "INSERT OR IGNORE INTO documents (content_hash, body, preview, size) VALUES (?, ?, ?, ?)",
+        (digest, zlib.compress(text.encode("utf-8"), 6), text[:PREVIEW_CHARS], len(text))
+    )
+    if cursor.rowcount:
+        if index:
+            _index_document(conn, cursor.lastrowid, text)
+        return cursor.lastrowid
+    # Another connection stored the same document in the meantime
+    return conn.execute("SELECT id FROM documents WHERE content_hash = ?", (digest,)).fetchone()[0]
+
+def _index_document(conn, document_id, text):
+    """
+    Stores the MinHash signature of a document and its LSH band keys. Texts too short to
+    fingerprint aren't indexed.
+    """
+    signature = minhash_signature(text)
+    if signature is None:
+        return
+    conn.execute(
+        "INSERT OR REPLACE INTO document_fingerprints (document_id, signature) VALUES (?, ?)",
+        (document_id, pack_signature(signature))
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO document_bands (band_key, document_id) VALUES (?, ?)",
+        [(key, document_id) for key in band_keys(signature)]
+    )
+
+def _migrate_fingerprint_index(conn):
+    """
+    Adds the near-duplicate index and fills it for the stored documents. Band rows of deleted
+    documents are left behind and dropped by the first lookup that runs into them.
+    """
+    conn.execute("""
+        CREATE TABLE document_fingerprints (
+            document_id INTEGER PRIMARY KEY REFERENCES documents (id),
+            signature BLOB NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE document_bands (
+            band_key INTEGER NOT NULL,
+            document_id INTEGER NOT NULL,
+            PRIMARY KEY (band_key, document_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TRIGGER document_fingerprint_gc AFTER DELETE ON documents
+        BEGIN
+            DELETE FROM document_fingerprints WHERE document_id = old.id;
+        END
+    """)
+    rows = conn.execute("SELECT id, body FROM documents ORDER BY id")
+    while True:
+        batch = rows.fetchmany(1000)
+        if not batch:
+            break
+        for document_id, body in batch:
+            _index_document(conn, document_id, zlib.decompress(body).decode("utf-8"))
+
+def _migrate_full_text_search(conn):
+    """
+    Adds an FTS5 index over original texts, summaries, section summaries and entity terms.
+
+    The index is external-content: it reads the texts from the 'history_search_source' view,
+    which decompresses them, so nothing is stored twice. The 'owner' column holds one token per
+    IP address, which lets a search be scoped to its caller inside the full-text query itself.
+    The index is split into SEARCH_SHARDS tables by IP address, each kept in sync by its own triggers.
+    """
+    conn.execute("""
+        CREATE VIEW history_search_source AS
+        SELECT
+            h.id AS id,
+            'u' || hex(h.ip_address) AS owner,
+            unpack_blob(d.body) AS original_text,
+            h.summary AS summary,
+            section_text(h.section_summaries) AS section_summaries,
+            entity_terms(h.entities) AS entities
+        FROM history h JOIN documents d ON d.id = h.document_id
+    """)
+    columns = "owner, original_text, summary, section_summaries, entities"
+    for shard in range(SEARCH_SHARDS):
+        table = f"history_fts_{shard}"
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE {table} USING fts5(
+                {columns},
+                content='history_search_source', content_rowid='id', tokenize='porter unicode61'
+            )
+        """)
+        # BM25 weights per column: matches in summaries and entities count more than in the full text
+        conn.execute(f"INSERT INTO {table} ({table}, rank) VALUES ('rank', 'bm25(0.0, 1.0, 4.0, 3.0, 2.0)')")
+        conn.execute(f"""
+            CREATE TRIGGER {table}_insert AFTER INSERT ON history
+            WHEN search_shard(new.ip_address) = {shard}
+            BEGIN
+                INSERT INTO {table} (rowid, {columns})
+                SELECT id, {columns} FROM history_search_source WHERE id = new.id;
+            END
+        """)
+        # BEFORE, so the document is still there to read the indexed text back from
+        conn.execute(f"""
+            CREATE TRIGGER {table}_delete BEFORE DELETE ON history
+            WHEN search_shard(old.ip_address) = {shard}
+            BEGIN
+                INSERT INTO {table} ({table}, rowid, {columns})
+                SELECT 'delete', id, {columns} FROM history_search_source WHERE id = old.id;
+            END
+        """)
+        # Not 'rebuild': that would index every row of the view, not only this shard's
+        conn.execute(f"""
+            INSERT INTO {table} (rowid, {columns})
+            SELECT id, {columns} FROM history_search_source
+            WHERE id IN (SELECT id FROM history WHERE search_shard(ip_address) = ?)
+        """, (shard,))
+
+# Applied in order on startup; PRAGMA user_version records the last applied version
+MIGRATIONS = [
+    (1, [
+        """
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ip_address TEXT NOT NULL,
+            original_text TEXT NOT NULL,
+            summary TEXT NOT NULL,
+            citations TEXT,
+            entities TEXT,
+            section_summaries TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            ip_address TEXT NOT NULL,
+            params TEXT,
+            input_text TEXT,
+            input_filename TEXT,
+            input_file BLOB,
+            progress TEXT NOT NULL DEFAULT '[]',
+            result TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            finished_at REAL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at)",
+    ]),
+    (2, [
+        # get_history_by_ip filters on ip_address and sorts on timestamp
+        "CREATE INDEX IF NOT EXISTS idx_history_ip_timestamp ON history (ip_address, timestamp)",
+    ]),
+    (3, [_migrate_compressed_storage]),
+    (4, [_migrate_fingerprint_index]),
+    (5, [_migrate_full_text_search]),
+]
+
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",    # WAL stays consistent; only the last commits can be lost on power failure
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",     # 20 MB page cache per connection
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=5000",
+]
 
 class HistoryDB:
-    def __init__(self, db_path="history.db"):
+    def __init__(self, db_path="history.db", write_behind=False, write_batch_size=100, flush_interval=0.2):
+        """
+        :param db_path: Path to the SQLite database file
+        :param write_behind: Queue save_summary inserts and commit them in batches from a background thread
+        :param write_batch_size: Maximum number of inserts per background commit
+        :param flush_interval: Seconds the background thread waits for more inserts before committing
+        """
         self.db_path = db_path
+        self.write_behind = write_behind
+        self.write_batch_size = write_batch_size
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._write_queue = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
         self._initialize_db()
+        if write_behind:
+            atexit.register(self.close)
+
+    def _connection(self):
+        """
+        Returns this thread's connection, opening it on first use. Connections are reused
+        across calls; they are reopened after a fork because SQLite handles can't be shared.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            register_functions(conn)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
 
     def _initialize_db(self):
         """
-        Initializes the SQLite database and creates the 'history' table if it doesn't exist.
+        Initializes the SQLite database and applies pending schema migrations.
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    ip_address TEXT NOT NULL,
-                    original_text TEXT NOT NULL,
-                    summary TEXT NOT NULL,
-                    citations TEXT,
-                    entities TEXT,
-                    section_summaries TEXT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            conn.commit()
+        conn = self._connection()
+        for target, statements in MIGRATIONS:
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= target:
+                continue
+            # One transaction per migration, user_version included: sqlite3 would otherwise
+            # autocommit the DDL, and a crash halfway left a schema no startup could migrate.
+            # IMMEDIATE takes the write lock up front, so a process starting alongside waits
+            # and then sees the new version instead of applying the migration again.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("PRAGMA user_version").fetchone()[0] >= target:
+                    conn.rollback()
+                    continue
+                for statement in statements:
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {target}")
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            logging.info(f"Migrated {self.db_path} to schema version {target}")
 
-    def save_summary(self, ip_address, original_text, summary, citations=None, entities=None, section_summaries=None):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO history (ip_address, original_text, summary, citations, entities, section_summaries ,timestamp)
+    def _insert_rows(self, conn, rows):
+        for ip_address, original_text, summary, citations, entities, section_summaries, timestamp in rows:
+            document_id = _store_document(conn, original_text, index=True)
+            conn.execute("""
+                INSERT INTO history (ip_address, document_id, summary, citations, entities, section_summaries, timestamp)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (ip_address, original_text, summary, citations, entities, section_summaries, datetime.now()))
+            """, (ip_address, document_id, summary, pack_blob(citations), pack_blob(entities), section_summaries, timestamp))
+
+    def save_summary(self, ip_address, original_text, summary, citations=None, entities=None, section_summaries=None):
+        row = (ip_address, original_text, summary, citations, entities, section_summaries, datetime.now())
+        if self.write_behind:
+            self._ensure_writer()
+            self._write_queue.put(row)
+            return
+        with self._connection() as conn:
+            self._insert_rows(conn, [row])
             conn.commit()
 
+    # --- Write-behind batching ---
 
-    def get_history_by_ip(self, ip_address):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, original_text, summary, citations, entities, section_summaries, timestamp
-                FROM history
-                WHERE ip_address = ?
-                ORDER BY timestamp DESC
-            """, (ip_address,))
-            rows = cursor.fetchall()
-
-            # Check if rows is empty
-            if not rows:
-                return []  # Return an empty list if no history entries are found
-
-            # Process each row
-            history_data = []
-            for row in rows:
+    def _ensure_writer(self):
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            row = self._write_queue.get()
+            if row is None:
+                self._write_queue.task_done()
+                return
+            batch = [row]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.write_batch_size:
+                try:
+                    row = self._write_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if row is None:
+                    stop = True
+                    break
+                batch.append(row)
+            try:
+                with self._connection() as conn:
+                    self._insert_rows(conn, batch)
+                    conn.commit()
+            except sqlite3.Error as e:
+                logging.error(f"Failed to write {len(batch)} history rows: {e}")
+            finally:
+                for _ in range(len(batch) + stop):
+                    self._write_queue.task_done()
+            if stop:
+                return
+
+    def flush(self):
+        """
+        Blocks until every queued insert has been committed.
+        """
+        if self._writer is not None and self._writer.is_alive():
+            self._write_queue.join()
+
+    def close(self):
+        """
+        Commits pending inserts and stops the background writer.
+        """
+        if self._writer is not None and self._writer.is_alive():
+            self._write_queue.put(None)
+            self._writer.join()
+
+
+    # Columns each projectable history field needs
+    HISTORY_FIELDS = {
+        "id": "h.id",
+        "timestamp": "h.timestamp",
+        "preview": "d.preview",
+        "original_text": "d.body",
+        "summary": "h.summary",
+        "citations": "h.citations",
+        "entities": "h.entities",
+        "section_summaries": "h.section_summaries",
+    }
+    FULL_FIELDS = ("id", "original_text", "summary", "citations", "entities", "section_summaries", "timestamp")
+    LIST_FIELDS = ("id", "timestamp", "preview", "summary", "section_summaries")
+
+    @staticmethod
+    def encode_cursor(timestamp, item_id):
+        return base64.urlsafe_b64encode(json.dumps([timestamp, item_id]).encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            timestamp, item_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            return str(timestamp), int(item_id)
+        except (ValueError, TypeError):
+            raise ValueError("Invalid cursor.")
+
+    def _history_item(self, fields, row):
+        item = {}
+        for field, value in zip(fields, row):
+            if field == "section_summaries":
                 try:
                     # Deserialize the section_summaries column (JSON string)
-                    sections = json.loads(row[5])  # row[5] corresponds to section_summaries
+                    value = json.loads(value)
                 except (TypeError, ValueError):
                     # If deserialization fails, treat it as a regular summary (string)
-                    sections = row[5]
-
-                # Append the processed row as a dictionary
-                history_data.append({
-                    "id": row[0],
-                    "original_text": row[1],
-                    "summary": row[2],
-                    "citations": row[3],
-                    "entities": row[4],
-                    "section_summaries": sections,
-                    "timestamp": row[6],  # row[6] corresponds to timestamp
-                })
-
-            return history_data
-
-        
+                    pass
+            elif field in ("original_text", "citations", "entities"):
+                value = unpack_blob(value)
+            item[field] = value
+        return item
+
+    def get_history_page(self, ip_address, limit=50, cursor=None, fields=FULL_FIELDS):
+        """
+        Returns one page of history, newest first, using keyset pagination on (timestamp, id).
+
+        :param limit: Page size; None returns everything after the cursor
+        :param cursor: Opaque cursor from a previous page's `next_cursor`
+        :param fields: Fields to return, from HISTORY_FIELDS
+        :return: (list of history items, next_cursor or None on the last page)
+        """
+        unknown = set(fields) - set(self.HISTORY_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown history fields: {', '.join(sorted(unknown))}")
+
+        # Let the caller see its own queued writes
+        self.flush()
+
+        columns = ", ".join([self.HISTORY_FIELDS[f] for f in fields] + ["h.timestamp", "h.id"])
+        query = f"""
+            SELECT {columns}
+            FROM history h JOIN documents d ON d.id = h.document_id
+            WHERE h.ip_address = ?
+        """
+        params = [ip_address]
+        if cursor:
+            timestamp, item_id = self.decode_cursor(cursor)
+            query += " AND (h.timestamp < ? OR (h.timestamp = ? AND h.id < ?))"
+            params += [timestamp, timestamp, item_id]
+        query += " ORDER BY h.timestamp DESC, h.id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit + 1)
+
+        with self._connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self.encode_cursor(rows[-1][-2], rows[-1][-1])
+        return [self._history_item(fields, row[:-2]) for row in rows], next_cursor
+
+    def get_history_by_ip(self, ip_address):
+        history_data, _ = self.get_history_page(ip_address, limit=None)
+        return history_data
+
+    def get_history_item(self, ip_address, item_id, fields=FULL_FIELDS):
+        """
+        Returns a single history item of this IP, including the full original text, or None.
+        """
+        columns = ", ".join(self.HISTORY_FIELDS[f] for f in fields)
+        self.flush()
+        with self._connection() as conn:
+            row = conn.execute(f"""
+                SELECT {columns}
+                FROM history h JOIN documents d ON d.id = h.document_id
+                WHERE h.ip_address = ? AND h.id = ?
+            """, (ip_address, item_id)).fetchone()
+        return self._history_item(fields, row) if row else None
+
     def clear_history(self, ip_address):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM history WHERE ip_address = ?", (ip_address,))
             conn.commit()
 
     def delete_history_item(self, ip_address, item_id):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "DELETE FROM history WHERE ip_address = ? AND id = ?",
                 (ip_address, item_id)
             )
             conn.commit()
+
+    # --- Full-text search ---
+
+    @staticmethod
+    def build_match_query(ip_address, query):
+        """
+        FTS5 query for a user's search within that IP's rows: every word must match, in any
+        inflection (the index is stemmed). Words are quoted, so FTS5 syntax in the input is taken
+        literally. Prefix queries aren't offered: FTS5 merges a prefix's matches over all users
+        before the owner filter applies, which takes seconds on a large table.
+        """
+        terms = [f'"{word}"' for word in SEARCH_WORD.findall(query)]
+        if not terms:
+            raise ValueError("The search query has no words.")
+        owner = "u" + ip_address.encode("utf-8").hex().upper()  # same token as hex() in the view
+        return f'owner : "{owner}" AND ({" ".join(terms)})'
+
+    def search_history(self, ip_address, query, limit=20, offset=0):
+        """
+        Searches this IP's history: original texts, summaries, section summaries and entity terms.
+        Results are ranked by BM25, best first, with a highlighted snippet of the summary, the section
+        summaries or else the original text. Entity terms count toward the rank but are no snippet
+        source: the indexed column is a bare list of lowercased terms, not a passage to read.
+
+        :return: (list of {"id", "timestamp", "preview", "summary", "snippet", "score"}, next_offset or None)
+        """
+        match = self.build_match_query(ip_address, query)
+        table = f"history_fts_{search_shard(ip_address)}"
+        self.flush()
+        with self._connection() as conn:
+            rows = conn.execute(f"""
+                SELECT f.rowid, h.timestamp, d.preview, h.summary,
+                       snippet({table}, 2, ?, ?, '…', ?),
+                       snippet({table}, 3, ?, ?, '…', ?),
+                       snippet({table}, 1, ?, ?, '…', ?),
+                       f.rank
+                FROM {table} f
+                JOIN history h ON h.id = f.rowid
+                JOIN documents d ON d.id = h.document_id
+                WHERE {table} MATCH ?
+                ORDER BY f.rank
+                LIMIT ? OFFSET ?
+            """, (*SNIPPET_MARKERS, SNIPPET_TOKENS) * 3 + (match, limit + 1, offset)).fetchall()
+
+        next_offset = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_offset = offset + limit
+        results = []
+        for item_id, timestamp, preview, summary, *snippets, score in rows:
+            # Summaries first, then the full text
+            snippet = next((s for s in snippets if s and SNIPPET_MARKERS[0] in s), snippets[-1])
+            results.append({
+                "id": item_id,
+                "timestamp": timestamp,
+                "preview": preview,
+                "summary": summary,
+                "snippet": highlight_snippet(snippet),
+                "score": round(-score, 4),
+            })
+        return results, next_offset
+
+    # --- Near-duplicate documents ---
+
+    def find_near_duplicate(self, text, threshold=0.7, signature=None):
+        """
+        Finds a stored document whose estimated Jaccard similarity to `text` (over word
+        3-grams) is at least `threshold`. Candidates come from the LSH band index, so only
+        documents sharing a band are compared.
+
+        :param signature: Precomputed `minhash_signature(text)`
+        :return: {"document_id", "content_hash", "similarity"} of the most similar document, or None
+        """
+        signature = signature or minhash_signature(text)
+        if signature is None:
+            return None
+        keys = band_keys(signature)
+        with self._connection() as conn:
+            rows = conn.execute(f"""
+                SELECT DISTINCT b.document_id, f.signature, d.content_hash
+                FROM document_bands b
+                LEFT JOIN document_fingerprints f ON f.document_id = b.document_id
+                LEFT JOIN documents d ON d.id = b.document_id
+                WHERE b.band_key IN ({", ".join("?" * len(keys))})
+            """, keys).fetchall()
+
+            best, stale = None, []
+            for document_id, stored, digest in rows:
+                if stored is None:
+                    stale.append(document_id)
+                    continue
+                score = similarity(signature, unpack_signature(stored))
+                if score >= threshold and (best is None or score > best["similarity"]):
+                    best = {"document_id": document_id, "content_hash": digest, "similarity": score}
+            if stale:
+                conn.executemany(
+                    "DELETE FROM document_bands WHERE band_key = ? AND document_id = ?",
+                    [(key, document_id) for document_id in stale for key in keys]
+                )
+                conn.commit()
+        return best
+
+    def get_document_text(self, document_id):
+        with self._connection() as conn:
+            row = conn.execute("SELECT body FROM documents WHERE id = ?", (document_id,)).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    # --- Background jobs ---
+
+    JOB_COLUMNS = "id, kind, status, ip_address, params, progress, result, error, created_at, updated_at, finished_at"
+
+    def create_job(self, job_id, kind, ip_address, params=None, input_text=None, input_filename=None, input_file=None):
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute("""
+                INSERT INTO jobs (id, kind, ip_address, params, input_text, input_filename, input_file, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (job_id, kind, ip_address, json.dumps(params or {}), input_text, input_filename, input_file, now, now))
+            conn.commit()
+
+    def _job_from_row(self, row):
+        return {
+            "id": row[0],
+            "kind": row[1],
+            "status": row[2],
+            "ip_address": row[3],
+            "params": json.loads(row[4]) if row[4] else {},
+            "progress": json.loads(row[5]),
+            "result": json.loads(row[6]) if row[6] else None,
+            "error": row[7],
+            "created_at": row[8],
+            "updated_at": row[9],
+            "finished_at": row[10],
+        }
+
+    def get_job(self, job_id):
+        with self._connection() as conn:
+            row = conn.execute(f"SELECT {self.JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            return self._job_from_row(row) if row else None
+
+    def get_job_input(self, job_id):
+        """
+        Returns (input_text, input_filename, input_file) for a job.
+        """
+        with self._connection() as conn:
+            return conn.execute(
+                "SELECT input_text, input_filename, input_file FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+
+    def count_queued_jobs(self, ip_address=None):
+        """Number of jobs waiting for a worker, in total or for one IP."""
+        query, params = "SELECT COUNT(*) FROM jobs WHERE status = 'queued'", ()
+        if ip_address is not None:
+            query, params = query + " AND ip_address = ?", (ip_address,)
+        with self._connection() as conn:
+            return conn.execute(query, params).fetchone()[0]
+
+    def claim_next_job(self):
+        """
+        Atomically moves the oldest queued job to 'running' and returns it, or None if the queue is empty.
+        """
+        conn = self._connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?", (time.time(), row[0])
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return self.get_job(row[0]) if row is not None else None
+
+    def append_job_progress(self, job_id, event):
+        with self._connection() as conn:
+            conn.execute("""
+                UPDATE jobs SET progress = json_insert(progress, '$[#]', json(?)), updated_at = ?
+                WHERE id = ?
+            """, (json.dumps(event), time.time(), job_id))
+            conn.commit()
+
+    def finish_job(self, job_id, result=None, error=None):
+        """
+        Stores the job result (status 'done') or error (status 'failed') and drops its input.
+        Any error given, even an empty one, marks the job failed.
+        """
+        now = time.time()
+        status = "failed" if error is not None else "done"
+        with self._connection() as conn:
+            conn.execute("""
+                UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ?, finished_at = ?,
+                                input_text = NULL, input_file = NULL
+                WHERE id = ?
+            """, (status, json.dumps(result) if result is not None else None, error, now, now, job_id))
+            conn.commit()
+
+    def requeue_interrupted_jobs(self):
+        """
+        Puts jobs that were running when the process stopped back in the queue.
+        """
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', progress = '[]', updated_at = ? WHERE status = 'running'",
+                (time.time(),)
+            )
+            conn.commit()
+            return cursor.rowcount
+
+    def delete_finished_jobs(self, older_than):
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (older_than,)
+            )
+            conn.commit()
+            return cursor.rowcount
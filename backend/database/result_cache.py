@@ -0,0 +1,250 @@
+# database/result_cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from utils.metrics import cache_requests
+
+
+class ResultCache:
+    """
+    Content-addressed cache for summaries, citations and entities.
+
+    Entries live in SQLite so every worker process shares them and they survive restarts.
+    Eviction is by TTL first, then least-recently-used until the entry and byte limits hold.
+    A hit refreshes the entry's last access at most every `touch_interval` seconds, so
+    repeated hits on a hot entry are reads only.
+    """
+
+    KEY_VERSION = "v1"
+
+    def __init__(self, db_path="result_cache.db", max_entries=10000, max_bytes=512 * 1024 * 1024,
+                 ttl_seconds=7 * 24 * 3600, evict_every=50, touch_interval=60):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.evict_every = evict_every
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+        self._initialize_db()
+
+    def _connection(self):
+        """
+        Returns this thread's connection, opening it on first use. Like HistoryDB's, it is
+        reused across calls and reopened after a fork.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _touch(self, conn, keys, now):
+        """Refreshes last_access of the given keys whose last refresh is older than `touch_interval`."""
+        if keys:
+            conn.executemany(
+                "UPDATE result_cache SET last_access = ? WHERE key = ? AND last_access < ?",
+                [(now, key, now - self.touch_interval) for key in keys],
+            )
+            conn.commit()
+
+    def _initialize_db(self):
+        """
+        Creates the 'result_cache' table if it doesn't exist.
+        """
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS result_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_result_cache_last_access ON result_cache (last_access)")
+            conn.commit()
+
+    @classmethod
+    def make_key(cls, namespace, text, model_name="", params=None):
+        """
+        Hashes the (preprocessed) text together with the model and generation parameters.
+        """
+        digest = hashlib.sha256()
+        header = json.dumps([cls.KEY_VERSION, namespace, model_name, params or {}], sort_keys=True)
+        digest.update(header.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, namespace, text, model_name="", params=None):
+        """
+        Returns the cached value, or None on a miss.
+        """
+        key = self.make_key(namespace, text, model_name, params)
+        now = time.time()
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT value, created_at, last_access FROM result_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] <= self.ttl_seconds:
+                if now - row[2] >= self.touch_interval:
+                    self._touch(conn, [key], now)
+                with self._lock:
+                    self._hits += 1
+                cache_requests.inc(namespace=namespace, result="hit")
+                return json.loads(row[0])
+
+        with self._lock:
+            self._misses += 1
+        cache_requests.inc(namespace=namespace, result="miss")
+        return None
+
+    def get_many(self, namespace, texts, model_name="", params=None):
+        """
+        Looks up several texts with one query. Returns a list with the cached value or None per text.
+        """
+        keys = [self.make_key(namespace, text, model_name, params) for text in texts]
+        if not keys:
+            return []
+        now = time.time()
+        found = {}
+        stale = []
+        with self._connection() as conn:
+            # SQLite caps bound parameters per statement
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT key, value, created_at, last_access FROM result_cache "
+                    f"WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, value, created_at, last_access in rows:
+                    if now - created_at <= self.ttl_seconds:
+                        found[key] = value
+                        if now - last_access >= self.touch_interval:
+                            stale.append(key)
+            self._touch(conn, stale, now)
+
+        values = [json.loads(found[key]) if key in found else None for key in keys]
+        hits = sum(value is not None for value in values)
+        with self._lock:
+            self._hits += hits
+            self._misses += len(values) - hits
+        if hits:
+            cache_requests.inc(hits, namespace=namespace, result="hit")
+        if len(values) > hits:
+            cache_requests.inc(len(values) - hits, namespace=namespace, result="miss")
+        return values
+
+    def set(self, namespace, text, value, model_name="", params=None):
+        self.set_many(namespace, [(text, value)], model_name, params)
+
+    def set_many(self, namespace, items, model_name="", params=None):
+        """Stores (text, value) pairs in one transaction."""
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for text, value in items:
+            payload = json.dumps(value, ensure_ascii=False)
+            rows.append((self.make_key(namespace, text, model_name, params), payload, len(payload.encode("utf-8")), now, now))
+        with self._connection() as conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO result_cache (key, value, size, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+            conn.commit()
+
+        with self._lock:
+            before = self._writes
+            self._writes += len(rows)
+            should_evict = self._writes // self.evict_every > before // self.evict_every
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        """
+        Drops expired entries, then the least recently used ones until the size limits hold.
+        """
+        with self._connection() as conn:
+            conn.execute("DELETE FROM result_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+
+            count, total_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM result_cache"
+            ).fetchone()
+            if count > self.max_entries:
+                conn.execute("""
+                    DELETE FROM result_cache WHERE key IN (
+                        SELECT key FROM result_cache ORDER BY last_access ASC LIMIT ?
+                    )
+                """, (count - self.max_entries,))
+                total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM result_cache").fetchone()[0]
+
+            if total_bytes > self.max_bytes:
+                excess = total_bytes - self.max_bytes
+                rows = conn.execute("SELECT key, size FROM result_cache ORDER BY last_access ASC")
+                doomed = []
+                for key, size in rows:
+                    if excess <= 0:
+                        break
+                    doomed.append((key,))
+                    excess -= size
+                conn.executemany("DELETE FROM result_cache WHERE key = ?", doomed)
+            conn.commit()
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM result_cache")
+            conn.commit()
+
+    def stats(self):
+        with self._connection() as conn:
+            count, total_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM result_cache"
+            ).fetchone()
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "entries": count,
+                "bytes": total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+class ChunkStore:
+    """
+    Per-chunk results of one pipeline stage in the cache, keyed by chunk text. A resubmitted
+    document with small edits then only recomputes the chunks that changed.
+    `reused` counts the chunks found so far.
+    """
+
+    def __init__(self, cache, namespace, model_name="", params=None):
+        self.cache = cache
+        self.namespace = namespace
+        self.model_name = model_name
+        self.params = params
+        self.reused = 0
+
+    def get_many(self, texts):
+        values = self.cache.get_many(self.namespace, texts, self.model_name, self.params)
+        self.reused += sum(value is not None for value in values)
+        return values
+
+    def set_many(self, items):
+        self.cache.set_many(self.namespace, items, self.model_name, self.params)
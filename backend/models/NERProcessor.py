@@ -1,15 +1,25 @@
-from transformers import pipeline
+from config import Config
+from models.registry import model_registry, WARMUP_TEXT
+from models.quantization import load_model
+from utils.chunking import content_defined_split
+from utils.metrics import timed
 import json
 
 
 class NERProcessor:
-    def __init__(self, model_path: str):
+    def __init__(self, model_path: str, name: str = Config.NER_MODEL_NAME, quantize: bool = None):
         """
         Инициализация процессора NER.
         
         :param model_path: Путь к папке с моделью
+        :param name: Имя модели в реестре моделей
+        :param quantize: int8-квантизация линейных слоёв; по умолчанию берётся из Config.QUANTIZED_MODELS
         """
-        self.ner_pipeline = pipeline("ner", model=model_path, tokenizer=model_path)
+        self.model_name = name
+        # Прогревочный прогон на короткой фразе сразу после загрузки
+        model_registry.register(
+            name, lambda: self._build_pipeline(model_path, quantize), warmup=lambda ner: ner(WARMUP_TEXT), path=model_path
+        )
         self.known_locations = {"canada", "montréal", "québec", "toronto", "usa", "germany", "france", "london"}
         self.blacklist_terms = {
             "i", "an", "update", "to", "this", "article", "is", "included", "at", "the",
@@ -18,83 +28,192 @@ class NERProcessor:
         }
         self.blacklist_types = {"BEL_0", "BEL_1", "O", "MISC"}
 
+    def _build_pipeline(self, model_path, quantize):
+        # transformers грузится только вместе с моделью, чтобы импорт модуля был быстрым
+        from transformers import pipeline, AutoTokenizer, AutoModelForTokenClassification
+
+        model = load_model(AutoModelForTokenClassification, model_path, self.model_name, quantize=quantize)
+        tokenizer = AutoTokenizer.from_pretrained(model_path)
+        return pipeline("ner", model=model, tokenizer=tokenizer)
+
+    @property
+    def ner_pipeline(self):
+        """Пайплайн берётся из реестра, чтобы его можно было выгрузить из памяти"""
+        return model_registry.get(self.model_name)
+
+    # Маппинг типов
+    label_map = {
+        "PER": "PERSON",
+        "ORG": "ORGANIZATION",
+        "LOC": "LOCATION",
+        "GPE": "LOCATION",
+        "MISC": "METHOD"
+    }
+
     def _postprocess(self, results):
-        """Склеивает субтокены и улучшает типы"""
-        merged_tokens = []
+        """
+        Склеивает субтокены, маппит и улучшает типы (например, Canada → LOCATION)
+        и фильтрует шум за один проход.
+
+        :return: Список уникальных сущностей с количеством вхождений и позициями в тексте
+        """
+        entities = {}
+
+        def emit(term, label, span):
+            term = term.strip()
+            entity_type = self.label_map.get(label[2:], label[2:])
+            lowered = term.lower()
+            if entity_type == "ORGANIZATION" and lowered in self.known_locations:
+                entity_type = "LOCATION"
+            if lowered in self.blacklist_terms or entity_type in self.blacklist_types:
+                return
+            entity = entities.get((term, entity_type))
+            if entity is None:
+                entity = entities[(term, entity_type)] = {"term": term, "type": entity_type, "count": 0, "spans": []}
+            entity["count"] += 1
+            if span[0] is not None:
+                entity["spans"].append(span)
+
         current_token = ""
         current_label = ""
+        current_span = [None, None]
 
         for res in results:
             token = res["word"]
             label = res["entity"]
 
-            if label.startswith("B-"):
-                if current_token:
-                    merged_tokens.append({"term": current_token.strip(), "type": current_label[2:]})
-                current_token = token
-                current_label = label
-            elif label.startswith("I-") and current_label and label[2:] == current_label[2:]:
+            if label.startswith("I-") and current_label and label[2:] == current_label[2:]:
                 if token.startswith("##"):
                     current_token += token[2:]
                 else:
                     current_token += " " + token
+                current_span[1] = res.get("end")
             else:
+                # B- или новый тип: закрываем текущую сущность
                 if current_token:
-                    merged_tokens.append({"term": current_token.strip(), "type": current_label[2:]})
+                    emit(current_token, current_label, current_span)
                 current_token = token
                 current_label = label
+                current_span = [res.get("start"), res.get("end")]
 
         if current_token:
-            merged_tokens.append({"term": current_token.strip(), "type": current_label[2:]})
-
-        # Маппинг типов
-        label_map = {
-            "PER": "PERSON",
-            "ORG": "ORGANIZATION",
-            "LOC": "LOCATION",
-            "GPE": "LOCATION",
-            "MISC": "METHOD"
-        }
+            emit(current_token, current_label, current_span)
 
-        remapped_entities = [
-            {"term": e["term"], "type": label_map.get(e["type"], e["type"])} 
-            for e in merged_tokens
-        ]
+        return list(entities.values())
 
-        return remapped_entities
+    def _clamp_window(self, window_size):
+        """
+        Окно не длиннее, чем модель принимает за раз вместе со служебными токенами:
+        иначе пайплайн молча обрежет окно и потеряет сущности в его конце.
+        """
+        tokenizer = self.ner_pipeline.tokenizer
+        max_length = tokenizer.model_max_length
+        if not max_length or max_length > 1_000_000:
+            # Токенизатор без заданного предела
+            return window_size
+        return min(window_size, max_length - tokenizer.num_special_tokens_to_add())
 
+    def _windowed_ner(self, text, window_size, batch_size):
+        """
+        Прогоняет текст через пайплайн перекрывающимися окнами из `window_size` токенов пакетами
+        по `batch_size`. Позиции сущностей переводятся в координаты исходного текста;
+        в зоне перекрытия токен берётся из того окна, к центру которого он ближе.
+        """
+        pipe = self.ner_pipeline
+        tokenizer = pipe.tokenizer
+        if not getattr(tokenizer, "is_fast", False):
+            # Без offset mapping окна нельзя сопоставить с текстом
+            return pipe(text)
 
-    def _improve_types(self, entities):
-        """Улучшает типы (например, Canada → LOCATION)"""
-        improved = []
-        for entity in entities:
-            term = entity["term"].lower()
-            if entity["type"] == "ORGANIZATION" and term in self.known_locations:
-                improved.append({"term": entity["term"], "type": "LOCATION"})
-            else:
-                improved.append(entity)
-        return improved
+        offsets = tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+        )["offset_mapping"]
+        if not offsets:
+            return []
+
+        window_size = self._clamp_window(window_size)
+        overlap = min(Config.NER_WINDOW_OVERLAP, window_size // 2)
+        step = window_size - overlap
+        starts = list(range(0, max(len(offsets) - overlap, 1), step))
+        ends = [min(start + window_size, len(offsets)) for start in starts]
+
+        windows = []
+        for i, (start, end) in enumerate(zip(starts, ends)):
+            # Граница владения — середина перекрытия с соседним окном
+            keep_from = 0 if i == 0 else offsets[(start + ends[i - 1]) // 2][0]
+            keep_until = len(text) if i == len(starts) - 1 else offsets[(starts[i + 1] + end) // 2][0]
+            windows.append((offsets[start][0], offsets[end - 1][1], keep_from, keep_until))
+
+        window_results = pipe([text[w[0]:w[1]] for w in windows], batch_size=batch_size)
+
+        merged = []
+        for (char_start, _, keep_from, keep_until), results in zip(windows, window_results):
+            for res in results:
+                start = res["start"] + char_start
+                if keep_from <= start < keep_until:
+                    merged.append({**res, "start": start, "end": res["end"] + char_start})
+        merged.sort(key=lambda res: res["start"])
+        return merged
 
-    def _filter_noise(self, entities):
-        """Фильтрация шума и нежелательных терминов"""
-        return [
-            e for e in entities
-            if e["term"].lower() not in self.blacklist_terms and e["type"] not in self.blacklist_types
-        ]
+    @staticmethod
+    def merge_entities(parts):
+        """
+        Объединяет сущности, найденные по частям текста: счётчики складываются,
+        позиции сдвигаются на начало части в тексте.
+
+        :param parts: Список пар (смещение части в тексте, сущности части)
+        """
+        merged = {}
+        for offset, entities in parts:
+            for entity in entities:
+                key = (entity["term"], entity["type"])
+                target = merged.get(key)
+                if target is None:
+                    target = merged[key] = {"term": entity["term"], "type": entity["type"], "count": 0, "spans": []}
+                target["count"] += entity["count"]
+                target["spans"].extend([start + offset, end + offset] for start, end in entity["spans"])
+        return list(merged.values())
 
-    def extract_entities(self, text: str):
+    def _chunked_entities(self, text, window_size, batch_size, chunk_store):
+        """
+        Режет текст на части с границами по содержимому (utils.chunking), по одному окну на часть.
+        Сущности частей берутся из `chunk_store`, модель прогоняется только по новым частям,
+        так что после небольшой правки текста пересчитываются лишь изменившиеся части.
+        """
+        pipe = self.ner_pipeline
+        spans = content_defined_split(text, pipe.tokenizer, self._clamp_window(window_size))
+        chunks = [text[start:end] for start, end in spans]
+        entities = chunk_store.get_many(chunks)
+        missing = [i for i, found in enumerate(entities) if found is None]
+        if missing:
+            outputs = pipe([chunks[i] for i in missing], batch_size=batch_size)
+            for i, results in zip(missing, outputs):
+                entities[i] = self._postprocess(results)
+            chunk_store.set_many([(chunks[i], entities[i]) for i in missing])
+        return self.merge_entities([(start, found) for (start, _), found in zip(spans, entities)])
+
+    def extract_entities(self, text: str, window_size: int = None, batch_size: int = None, chunk_store=None):
         """
         Основная функция для извлечения сущностей
         
         :param text: Входной текст
+        :param window_size: Размер окна в токенах (0 — весь текст одним вызовом)
+        :param batch_size: Сколько окон отправлять в модель за раз
+        :param chunk_store: Хранилище результатов по частям (database.result_cache.ChunkStore);
+                            с ним текст режется на части по содержимому, а не окнами
         :return: JSON-список сущностей
         """
-        raw_results = self.ner_pipeline(text)
-        cleaned_entities = self._postprocess(raw_results)
-        better_entities = self._improve_types(cleaned_entities)
-        final_entities = self._filter_noise(better_entities)
+        window_size = Config.NER_WINDOW_TOKENS if window_size is None else window_size
+        batch_size = batch_size or Config.NER_BATCH_SIZE
 
-        return final_entities
+        with timed("ner"):
+            if chunk_store is not None and window_size and getattr(self.ner_pipeline.tokenizer, "is_fast", False):
+                return self._chunked_entities(text, window_size, batch_size, chunk_store)
+            if window_size:
+                raw_results = self._windowed_ner(text, window_size, batch_size)
+            else:
+                raw_results = self.ner_pipeline(text)
+            return self._postprocess(raw_results)
 
     def extract_entities_json(self, text: str):
         """
@@ -0,0 +1,150 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a scheduler already holds `max_queue_size` pending requests."""
+
+
+class SchedulerClosedError(RuntimeError):
+    """Raised for requests submitted after `close`, e.g. once the model was evicted."""
+
+
+class BatchScheduler:
+    def __init__(self, batch_fn, max_batch_size=8, max_wait_ms=20, max_queue_size=64, name="model"):
+        """
+        Gathers concurrent requests into micro-batches for a single model.
+
+        :param batch_fn: Callable taking (list of items, key) and returning a list of results
+        :param max_batch_size: Maximum number of requests per batch
+        :param max_wait_ms: How long the first request of a batch waits for others to arrive
+        :param max_queue_size: Maximum number of pending requests
+        :param name: Model name, used for the worker thread and metrics
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        # Orders submits against close, so nothing is queued behind the shutdown sentinel
+        self._submit_lock = threading.Lock()
+        self._closed = False
+
+        # Metrics
+        self._stats_lock = threading.Lock()
+        self._requests_total = 0
+        self._batches_total = 0
+        self._rejected_total = 0
+        self._recent_batch_sizes = deque(maxlen=100)
+        self._recent_wait_ms = deque(maxlen=100)
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name=f"batcher-{self.name}", daemon=True
+                )
+                self._worker.start()
+
+    def submit_async(self, item, key=None):
+        """Queues `item` and returns a Future. Items only share a batch with items of the same `key`."""
+        future = Future()
+        with self._submit_lock:
+            if self._closed:
+                raise SchedulerClosedError(f"Scheduler for '{self.name}' is closed.")
+            self._ensure_worker()
+            try:
+                self._queue.put_nowait((item, key, future, time.perf_counter()))
+            except queue.Full:
+                with self._stats_lock:
+                    self._rejected_total += 1
+                raise QueueFullError(f"Batch queue for '{self.name}' is full ({self._queue.maxsize} pending).")
+        return future
+
+    def submit(self, item, key=None, timeout=None):
+        """Queues `item` and blocks until its result is ready."""
+        return self.submit_async(item, key).result(timeout=timeout)
+
+    def _collect_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                # Shutdown sentinel: finish the current batch first
+                self._queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                return
+
+            # Requests with different generation parameters can't share a generate call;
+            # requests cancelled while queued are dropped, the others can no longer be cancelled
+            groups = {}
+            for entry in batch:
+                if entry[2].set_running_or_notify_cancel():
+                    groups.setdefault(entry[1], []).append(entry)
+
+            started = time.perf_counter()
+            for key, entries in groups.items():
+                items = [entry[0] for entry in entries]
+                try:
+                    results = self.batch_fn(items, key)
+                    for entry, result in zip(entries, results):
+                        entry[2].set_result(result)
+                except Exception as e:
+                    for entry in entries:
+                        entry[2].set_exception(e)
+
+                with self._stats_lock:
+                    self._batches_total += 1
+                    self._requests_total += len(entries)
+                    self._recent_batch_sizes.append(len(entries))
+                    self._recent_wait_ms.extend(
+                        (started - entry[3]) * 1000.0 for entry in entries
+                    )
+
+    def stats(self):
+        """Returns batch size, wait time and queue depth metrics for tuning."""
+        with self._stats_lock:
+            sizes = list(self._recent_batch_sizes)
+            waits = list(self._recent_wait_ms)
+            return {
+                "requests_total": self._requests_total,
+                "batches_total": self._batches_total,
+                "rejected_total": self._rejected_total,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_size": self._queue.maxsize,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "avg_batch_size": sum(sizes) / len(sizes) if sizes else 0.0,
+                "avg_wait_ms": sum(waits) / len(waits) if waits else 0.0,
+            }
+
+    def close(self):
+        """Stops the worker thread after the pending requests are served."""
+        with self._submit_lock:
+            self._closed = True
+            if self._worker is not None and self._worker.is_alive():
+                self._queue.put(None)
@@ -0,0 +1,63 @@
+import math
+from config import Config
+
+# Upper and lower output bounds are rounded to this many tokens so that requests of
+# similar length get the same bounds and can still share a batch
+LENGTH_STEP = 10
+# No summary is allowed fewer tokens than this, however short the input
+MIN_OUTPUT_TOKENS = 16
+
+
+def resolve_profile(name=None):
+    """
+    Looks a decoding profile up in Config.DECODING_PROFILES.
+
+    :param name: Profile name; None or "" picks Config.DECODING_PROFILE
+    :return: (name, settings)
+    :raises ValueError: For an unknown profile
+    """
+    name = name or Config.DECODING_PROFILE
+    if name not in Config.DECODING_PROFILES:
+        raise ValueError(f"Unknown decoding profile '{name}'. Choose one of: {', '.join(Config.DECODING_PROFILES)}.")
+    return name, Config.DECODING_PROFILES[name]
+
+
+def length_bounds(input_tokens, settings, max_length, min_length):
+    """
+    Output length bounds for an input of `input_tokens` tokens: the profile's ratios of the
+    input length, capped at `max_length` and `min_length`. A short abstract so gets a short
+    summary instead of the full-paper bounds.
+
+    :return: (max_output_length, min_output_length)
+    """
+    upper = math.ceil(input_tokens * settings["max_ratio"] / LENGTH_STEP) * LENGTH_STEP
+    upper = min(max_length, max(MIN_OUTPUT_TOKENS, upper))
+    lower = int(input_tokens * settings["min_ratio"]) // LENGTH_STEP * LENGTH_STEP
+    lower = min(min_length, lower, upper // 2)
+    return upper, lower
+
+
+def generate_kwargs(settings):
+    """Arguments for `generate` (or a pipeline call) that a profile sets, besides the lengths."""
+    kwargs = {
+        "num_beams": settings["num_beams"],
+        "length_penalty": settings["length_penalty"],
+        "no_repeat_ngram_size": 3,
+        "repetition_penalty": 1.2,  # Penalize repeated phrases
+        "do_sample": False,
+        "use_cache": True,  # Reuse past keys/values instead of re-running the decoder over the prefix
+    }
+    if settings["num_beams"] > 1:
+        kwargs["early_stopping"] = True  # Stop as soon as every beam predicted an EOS token
+    return kwargs
+
+
+def deadline_kwargs(deadline):
+    """
+    Arguments for `generate` that stop it at a request deadline (utils.admission.Deadline, or None).
+    generate turns `max_time` into a stopping criterion checked after every token, so decoding
+    ends mid-sequence and returns what it has so far.
+    """
+    if deadline is None:
+        return {}
+    return {"max_time": max(deadline.remaining(), 0.0)}
@@ -0,0 +1,190 @@
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from config import Config
+from models.sectionsum import token_split
+from utils.metrics import timed
+
+# Prompt TextSummarizer puts in front of every input
+T5_PREFIX = "summarize: "
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# Set in map worker processes by _init_map_worker
+_worker_summarizer = None
+
+
+def context_budget(tokenizer, max_input_length=512):
+    """Text tokens that fit in one generate call next to the prefix and the EOS token."""
+    prefix_tokens = len(tokenizer(T5_PREFIX, add_special_tokens=False)["input_ids"])
+    return max_input_length - prefix_tokens - 1
+
+
+def count_tokens(tokenizer, text):
+    return len(tokenizer(text, add_special_tokens=False, verbose=False)["input_ids"])
+
+
+def group_summaries(summaries, tokenizer, fan_in, budget):
+    """
+    Groups consecutive summaries for the next reduce level: at most `fan_in` per group and,
+    where possible, no more than `budget` tokens once joined.
+
+    :return: List of lists of indices into `summaries`
+    """
+    groups, current, current_tokens = [], [], 0
+    for i, summary in enumerate(summaries):
+        tokens = count_tokens(tokenizer, summary) + 1
+        if current and (len(current) >= fan_in or current_tokens + tokens > budget):
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+# --- Map step in a process pool ---
+
+def _init_map_worker(model_path, name, threads):
+    global _worker_summarizer
+    import torch
+    from models.summarizer import TextSummarizer
+
+    torch.set_num_threads(threads)
+    # The pool sends whole slices, so the worker doesn't need its own micro-batcher
+    Config.BATCHING_ENABLED = False
+    _worker_summarizer = TextSummarizer(model_path, name=name)
+
+
+def _map_in_worker(texts, max_output_length, min_output_length, batch_size, profile=None):
+    return summarize_texts(_worker_summarizer, texts, max_output_length, min_output_length, batch_size, profile)
+
+
+def get_map_pool(model_path, name, workers):
+    """
+    One pool per domain model, created on first use. Workers are spawned rather than forked
+    because the parent already runs torch and background threads.
+    """
+    with _pools_lock:
+        pool = _pools.get(model_path)
+        if pool is None:
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_map_worker,
+                initargs=(model_path, name, threads),
+            )
+            _pools[model_path] = pool
+        return pool
+
+
+def shutdown_map_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _pools.clear()
+
+
+# --- Map and reduce ---
+
+def summarize_texts(summarizer, texts, max_output_length, min_output_length, batch_size, profile=None):
+    summaries = []
+    for start in range(0, len(texts), batch_size):
+        summaries.extend(summarizer.summarize_batch(
+            texts[start:start + batch_size],
+            max_output_length=max_output_length,
+            min_output_length=min_output_length,
+            profile=profile,
+        ))
+    return summaries
+
+
+def map_chunks(summarizer, chunk_texts, max_output_length, min_output_length, batch_size, workers=0, model_path=None,
+               profile=None):
+    """
+    Summarizes every chunk. With `workers` > 0 the chunks are split into contiguous slices
+    across a process pool, otherwise they run here in batches of `batch_size`.
+    """
+    if workers <= 0 or model_path is None or len(chunk_texts) <= batch_size:
+        return summarize_texts(summarizer, chunk_texts, max_output_length, min_output_length, batch_size, profile)
+
+    pool = get_map_pool(model_path, summarizer.name, workers)
+    slice_size = max(batch_size, -(-len(chunk_texts) // workers))
+    futures = [
+        pool.submit(_map_in_worker, chunk_texts[start:start + slice_size], max_output_length, min_output_length,
+                    batch_size, profile)
+        for start in range(0, len(chunk_texts), slice_size)
+    ]
+    summaries = []
+    for future in futures:
+        summaries.extend(future.result())
+    return summaries
+
+
+def hierarchical_summarize(text, summarizer, model_path=None, chunk_tokens=None, overlap=None, fan_in=None,
+                           max_depth=None, map_workers=None, batch_size=None, max_input_length=512, profile=None):
+    """
+    Summarizes a document longer than the model context with map-reduce.
+
+    Map: the text is split into token-bounded, overlapping chunks that are summarized in batches.
+    Reduce: consecutive partial summaries are joined in groups of at most `fan_in` and summarized
+    again, level by level, until everything fits one context or `max_depth` levels were used;
+    the last level is then summarized once more into the final summary.
+
+    :param summarizer: TextSummarizer
+    :param model_path: Path of the model, needed to load it in map worker processes
+    :param profile: Decoding profile used at every level
+    :return: {"summary": str, "tree": list of levels, "chunks": int, "depth": int}
+             Each level is a list of nodes {"summary", "tokens", "children"}; "children" are
+             indices into the previous level (or the chunk index range on level 0).
+    """
+    tokenizer = summarizer.tokenizer
+    chunk_tokens = chunk_tokens or Config.HIERARCHICAL_CHUNK_TOKENS
+    overlap = Config.HIERARCHICAL_OVERLAP if overlap is None else overlap
+    fan_in = fan_in or Config.HIERARCHICAL_FAN_IN
+    max_depth = max_depth or Config.HIERARCHICAL_MAX_DEPTH
+    map_workers = Config.HIERARCHICAL_MAP_WORKERS if map_workers is None else map_workers
+    batch_size = batch_size or Config.BATCH_MAX_SIZE
+    budget = context_budget(tokenizer, max_input_length)
+    max_output, min_output = Config.HIERARCHICAL_PARTIAL_LENGTH, Config.HIERARCHICAL_PARTIAL_MIN_LENGTH
+
+    with timed("tokenize"):
+        chunks = list(token_split(text, tokenizer, min(chunk_tokens or budget, budget), overlap).values())
+    if len(chunks) <= 1:
+        summary = summarizer.summarize_batch([text], max_input_length=max_input_length, profile=profile)[0]
+        return {"summary": summary, "tree": [], "chunks": len(chunks), "depth": 0}
+
+    with timed("map"):
+        summaries = map_chunks(summarizer, chunks, max_output, min_output, batch_size, map_workers, model_path, profile)
+    tree = [[
+        {"summary": summary, "tokens": count_tokens(tokenizer, summary), "children": [i]}
+        for i, summary in enumerate(summaries)
+    ]]
+
+    with timed("reduce"):
+        while len(tree) < max_depth and len(summaries) > 1:
+            if sum(node["tokens"] + 1 for node in tree[-1]) <= budget:
+                break
+            groups = group_summaries(summaries, tokenizer, fan_in, budget)
+            inputs = [" ".join(summaries[i] for i in group) for group in groups]
+            summaries = summarize_texts(summarizer, inputs, max_output, min_output, batch_size, profile)
+            tree.append([
+                {"summary": summary, "tokens": count_tokens(tokenizer, summary), "children": group}
+                for summary, group in zip(summaries, groups)
+            ])
+
+        if sum(node["tokens"] + 1 for node in tree[-1]) > budget:
+            logging.warning(
+                f"Partial summaries still exceed the context after {len(tree)} levels; the final input is truncated"
+            )
+        # Final summary with the regular length bounds
+        summary = summarizer.summarize_batch(
+            [" ".join(summaries)], max_input_length=max_input_length, profile=profile
+        )[0]
+
+    return {"summary": summary, "tree": tree, "chunks": len(chunks), "depth": len(tree)}
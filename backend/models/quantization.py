@@ -0,0 +1,85 @@
+import hashlib
+import logging
+import os
+import time
+from config import Config
+
+# Files whose contents decide the weights of a saved model
+WEIGHT_FILES = ("config.json", "model.safetensors", "pytorch_model.bin")
+
+
+def should_quantize(name):
+    """Whether model `name` is listed in Config.QUANTIZED_MODELS."""
+    return name in Config.QUANTIZED_MODELS
+
+
+def quantize_dynamic_int8(model):
+    """Replaces every nn.Linear with a dynamically quantized int8 Linear (weights int8, activations quantized on the fly)."""
+    import torch
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def quantized_cache_path(model_cls, model_path, cache_dir=None):
+    """
+    Cache file for the quantized model. The key covers the model class, the size and mtime of the
+    weight files and the torch/transformers versions, so retrained models or upgrades re-quantize.
+    """
+    import torch
+    import transformers
+
+    digest = hashlib.sha256()
+    digest.update(f"{model_cls.__name__}|{torch.__version__}|{transformers.__version__}".encode("utf-8"))
+    for filename in WEIGHT_FILES:
+        file_path = os.path.join(model_path, filename)
+        if os.path.isfile(file_path):
+            stat = os.stat(file_path)
+            digest.update(f"|{filename}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+    name = os.path.basename(os.path.normpath(model_path))
+    return os.path.join(cache_dir or Config.QUANTIZED_CACHE_DIR, f"{name}-{digest.hexdigest()[:16]}.pt")
+
+
+def load_quantized(model_cls, model_path, cache_dir=None, **kwargs):
+    """
+    Loads `model_cls` from `model_path` with int8 dynamic quantization.
+    The quantized module is saved to disk the first time, later loads read it back directly
+    and never materialize the fp32 weights.
+    """
+    import torch
+
+    cache_path = quantized_cache_path(model_cls, model_path, cache_dir)
+    if os.path.isfile(cache_path):
+        try:
+            model = torch.load(cache_path, map_location="cpu", weights_only=False)
+            model.eval()
+            logging.info(f"Loaded quantized model from {cache_path}")
+            return model
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable quantized cache {cache_path}: {e}")
+
+    started = time.perf_counter()
+    model = model_cls.from_pretrained(model_path, **kwargs)
+    model.eval()
+    model = quantize_dynamic_int8(model)
+    logging.info(f"Quantized {model_path} to int8 in {time.perf_counter() - started:.2f}s")
+
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # Write under a temporary name so concurrent workers never read a half-written file
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        torch.save(model, tmp_path)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logging.warning(f"Could not cache quantized model at {cache_path}: {e}")
+    return model
+
+
+def load_model(model_cls, model_path, name, quantize=None, **kwargs):
+    """
+    Loads a model the way Config asks for it: int8-quantized if `name` is in QUANTIZED_MODELS
+    (or `quantize` is True), fp32 otherwise.
+    """
+    if quantize is None:
+        quantize = should_quantize(name)
+    if quantize:
+        return load_quantized(model_cls, model_path, **kwargs)
+    return model_cls.from_pretrained(model_path, **kwargs)
@@ -0,0 +1,303 @@
+import gc
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from itertools import chain
+from config import Config
+from utils.metrics import model_load_seconds, model_evictions, models_loaded_bytes
+
+# Files that fully determine a tokenizer; models with identical files share one instance
+TOKENIZER_FILES = ("spiece.model", "tokenizer.json", "vocab.txt", "tokenizer_config.json", "special_tokens_map.json")
+# Weight files, whose size estimates a model's memory before it is first loaded
+WEIGHT_SUFFIXES = (".safetensors", ".bin", ".pt")
+# Input of the warmup inference run after a model is loaded
+WARMUP_TEXT = "Warm-up run: the model summarizes this short sentence once before serving requests."
+
+
+def estimate_nbytes(obj):
+    """
+    Approximates the resident size of a loaded model object from its parameters and buffers.
+    Works for TextSummarizer, HF pipelines and NER pipelines alike.
+    """
+    model = getattr(obj, "model", None)
+    if model is None or not hasattr(model, "parameters"):
+        return 0
+    tensors = list(chain(model.parameters(), model.buffers()))
+    # Dynamically quantized Linear layers keep their int8 weights in packed params, not parameters
+    for module in model.modules():
+        packed = getattr(module, "_packed_params", None)
+        if packed is not None and hasattr(packed, "_weight_bias"):
+            tensors.extend(t for t in packed._weight_bias() if t is not None)
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+def weights_nbytes(model_path):
+    """Total size of the weight files in `model_path` (0 if there are none)."""
+    if not model_path or not os.path.isdir(model_path):
+        return 0
+    return sum(
+        os.path.getsize(os.path.join(model_path, filename))
+        for filename in os.listdir(model_path)
+        if filename.endswith(WEIGHT_SUFFIXES)
+    )
+
+
+def tokenizer_fingerprint(model_path):
+    digest = hashlib.sha256()
+    for filename in TOKENIZER_FILES:
+        file_path = os.path.join(model_path, filename)
+        if os.path.isfile(file_path):
+            digest.update(filename.encode("utf-8"))
+            with open(file_path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    def __init__(self, budget_bytes, pinned=()):
+        """
+        Keeps loaded models within a RAM budget, evicting the least recently used ones.
+
+        :param budget_bytes: Total estimated model memory allowed
+        :param pinned: Names of models that are never evicted
+        """
+        self.budget_bytes = budget_bytes
+        self.pinned = set(pinned)
+        self._loaders = {}
+        self._warmups = {}
+        self._paths = {}
+        self._sizes = {}  # name -> measured size of its last load
+        self._states = {}  # name -> readiness of models loaded so far, see `readiness`
+        self._entries = OrderedDict()  # name -> (model, nbytes, load_seconds)
+        self._lock = threading.RLock()
+        self._load_locks = {}
+        self._tokenizers = {}
+        self._tokenizer_lock = threading.Lock()
+        self._evictions = 0
+
+    def register(self, name, loader, warmup=None, path=None):
+        """
+        Registers the callable that loads model `name`.
+
+        :param warmup: Optional callable run with the freshly loaded model, e.g. a tiny inference
+                       so the first real request doesn't pay for lazy initialization
+        :param path: Optional model directory; the size of its weight files is the memory
+                     estimate used to make room before the first load
+        """
+        with self._lock:
+            self._loaders[name] = loader
+            if warmup is not None:
+                self._warmups[name] = warmup
+            if path is not None:
+                self._paths[name] = path
+
+    def expected_nbytes(self, name):
+        """Memory model `name` is expected to take: its size when last loaded, else its weight files."""
+        with self._lock:
+            if name in self._sizes:
+                return self._sizes[name]
+            path = self._paths.get(name)
+        return weights_nbytes(path)
+
+    def is_registered(self, name):
+        return name in self._loaders
+
+    def get(self, name, loader=None):
+        """
+        Returns model `name`, loading it if needed. Concurrent callers for the same
+        model wait for a single load instead of loading it twice.
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                self._entries.move_to_end(name)
+                return entry[0]
+            loader = loader or self._loaders.get(name)
+            if loader is None:
+                raise ValueError(f"Model '{name}' not supported.")
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(name)
+                if entry is not None:
+                    self._entries.move_to_end(name)
+                    return entry[0]
+
+            # Make room first, so the budget also holds while the new model is loading
+            expected = self.expected_nbytes(name)
+            with self._lock:
+                evicted = self._evict_over_budget(incoming=expected)
+            self._release_evicted(evicted)
+
+            state = self._set_state(name, "loading")
+            started = time.perf_counter()
+            try:
+                model = loader()
+            except Exception as e:
+                self._set_state(name, "failed", error=str(e))
+                raise
+            load_seconds = time.perf_counter() - started
+            nbytes = estimate_nbytes(model)
+            logging.info(f"Loaded model '{name}' in {load_seconds:.2f}s ({nbytes / 2**20:.0f} MiB)")
+            model_load_seconds.observe(load_seconds, model=name)
+            state["load_seconds"] = round(load_seconds, 3)
+
+            warmup = self._warmups.get(name)
+            if warmup is not None and Config.WARMUP_INFERENCE:
+                self._set_state(name, "warming")
+                started = time.perf_counter()
+                try:
+                    warmup(model)
+                    state["warmup_seconds"] = round(time.perf_counter() - started, 3)
+                except Exception as e:
+                    # A failed warmup doesn't make the model unusable, so it is only logged
+                    logging.warning(f"Warmup of model '{name}' failed: {e}")
+            self._set_state(name, "ready")
+
+            with self._lock:
+                self._entries[name] = (model, nbytes, load_seconds)
+                self._sizes[name] = nbytes
+                evicted = self._evict_over_budget(keep=name)
+            self._release_evicted(evicted)
+        return model
+
+    def preload(self, names):
+        """Loads (and warms up) the models one after another, in the given order."""
+        for name in names:
+            if not self.is_registered(name):
+                logging.warning(f"Cannot preload unknown model '{name}'")
+                continue
+            try:
+                self.get(name)
+            except Exception as e:
+                logging.error(f"Failed to preload model '{name}': {e}")
+
+    def preload_in_background(self, names, before=None):
+        """
+        Same as `preload` on a daemon thread, so the server can bind its port right away.
+
+        :param before: Optional callable run on that thread first (e.g. importing torch)
+        """
+        with self._lock:
+            for name in names:
+                if self.is_registered(name):
+                    self._states.setdefault(name, {"state": "pending"})
+
+        def run():
+            if before is not None:
+                try:
+                    before()
+                except Exception as e:
+                    logging.error(f"Model warmup setup failed: {e}")
+            self.preload(names)
+
+        thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def _set_state(self, name, state, **details):
+        with self._lock:
+            entry = self._states.setdefault(name, {})
+            entry["state"] = state
+            entry.update(details)
+            return entry
+
+    def readiness(self, names):
+        """
+        Readiness of the given models: (all ready, {name: {"state", ...}}). States go
+        pending -> loading -> warming -> ready, or failed. A model stays ready after an
+        eviction since it can be loaded again on demand.
+        """
+        with self._lock:
+            states = {name: dict(self._states.get(name, {"state": "pending"})) for name in names}
+        return all(state["state"] == "ready" for state in states.values()), states
+
+    def shared_tokenizer(self, kind, model_path, load_fn):
+        """
+        Returns one tokenizer instance per tokenizer kind (e.g. class name) and distinct set of
+        tokenizer files. `load_fn` is only called the first time a tokenizer is seen.
+        """
+        key = (kind, tokenizer_fingerprint(model_path))
+        with self._tokenizer_lock:
+            tokenizer = self._tokenizers.get(key)
+            if tokenizer is None:
+                tokenizer = load_fn()
+                self._tokenizers[key] = tokenizer
+            return tokenizer
+
+    def _evict_over_budget(self, keep=None, incoming=0):
+        """
+        Evicts least recently used models until the loaded ones plus `incoming` bytes (a model
+        about to be loaded) fit the budget. Called with the lock held; returns the evicted models,
+        which the caller hands to _release_evicted once it has let go of the lock.
+        """
+        evicted = []
+        total = sum(entry[1] for entry in self._entries.values())
+        for name in list(self._entries):
+            if total + incoming <= self.budget_bytes:
+                break
+            if name == keep or name in self.pinned:
+                continue
+            model, nbytes, _ = self._entries.pop(name)
+            total -= nbytes
+            self._evictions += 1
+            model_evictions.inc(model=name)
+            logging.info(f"Evicted model '{name}' ({nbytes / 2**20:.0f} MiB) to stay within the memory budget")
+            evicted.append(model)
+        models_loaded_bytes.set(total)
+        if total + incoming > self.budget_bytes:
+            logging.warning(
+                f"Loaded models use {(total + incoming) / 2**20:.0f} MiB, over the {self.budget_bytes / 2**20:.0f} MiB budget"
+            )
+        return evicted
+
+    @staticmethod
+    def _release_evicted(models):
+        """
+        Closes evicted models, which only stops them taking new batched work: requests still
+        holding one finish on their own threads. The garbage collection that frees their memory
+        runs only after an eviction, and outside the lock, so model lookups never wait for it.
+        """
+        if not models:
+            return
+        for model in models:
+            if hasattr(model, "close"):
+                model.close()
+        del model
+        models.clear()  # drop the caller's references too, so the collection can free them
+        gc.collect()
+
+    def loaded(self):
+        with self._lock:
+            return {name: entry[0] for name, entry in self._entries.items()}
+
+    def evict(self, name):
+        with self._lock:
+            entry = self._entries.pop(name, None)
+            models_loaded_bytes.set(sum(e[1] for e in self._entries.values()))
+        if entry is not None and hasattr(entry[0], "close"):
+            entry[0].close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "budget_bytes": self.budget_bytes,
+                "used_bytes": sum(entry[1] for entry in self._entries.values()),
+                "evictions": self._evictions,
+                "shared_tokenizers": len(self._tokenizers),
+                "models": {
+                    name: {
+                        "bytes": nbytes,
+                        "load_seconds": round(load_seconds, 3),
+                        "pinned": name in self.pinned,
+                    }
+                    for name, (_, nbytes, load_seconds) in self._entries.items()
+                },
+            }
+
+
+model_registry = ModelRegistry(Config.MODEL_MEMORY_BUDGET_MB * 1024 * 1024, pinned=Config.PINNED_MODELS)
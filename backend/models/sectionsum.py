@@ -1,31 +1,219 @@
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
+import time
 from config import Config
+from models.registry import model_registry, WARMUP_TEXT
+from models.quantization import load_model
+from models.decoding import resolve_profile, length_bounds, generate_kwargs, deadline_kwargs
+from utils.admission import current_deadline
+from utils.chunking import content_defined_split
+from utils.metrics import timed, record_timing
 
-def load_local_summarizer(path=Config.MODEL_PATHS["Sectional Summarizer"]):
-    tokenizer = AutoTokenizer.from_pretrained(path)
-    model = AutoModelForSeq2SeqLM.from_pretrained(path)
+SECTION_PROMPT = "summarize this part of a scientific paper:\n\n"
+SECTION_MODEL_NAME = "Sectional Summarizer"
+
+def build_summarization_pipeline(path, quantize=None):
+    from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
+
+    tokenizer = model_registry.shared_tokenizer("AutoTokenizer", path, lambda: AutoTokenizer.from_pretrained(path))
+    model = load_model(AutoModelForSeq2SeqLM, path, SECTION_MODEL_NAME, quantize=quantize)
     return pipeline("summarization", model=model, tokenizer=tokenizer)
 
+def warm_up_pipeline(summarizer):
+    summarizer(SECTION_PROMPT + WARMUP_TEXT, max_length=8, min_length=1, do_sample=False)
+
+model_registry.register(
+    SECTION_MODEL_NAME,
+    lambda: build_summarization_pipeline(Config.MODEL_PATHS[SECTION_MODEL_NAME]),
+    warmup=warm_up_pipeline,
+    path=Config.MODEL_PATHS[SECTION_MODEL_NAME],
+)
+
+def load_local_summarizer(path=Config.MODEL_PATHS[SECTION_MODEL_NAME]):
+    """Returns the sectional summarization pipeline from the model registry."""
+    if path == Config.MODEL_PATHS[SECTION_MODEL_NAME]:
+        return model_registry.get(SECTION_MODEL_NAME)
+    return model_registry.get(f"{SECTION_MODEL_NAME}:{path}", lambda: build_summarization_pipeline(path))
+
+
+def chunk_token_budget(tokenizer):
+    """
+    Number of text tokens that fit in the model context next to the prompt and the EOS token.
+    A couple of tokens are kept spare because re-tokenizing a slice can shift its boundary.
+    """
+    context = min(tokenizer.model_max_length, Config.SECTION_MAX_CONTEXT)
+    prompt_tokens = len(tokenizer(SECTION_PROMPT, add_special_tokens=False)["input_ids"])
+    return context - prompt_tokens - 1 - 2
+
+def token_split(text, tokenizer, max_tokens=None, overlap=0):
+    """
+    Splits text into chunks of at most `max_tokens` tokens of the given tokenizer.
+    Consecutive chunks share `overlap` tokens. Every token of the text lands in a chunk.
+    """
+    if max_tokens is None:
+        max_tokens = chunk_token_budget(tokenizer)
+    if overlap >= max_tokens:
+        raise ValueError("Chunk overlap must be smaller than the chunk size.")
+
+    use_offsets = getattr(tokenizer, "is_fast", False)
+    encoding = tokenizer(
+        text, add_special_tokens=False, return_offsets_mapping=use_offsets, verbose=False
+    )
+    ids = encoding["input_ids"]
+    offsets = encoding.get("offset_mapping") if use_offsets else None
+
+    chunks = {}
+    step = max_tokens - overlap
+    for i, start in enumerate(range(0, len(ids), step), start=1):
+        end = min(start + max_tokens, len(ids))
+        if offsets:
+            # Slice the original text so spacing and punctuation survive untouched
+            chunk_text = text[offsets[start][0]:offsets[end - 1][1]]
+        else:
+            chunk_text = tokenizer.decode(ids[start:end], skip_special_tokens=True)
+        chunks[f"chunk_{i}"] = chunk_text.strip()
+        if end == len(ids):
+            break
+    return chunks
+
+def section_generate_kwargs(summarizer, prompts, profile=None):
+    """Pipeline arguments for a batch of prompts: the profile's settings and bounds scaled to the longest prompt."""
+    _, settings = resolve_profile(profile)
+    input_tokens = max(len(ids) for ids in summarizer.tokenizer(prompts, truncation=True)["input_ids"])
+    max_length, min_length = length_bounds(
+        input_tokens, settings, Config.SECTION_SUMMARY_MAX_LENGTH, Config.SECTION_SUMMARY_MIN_LENGTH
+    )
+    return dict(generate_kwargs(settings), max_length=max_length, min_length=min_length)
+
+def summarize_section(summarizer, section_text, section_name="", profile=None):
+    prompt = f"{SECTION_PROMPT}{section_text}"
+    kwargs = section_generate_kwargs(summarizer, [prompt], profile)
+    return summarizer(prompt, truncation=True, **kwargs)[0]['summary_text']
+
+def summarize_chunks(summarizer, chunk_texts, batch_size, on_batch_done=None, profile=None):
+    """
+    Summarizes chunks in batches of `batch_size` through the pipeline.
+
+    Once the request deadline passes, generate stops mid-batch and that batch and the ones
+    after it get None: a part summary cut off mid-sentence isn't kept, the finished ones are.
+
+    :param on_batch_done: Optional callback, called with the summaries so far after each batch
+    :param profile: Decoding profile from Config.DECODING_PROFILES
+    :return: (list of summaries or None for failed or unfinished chunks, list of per-batch timings in ms)
+    """
+    deadline = current_deadline()
+    summaries = []
+    batch_timings = []
+    for start in range(0, len(chunk_texts), batch_size):
+        if deadline is not None and deadline.expired():
+            deadline.abort(SECTION_MODEL_NAME)
+            summaries.extend([None] * (len(chunk_texts) - start))
+            break
+        batch = chunk_texts[start:start + batch_size]
+        started = time.perf_counter()
+        try:
+            prompts = [f"{SECTION_PROMPT}{chunk}" for chunk in batch]
+            outputs = summarizer(
+                prompts, batch_size=len(batch), truncation=True,
+                **section_generate_kwargs(summarizer, prompts, profile), **deadline_kwargs(deadline)
+            )
+            if deadline is not None and deadline.expired():
+                deadline.abort(SECTION_MODEL_NAME)
+                outputs = [{"summary_text": None}] * len(batch)
+            summaries.extend(output['summary_text'] for output in outputs)
+        except Exception as e:
+            # Retry one by one so a single bad chunk doesn't lose the whole batch
+            print(f"❌ Ошибка при пакетной суммаризации: {e}")
+            for offset, chunk in enumerate(batch, start=start + 1):
+                if deadline is not None and deadline.expired():
+                    deadline.abort(SECTION_MODEL_NAME)
+                    summaries.append(None)
+                    continue
+                try:
+                    summaries.append(summarize_section(summarizer, chunk, profile=profile))
+                except Exception as e:
+                    print(f"❌ Ошибка при суммаризации chunk_{offset}: {e}")
+                    summaries.append(None)
+        elapsed = time.perf_counter() - started
+        record_timing("section_generate", elapsed)
+        batch_timings.append(round(elapsed * 1000, 2))
+        if on_batch_done:
+            on_batch_done(summaries)
+    return summaries, batch_timings
 
-def fallback_split(text, chunk_size=300):
-    words = text.split()
-    chunks = [words[i:i+chunk_size] for i in range(0, len(words), chunk_size)]
-    return {f"chunk_{i+1}": " ".join(chunk) for i, chunk in enumerate(chunks)}
+def section_chunks(text, tokenizer, overlap=None):
+    """
+    Chunk texts for the sectional summary. With Config.SECTION_INCREMENTAL the boundaries are
+    content-defined (utils.chunking), so an edited text keeps the chunks of its unchanged parts;
+    they don't overlap, since an overlap would tie every chunk to its neighbour's text.
+    Otherwise, or for a tokenizer without offsets, fixed token windows overlapping by `overlap`.
+    """
+    max_tokens = Config.SECTION_CHUNK_TOKENS or chunk_token_budget(tokenizer)
+    if Config.SECTION_INCREMENTAL and getattr(tokenizer, "is_fast", False):
+        return [text[start:end] for start, end in content_defined_split(text, tokenizer, max_tokens)]
+    overlap = Config.SECTION_CHUNK_OVERLAP if overlap is None else overlap
+    return list(token_split(text, tokenizer, max_tokens, overlap).values())
 
-def summarize_section(summarizer, section_text, section_name=""):
-    words = section_text.split()
-    short_text = " ".join(words[:400])
-    prompt = f"summarize this part of a scientific paper:\n\n{short_text}"
-    return summarizer(prompt, max_length=100, min_length=30, do_sample=False)[0]['summary_text']
+def generate_section_summaries(text, summarizer, batch_size=None, overlap=None, return_stats=False,
+                               progress_callback=None, profile=None, chunk_store=None):
+    """
+    Summarizes the text chunk by chunk.
 
-def generate_section_summaries(text, summarizer):
+    :param profile: Decoding profile from Config.DECODING_PROFILES (default Config.DECODING_PROFILE)
+
+    :param progress_callback: Optional callback, called with
+        {"part": "part_N", "summary": ..., "completed": k, "total": n} for every finished part
+    :param chunk_store: Optional database.result_cache.ChunkStore; chunks summarized before are
+        taken from it and only the others go through the model
+    """
     print("📚 Нарезаем на блоки и суммируем как chunks")
-    chunks = fallback_split(text, chunk_size=600)
+    batch_size = batch_size or Config.SECTION_BATCH_SIZE
+
+    with timed("tokenize"):
+        chunks = section_chunks(text, summarizer.tokenizer, overlap)
+
+    chunk_summaries = chunk_store.get_many(chunks) if chunk_store else [None] * len(chunks)
+    pending = [i for i, summary in enumerate(chunk_summaries) if summary is None]
+
+    on_batch_done = None
+    if progress_callback:
+        completed = [0]
+
+        def report(i, summary):
+            completed[0] += 1
+            progress_callback({
+                "part": f"part_{i + 1}", "summary": summary, "completed": completed[0], "total": len(chunks)
+            })
+
+        for i, summary in enumerate(chunk_summaries):
+            if summary is not None:
+                report(i, summary)
+        reported = [0]
+
+        def on_batch_done(done):
+            for k in range(reported[0], len(done)):
+                if done[k] is not None:
+                    report(pending[k], done[k])
+            reported[0] = len(done)
+
+    new_summaries, batch_timings = summarize_chunks(
+        summarizer, [chunks[i] for i in pending], batch_size, on_batch_done, profile
+    )
+    for i, summary in zip(pending, new_summaries):
+        chunk_summaries[i] = summary
+    if chunk_store:
+        chunk_store.set_many([(chunks[i], summary) for i, summary in zip(pending, new_summaries) if summary is not None])
+
     summaries = {}
-    for i, (chunk_name, chunk_text) in enumerate(chunks.items(), start=1):
-        try:
-            summary = summarize_section(summarizer, chunk_text, f"part {i}")
+    for i, summary in enumerate(chunk_summaries, start=1):
+        if summary is not None:
             summaries[f"part_{i}"] = summary
-        except Exception as e:
-            print(f"❌ Ошибка при суммаризации {chunk_name}: {e}")
-    return summaries
\ No newline at end of file
+
+    if return_stats:
+        stats = {
+            "chunks": len(chunks),
+            "chunks_summarized": len(summaries),
+            "chunks_reused": len(chunks) - len(pending),
+            "batch_size": batch_size,
+            "batch_timings_ms": batch_timings,
+        }
+        return summaries, stats
+    return summaries
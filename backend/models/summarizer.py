@@ -1,17 +1,67 @@
+import threading
 import torch
-from transformers import T5Tokenizer, T5ForConditionalGeneration
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from transformers import (
+    T5Tokenizer, T5ForConditionalGeneration, TextIteratorStreamer, StoppingCriteria, StoppingCriteriaList
+)
+from config import Config
+from models.batcher import BatchScheduler, QueueFullError, SchedulerClosedError
+from models.decoding import resolve_profile, length_bounds, generate_kwargs, deadline_kwargs
+from models.registry import model_registry
+from models.quantization import load_model, should_quantize
+from utils.admission import current_deadline
+from utils.metrics import timed, generate_input_tokens, generate_output_tokens, generate_batch_size
+
+# How long past its deadline a request waits for generate to stop and hand back the summary so far
+DEADLINE_GRACE_SECONDS = 2.0
+
+class StopOnEvent(StoppingCriteria):
+    """Stops generate at the next token once the event is set, e.g. when a streaming client disconnects."""
+
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return self.event.is_set()
 
 class TextSummarizer:
-    def __init__(self, model_path):
-        # Use GPU if available, otherwise CPU
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    def __init__(self, model_path, name=None, quantize=None):
+        if quantize is None:
+            quantize = should_quantize(name)
+
+        # Use GPU if available, otherwise CPU; int8 dynamic quantization only runs on CPU
+        self.name = name or model_path
+        self.quantized = quantize
+        self.device = torch.device("cuda" if torch.cuda.is_available() and not quantize else "cpu")
         print(f"[INFO] TextSummarizer using device: {self.device}")
 
         # Load tokenizer and model
-        self.tokenizer = T5Tokenizer.from_pretrained(model_path, local_files_only=True)
-        self.model = T5ForConditionalGeneration.from_pretrained(model_path, local_files_only=True).to(self.device)
+        # Domain models ship identical T5 tokenizers, so the registry hands out one shared instance
+        self.tokenizer = model_registry.shared_tokenizer(
+            "T5Tokenizer", model_path, lambda: T5Tokenizer.from_pretrained(model_path, local_files_only=True)
+        )
+        self.model = load_model(
+            T5ForConditionalGeneration, model_path, name, quantize=quantize, local_files_only=True
+        ).to(self.device)
+        self.model.eval()
 
-    def summarize(self, text, max_input_length=512, max_output_length=250, min_output_length=50):
+        # Concurrent requests are gathered into one batched generate call
+        self.scheduler = None
+        if Config.BATCHING_ENABLED:
+            self.scheduler = BatchScheduler(
+                self._run_batch,
+                max_batch_size=Config.BATCH_MAX_SIZE,
+                max_wait_ms=Config.BATCH_MAX_WAIT_MS,
+                max_queue_size=Config.BATCH_MAX_QUEUE,
+                name=self.name,
+            )
+
+    def input_length(self, text, max_input_length=512):
+        """Number of tokens `text` takes as model input, after truncation."""
+        ids = self.tokenizer(f"summarize: {text}", max_length=max_input_length, truncation=True)["input_ids"]
+        return len(ids)
+
+    def summarize(self, text, max_input_length=512, max_output_length=None, min_output_length=None, profile=None):
         """
         Summarizes the input text using the T5-small model.
 
@@ -20,37 +70,216 @@ class TextSummarizer:
             max_input_length (int): Maximum number of tokens for the input text.
             max_output_length (int): Maximum number of tokens for the summary.
             min_output_length (int): Minimum number of tokens for the summary.
+                Without these two the bounds scale with the input length (see models.decoding).
+            profile (str): Decoding profile from Config.DECODING_PROFILES (default Config.DECODING_PROFILE).
 
         Returns:
-            str: Generated summary.
+            str: Generated summary, cut short if the request deadline passed during generate,
+                or None if it passed before generate started, which marks the deadline aborted.
+
+        Raises:
+            QueueFullError: The batch queue is full; the request should be retried later.
         """
+        deadline = current_deadline()
         try:
-            # Tokenize the input text
+            profile, settings = resolve_profile(profile)
+            if max_output_length is None or min_output_length is None:
+                with timed("tokenize"):
+                    input_tokens = self.input_length(text, max_input_length)
+                max_length, min_length = length_bounds(
+                    input_tokens, settings, Config.SUMMARY_MAX_LENGTH, Config.SUMMARY_MIN_LENGTH
+                )
+                max_output_length = max_output_length or max_length
+                min_output_length = min_length if min_output_length is None else min_output_length
+            # Only requests with the same profile and bounds share a generate call
+            key = (max_input_length, max_output_length, min_output_length, profile)
+            if self.scheduler is not None:
+                try:
+                    future = self.scheduler.submit_async((text, deadline), key=key)
+                except SchedulerClosedError:
+                    # Evicted while this request held the model: finish it here, unbatched
+                    pass
+                else:
+                    return self._wait(future, deadline)
+            return self._run_batch([(text, deadline)], key)[0]
+
+        except QueueFullError:
+            raise
+        except Exception as e:
+            print(f"[ERROR] Failed to generate summary: {str(e)}")
+            return None
+
+    def summarize_batch(self, texts, max_input_length=512, max_output_length=None, min_output_length=None,
+                        profile=None, deadline=None):
+        """
+        Summarizes several texts with a single generate call.
+        Inputs are padded to the longest text in the batch, not to `max_input_length`.
+        Output bounds that aren't given scale with the longest input of the batch.
+        Generate stops at `deadline` (default: the current request's) and the summaries
+        decoded so far are returned; the deadline is then marked aborted.
+
+        Returns:
+            list[str]: One summary per input text, in the same order.
+        """
+        profile, settings = resolve_profile(profile)
+        deadline = deadline or current_deadline()
+
+        # Tokenize the input texts
+        with timed("tokenize"):
             inputs = self.tokenizer(
-                f"summarize: {text}", 
-                return_tensors="pt", 
-                max_length=max_input_length, 
-                truncation=True, 
-                padding="max_length"
+                [f"summarize: {text}" for text in texts],
+                return_tensors="pt",
+                max_length=max_input_length,
+                truncation=True,
+                padding="longest"
             ).to(self.device)
 
-            # Generate summary
+        if max_output_length is None or min_output_length is None:
+            max_length, min_length = length_bounds(
+                inputs["input_ids"].shape[1], settings, Config.SUMMARY_MAX_LENGTH, Config.SUMMARY_MIN_LENGTH
+            )
+            max_output_length = max_output_length or max_length
+            min_output_length = min_length if min_output_length is None else min_output_length
+
+        # Generate summaries
+        with timed("generate"), torch.no_grad():
             summary_ids = self.model.generate(
                 inputs["input_ids"],
                 attention_mask=inputs["attention_mask"],
                 max_length=max_output_length,
                 min_length=min_output_length,
-                length_penalty=2.0,  # Slightly higher penalty for longer summaries
-                num_beams=4,         # Reduced from 6 to 4 for faster inference
-                early_stopping=True, # Stop generation as soon as the model predicts an EOS token
-                no_repeat_ngram_size=3,
-                repetition_penalty=1.2  # Penalize repeated phrases
+                **generate_kwargs(settings),
+                **deadline_kwargs(deadline)
             )
+        if deadline is not None and deadline.expired():
+            deadline.abort(self.name)
 
-            # Decode the generated summary
-            summary = self.tokenizer.decode(summary_ids[0], skip_special_tokens=True)
-            return summary.strip()
+        generate_batch_size.observe(len(texts), model=self.name)
+        for count in inputs["attention_mask"].sum(dim=1).tolist():
+            generate_input_tokens.observe(count, model=self.name)
+        for count in (summary_ids != self.tokenizer.pad_token_id).sum(dim=1).tolist():
+            generate_output_tokens.observe(count, model=self.name)
 
-        except Exception as e:
-            print(f"[ERROR] Failed to generate summary: {str(e)}")
-            return None
\ No newline at end of file
+        # Decode the generated summaries
+        return [
+            summary.strip()
+            for summary in self.tokenizer.batch_decode(summary_ids, skip_special_tokens=True)
+        ]
+
+    def stream(self, text, max_input_length=512, max_output_length=None, min_output_length=None,
+               do_sample=False, top_p=0.9, temperature=0.8, deadline=None):
+        """
+        Summarizes one text with greedy (or sampled) decoding and yields the decoded text
+        piece by piece as tokens are generated. Beam search can't stream since the best
+        beam is only known at the end, so this bypasses the batch scheduler.
+
+        Args:
+            do_sample (bool): Sample with `top_p`/`temperature` instead of greedy decoding.
+            deadline (Deadline): Stop generating once it passes; the deadline is then marked aborted.
+
+        Yields:
+            str: Newly decoded text.
+        """
+        with timed("tokenize"):
+            inputs = self.tokenizer(
+                f"summarize: {text}",
+                return_tensors="pt",
+                max_length=max_input_length,
+                truncation=True
+            ).to(self.device)
+
+        if max_output_length is None or min_output_length is None:
+            # Greedy like the "fast" profile, so its length ratios apply
+            max_length, min_length = length_bounds(
+                inputs["input_ids"].shape[1], Config.DECODING_PROFILES["fast"],
+                Config.SUMMARY_MAX_LENGTH, Config.SUMMARY_MIN_LENGTH
+            )
+            max_output_length = max_output_length or max_length
+            min_output_length = min_length if min_output_length is None else min_output_length
+
+        streamer = TextIteratorStreamer(self.tokenizer, skip_special_tokens=True)
+        stop = threading.Event()
+        errors = []
+        generate_kwargs = dict(
+            input_ids=inputs["input_ids"],
+            attention_mask=inputs["attention_mask"],
+            max_length=max_output_length,
+            min_length=min_output_length,
+            num_beams=1,
+            do_sample=do_sample,
+            no_repeat_ngram_size=3,
+            repetition_penalty=1.2,
+            streamer=streamer,
+            stopping_criteria=StoppingCriteriaList([StopOnEvent(stop)]),
+            **deadline_kwargs(deadline),
+        )
+        if do_sample:
+            generate_kwargs.update(top_p=top_p, temperature=temperature)
+
+        def run():
+            try:
+                with timed("generate"), torch.no_grad():
+                    self.model.generate(**generate_kwargs)
+                if deadline is not None and deadline.expired():
+                    deadline.abort(self.name)
+            except Exception as e:
+                errors.append(e)
+                streamer.end()  # unblock the consumer
+
+        thread = threading.Thread(target=run, name=f"stream-{self.name}", daemon=True)
+        thread.start()
+        try:
+            for piece in streamer:
+                if piece:
+                    yield piece
+        finally:
+            # Also reached when the consumer stops early, so generate doesn't run on for nobody
+            stop.set()
+        thread.join()
+        if errors:
+            raise errors[0]
+
+    def _wait(self, future, deadline):
+        """
+        Waits for a queued request. generate stops at the deadline, so the result, cut short,
+        arrives just after it; a request still queued DEADLINE_GRACE_SECONDS later is cancelled.
+        """
+        if deadline is None:
+            return future.result()
+        try:
+            return future.result(timeout=max(deadline.remaining(), 0.0) + DEADLINE_GRACE_SECONDS)
+        except FutureTimeoutError:
+            if future.cancel():
+                deadline.abort(self.name)
+                return None
+            # Generating in a batch that runs until a later request's deadline
+            return future.result()
+
+    def _run_batch(self, items, key):
+        """Summarizes (text, deadline) items; generate runs until the latest deadline among them."""
+        max_input_length, max_output_length, min_output_length, profile = key
+        # Requests whose deadline passed while queued have stopped waiting, so they aren't generated
+        live = []
+        for i, (_, deadline) in enumerate(items):
+            if deadline is not None and deadline.expired():
+                deadline.abort(self.name)
+            else:
+                live.append(i)
+        results = [None] * len(items)
+        if not live:
+            return results
+        deadlines = [items[i][1] for i in live]
+        latest = None if None in deadlines else max(deadlines, key=lambda deadline: deadline.expires_at)
+        summaries = self.summarize_batch(
+            [items[i][0] for i in live], max_input_length, max_output_length, min_output_length, profile, latest
+        )
+        for i, summary in zip(live, summaries):
+            results[i] = summary
+        return results
+
+    def batching_stats(self):
+        return self.scheduler.stats() if self.scheduler is not None else None
+
+    def close(self):
+        if self.scheduler is not None:
+            self.scheduler.close()
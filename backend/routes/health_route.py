@@ -0,0 +1,18 @@
+from flask import Blueprint, jsonify
+from config import Config
+from models.registry import model_registry
+
+# Initialize components
+health_bp = Blueprint('health', __name__)
+
+# Routes
+@health_bp.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the process is up and serving, whether or not the models are loaded."""
+    return jsonify({"status": "ok"}), 200
+
+@health_bp.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: 200 once every model in PRELOAD_MODELS is loaded and warmed up, 503 until then."""
+    ready, models = model_registry.readiness(Config.PRELOAD_MODELS)
+    return jsonify({"status": "ready" if ready else "starting", "models": models}), 200 if ready else 503
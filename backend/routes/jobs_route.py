@@ -0,0 +1,193 @@
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from config import Config
+from utils.file_parser import PDFParser
+from utils.job_queue import JobQueue
+from utils.stages import in_worker_process
+from utils.admission import Overloaded
+from routes.summarize_route import (
+    history_db, summarize_and_save, sectional_summarize_and_save, profile_from_request,
+    check_input_size, check_model, overloaded
+)
+import json, time
+
+# Initialize components
+jobs_bp = Blueprint('jobs', __name__)
+job_queue = JobQueue(
+    history_db,
+    workers=Config.JOB_WORKERS,
+    poll_interval=Config.JOB_POLL_INTERVAL,
+    retention_seconds=Config.JOB_RETENTION_SECONDS,
+)
+
+# Workers start once the blueprint is registered on the app, but not in map worker processes
+# that re-import the app under spawn. serve.py turns autostart off and starts them per worker.
+def start_job_queue(state):
+    if Config.JOB_QUEUE_AUTOSTART and not in_worker_process():
+        job_queue.start()
+
+jobs_bp.record_once(start_job_queue)
+jobs_bp.register_error_handler(Overloaded, overloaded)
+
+# Job handlers
+def load_job_text(job, report_progress):
+    """The job's text and, for a PDF, its section headings (see extract_text_from_request)."""
+    input_text, input_filename, input_file = history_db.get_job_input(job["id"])
+    if input_file is not None:
+        report_progress({"stage": "parsing"})
+        text, headings = PDFParser.extract_document_from_bytes(input_filename, input_file)
+        check_input_size(text)
+        return text, headings
+    return input_text, None
+
+def run_summarize_job(job, report_progress):
+    text, headings = load_job_text(job, report_progress)
+    report_progress({"stage": "summarizing"})
+    params = job["params"]
+    return summarize_and_save(
+        job["ip_address"], text, params.get("model", "Computer Science"), params.get("hierarchical", False),
+        params.get("profile"), headings
+    )
+
+def run_sectional_job(job, report_progress):
+    text, headings = load_job_text(job, report_progress)
+    report_progress({"stage": "summarizing"})
+    reported_parts = []
+
+    def on_part(event):
+        reported_parts.append(event["part"])
+        report_progress({"stage": "part_done", **event})
+
+    result = sectional_summarize_and_save(
+        job["ip_address"], text, progress_callback=on_part, profile=job["params"].get("profile"), headings=headings
+    )
+
+    # Cached summaries finish without running the model, so report their parts at once
+    if not reported_parts:
+        parts = result["section_summaries"] or {}
+        for i, (part, summary) in enumerate(parts.items(), start=1):
+            report_progress({"stage": "part_done", "part": part, "summary": summary, "completed": i, "total": len(parts)})
+    return result
+
+job_queue.register("summarize", run_summarize_job)
+job_queue.register("sectional_summary", run_sectional_job)
+
+def public_job(job):
+    return {
+        "id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "finished_at": job["finished_at"],
+    }
+
+def check_job_queue(ip_address):
+    """
+    Raises Overloaded once the queue holds Config.JOB_MAX_QUEUED jobs (503), or the client
+    Config.JOB_MAX_QUEUED_PER_IP of them (429), so a burst of submissions can't grow it without bound.
+    """
+    if history_db.count_queued_jobs(ip_address) >= Config.JOB_MAX_QUEUED_PER_IP:
+        raise Overloaded(
+            f"Too many queued jobs from this client (limit {Config.JOB_MAX_QUEUED_PER_IP}).",
+            Config.ADMISSION_RETRY_AFTER, 429
+        )
+    if history_db.count_queued_jobs() >= Config.JOB_MAX_QUEUED:
+        raise Overloaded(f"The job queue is full ({Config.JOB_MAX_QUEUED} jobs queued).", Config.ADMISSION_RETRY_AFTER)
+
+def get_own_job(job_id):
+    """Jobs are only visible to the IP that submitted them, like history items."""
+    job = history_db.get_job(job_id)
+    if job is None or job["ip_address"] != request.remote_addr:
+        return None
+    return job
+
+# Routes
+@jobs_bp.route('/jobs', methods=['POST'])
+def submit_job():
+    kind = request.form.get("kind", "summarize")
+    if kind not in ("summarize", "sectional_summary"):
+        return jsonify({"error": f"Unknown job kind '{kind}'."}), 400
+
+    input_text, input_filename, input_file = None, None, None
+    uploaded_file = request.files.get("file")
+    if uploaded_file and uploaded_file.filename:
+        if not uploaded_file.filename.lower().endswith('.pdf'):
+            return jsonify({"error": "Unsupported file type. Please upload a PDF file."}), 400
+        input_filename, input_file = uploaded_file.filename, uploaded_file.read()
+    else:
+        input_text = request.form.get("text", "").strip()
+        if not input_text:
+            return jsonify({"error": "No valid text or file provided."}), 400
+        check_input_size(input_text)
+
+    model_name = request.form.get("model", "Computer Science")
+    try:
+        profile = profile_from_request(request)
+        if kind == "summarize":
+            check_model(model_name)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    check_job_queue(request.remote_addr)
+    params = {
+        "model": model_name,
+        "hierarchical": request.form.get("hierarchical", "false").lower() == "true",
+        "profile": profile,
+    }
+    job_id = job_queue.submit(kind, request.remote_addr, params, input_text, input_filename, input_file)
+    return jsonify({"job_id": job_id, "status": "queued"}), 202
+
+@jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = get_own_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(public_job(job))
+
+@jobs_bp.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = get_own_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job["status"] == "failed":
+        return jsonify({"status": "failed", "error": job["error"]}), 500
+    if job["status"] != "done":
+        return jsonify({"status": job["status"]}), 202
+    return jsonify(job["result"])
+
+@jobs_bp.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """
+    Server-Sent Events stream: one 'progress' event per progress entry, then a final
+    'done' or 'failed' event.
+    """
+    if get_own_job(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def generate():
+        sent = 0
+        last_heartbeat = time.time()
+        while True:
+            job = history_db.get_job(job_id)
+            if job is None:
+                yield "event: failed\ndata: {\"error\": \"Job not found\"}\n\n"
+                return
+            for event in job["progress"][sent:]:
+                yield f"event: progress\ndata: {json.dumps(event)}\n\n"
+            sent = len(job["progress"])
+
+            if job["status"] in ("done", "failed"):
+                yield f"event: {job['status']}\ndata: {json.dumps(public_job(job))}\n\n"
+                return
+
+            if time.time() - last_heartbeat > 15:
+                yield ": keep-alive\n\n"
+                last_heartbeat = time.time()
+            time.sleep(Config.JOB_POLL_INTERVAL)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
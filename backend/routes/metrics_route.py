@@ -0,0 +1,44 @@
+from flask import Blueprint, Response, request, g
+from config import Config
+from utils.metrics import (
+    metrics, request_seconds, start_request_timings, end_request_timings, request_timings, server_timing_header,
+    SnapshotDirectory
+)
+import time
+
+# Initialize components
+metrics_bp = Blueprint('metrics', __name__)
+# Under serve.py every worker has its own registry; /metrics adds up all of them
+metric_snapshots = SnapshotDirectory(Config.METRICS_DIR, metrics) if Config.METRICS_DIR else None
+
+# Request instrumentation for every route of the app, not only this blueprint's
+@metrics_bp.before_app_request
+def start_timer():
+    g.metrics_started = time.perf_counter()
+    g.metrics_token = start_request_timings()
+
+@metrics_bp.after_app_request
+def record_request(response):
+    started = g.pop("metrics_started", None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    if endpoint not in ("/metrics", "/healthz", "/readyz"):
+        request_seconds.observe(elapsed, endpoint=endpoint, method=request.method, status=response.status_code)
+    timings = request_timings()
+    if Config.SERVER_TIMING_HEADER and timings is not None:
+        response.headers["Server-Timing"] = server_timing_header(timings, elapsed)
+    return response
+
+@metrics_bp.teardown_app_request
+def reset_timings(exc):
+    token = g.pop("metrics_token", None)
+    if token is not None:
+        end_request_timings(token)
+
+# Routes
+@metrics_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    body = metric_snapshots.render() if metric_snapshots is not None else metrics.render()
+    return Response(body, content_type="text/plain; version=0.0.4; charset=utf-8")
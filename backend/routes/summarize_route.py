@@ -1,105 +1,627 @@
-from flask import Blueprint, request, jsonify
-from models.summarizer import TextSummarizer
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
 import utils.citation_analyzer as CitationAnalyzer
 from utils.file_parser import PDFParser
-from database.history_db import HistoryDB
+from database.history_db import HistoryDB, content_hash
+from database.result_cache import ResultCache, ChunkStore
 from config import Config
 from models.NERProcessor import NERProcessor
-from models.sectionsum import load_local_summarizer, generate_section_summaries
-import json, re
+from models.sectionsum import load_local_summarizer, generate_section_summaries, SECTION_MODEL_NAME
+from models.registry import model_registry, WARMUP_TEXT
+from models.batcher import QueueFullError
+from models.hierarchical import hierarchical_summarize
+from models.decoding import resolve_profile
+from utils.stages import run_stages, configure_torch_threads, stage_executor, in_worker_process
+from utils.metrics import timed, time_to_first_token
+from utils.admission import AdmissionController, Deadline, Overloaded, current_deadline, deadline_scope
+import contextvars, json, os, time
+from contextlib import contextmanager
 from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 
 # Initialize components
 summarize_bp = Blueprint('summarize', __name__)
-history_db = HistoryDB()
-loaded_summarizers = {}
-section_summarizer = load_local_summarizer()
+history_db = HistoryDB(
+    Config.HISTORY_DB_PATH,
+    write_behind=Config.HISTORY_WRITE_BEHIND,
+    write_batch_size=Config.HISTORY_WRITE_BATCH,
+    flush_interval=Config.HISTORY_FLUSH_INTERVAL,
+)
+result_cache = ResultCache(
+    Config.CACHE_PATH,
+    max_entries=Config.CACHE_MAX_ENTRIES,
+    max_bytes=Config.CACHE_MAX_BYTES,
+    ttl_seconds=Config.CACHE_TTL_SECONDS,
+    touch_interval=Config.CACHE_TOUCH_INTERVAL,
+) if Config.CACHE_ENABLED else None
 ner_processor = NERProcessor(Config.NER_PATH)
+admission = AdmissionController(
+    max_active=Config.ADMISSION_MAX_ACTIVE,
+    max_queue=Config.ADMISSION_MAX_QUEUE,
+    max_per_ip=Config.ADMISSION_MAX_PER_IP,
+    retry_after=Config.ADMISSION_RETRY_AFTER,
+) if Config.ADMISSION_ENABLED else None
+
+def load_domain_summarizer(path, name):
+    # torch and transformers are imported with the first domain model, not with the app
+    from models.summarizer import TextSummarizer
+    return TextSummarizer(path, name=name)
+
+def warm_up_domain_summarizer(summarizer):
+    summarizer.summarize_batch([WARMUP_TEXT], max_output_length=8, min_output_length=1)
+
+for domain_name, domain_path in Config.MODEL_PATHS.items():
+    if domain_name != SECTION_MODEL_NAME:
+        model_registry.register(
+            domain_name,
+            lambda path=domain_path, name=domain_name: load_domain_summarizer(path, name),
+            warmup=warm_up_domain_summarizer,
+            path=domain_path,
+        )
+
+# Models load once the blueprint is registered on the app: on a background thread by default so
+# the port is bound right away (/readyz reports progress), or before the app serves anything.
+# Map worker processes re-import this module under spawn and only need their own domain model;
+# serve.py turns autostart off and loads the models itself.
+def start_model_warmup(state):
+    if not Config.WARMUP_AUTOSTART or in_worker_process():
+        return
+    if Config.WARMUP_IN_BACKGROUND:
+        model_registry.preload_in_background(Config.PRELOAD_MODELS, before=configure_torch_threads)
+    else:
+        configure_torch_threads()
+        model_registry.preload(Config.PRELOAD_MODELS)
+
+summarize_bp.record_once(start_model_warmup)
+
+# Overload and size errors as JSON. Shed requests carry Retry-After so clients back off.
+@summarize_bp.errorhandler(Overloaded)
+def overloaded(e):
+    response = jsonify({"error": str(e)})
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response, e.status
+
+@summarize_bp.errorhandler(QueueFullError)
+def batch_queue_full(e):
+    response = jsonify({"error": str(e)})
+    response.headers["Retry-After"] = str(Config.ADMISSION_RETRY_AFTER)
+    return response, 503
+
+@summarize_bp.app_errorhandler(RequestEntityTooLarge)
+def too_large(e):
+    return jsonify({"error": e.description}), 413
 
 def preprocess_text(text):
     """
     Removes numeric references like [1], [1-5], or [1, 2] from the text.
     This prevents confusion for the model.
     """
-    # Regex to match numeric references like [1], [1-5], [1, 2], etc.
-    return re.sub(r'\[\d+[,\s–\-]*\d*\]', '', text).strip()
+    with timed("preprocess"):
+        return CitationAnalyzer.scan_citations(text).stripped_text.strip()
 
 # Helper Functions
+def check_input_size(text):
+    """Raises RequestEntityTooLarge (413) for a text longer than Config.MAX_INPUT_CHARS."""
+    if len(text) > Config.MAX_INPUT_CHARS:
+        raise RequestEntityTooLarge(f"Text is {len(text)} characters long; the limit is {Config.MAX_INPUT_CHARS}.")
+
 def extract_text_from_request(request):
-    text = None
+    """
+    :return: (text, headings, error). Headings are the (start offset, title) pairs of a PDF's
+             sections (see PDFParser.sections_to_clean_text), None for plain text.
+    """
+    text, headings = None, None
     uploaded_file = request.files.get("file")
     if uploaded_file and uploaded_file.filename:
         if uploaded_file.filename.lower().endswith('.pdf'):
             try:
-                text = PDFParser.extract_text_from_pdf(uploaded_file)
+                text, headings = PDFParser.extract_document_from_pdf(uploaded_file)
             except Exception as e:
-                return None, f"Failed to parse PDF: {str(e)}"
+                return None, None, f"Failed to parse PDF: {str(e)}"
         else:
-            return None, "Unsupported file type. Please upload a PDF file."
+            return None, None, "Unsupported file type. Please upload a PDF file."
     if not text:
-        text = request.form.get("text", "").strip()
+        text, headings = request.form.get("text", "").strip(), None
     if not text:
-        return None, "No valid text or file provided."
-    return text, None
+        return None, None, "No valid text or file provided."
+    check_input_size(text)
+    return text, headings, None
+
+def profile_from_request(request):
+    """Decoding profile named by the 'profile' form field; raises ValueError for an unknown one."""
+    name, _ = resolve_profile(request.form.get("profile", "").strip() or None)
+    return name
+
+def request_deadline(requested=None):
+    """
+    Deadline of a request: Config.REQUEST_DEADLINE_SECONDS from now, or sooner when the client
+    asks for `requested` seconds (the 'deadline' field). None when neither sets one.
+    Raises ValueError for a value that isn't a positive number.
+    """
+    seconds = Config.REQUEST_DEADLINE_SECONDS or None
+    if requested not in (None, ""):
+        try:
+            requested = float(requested)
+        except (TypeError, ValueError):
+            raise ValueError("'deadline' must be a number of seconds.")
+        if requested <= 0:
+            raise ValueError("'deadline' must be a number of seconds.")
+        seconds = min(seconds, requested) if seconds else requested
+    return Deadline(seconds) if seconds else None
+
+@contextmanager
+def admitted(model_name, ip_address, deadline, slots=1):
+    """
+    Runs the block once the model's admission queue lets the request in, under its deadline.
+    Raises Overloaded (503, or 429 for a client over its limit) instead of queueing without bound.
+    """
+    if admission is None:
+        with deadline_scope(deadline):
+            yield
+    else:
+        with admission.admit(model_name, ip_address, deadline, slots):
+            yield
+
+def check_model(model_name):
+    if model_name == SECTION_MODEL_NAME or model_name not in Config.MODEL_PATHS:
+        raise ValueError(f"Model '{model_name}' not supported.")
 
 def get_summarizer(model_name):
-    if model_name not in loaded_summarizers:
-        model_path = Config.MODEL_PATHS.get(model_name)
-        if not model_path:
-            raise ValueError(f"Model '{model_name}' not supported.")
-        loaded_summarizers[model_name] = TextSummarizer(model_path)
-    return loaded_summarizers[model_name]
+    check_model(model_name)
+    return model_registry.get(model_name)
 
 def save_summary_to_db(ip_address, text, full_summary="", citations_json=None, entities_json=None, section_summaries_json=None):
-    history_db.save_summary(ip_address, text, full_summary, citations_json, entities_json, section_summaries_json)
+    with timed("db_write"):
+        history_db.save_summary(ip_address, text, full_summary, citations_json, entities_json, section_summaries_json)
+
+def cached_compute(namespace, text, compute, model_name="", params=None, duplicate=None, on_reuse=None):
+    """
+    Looks the result up in the persistent cache, computing and storing it on a miss.
+
+    :param duplicate: Optional callable returning (preprocessed text, similarity) of a stored
+                      near-duplicate, or None; only called on a miss. The near-duplicate's cached
+                      result is then reused and `on_reuse(namespace, similarity)` is called.
+    """
+    if result_cache is None:
+        return compute()
+    value = result_cache.get(namespace, text, model_name, params)
+    if value is None and duplicate is not None:
+        match = duplicate()
+        if match is not None:
+            value = result_cache.get(namespace, match[0], model_name, params)
+            if value is not None:
+                # An exact resubmission of this text then hits directly
+                result_cache.set(namespace, text, value, model_name, params)
+                if on_reuse:
+                    on_reuse(namespace, match[1])
+                return value
+    if value is None:
+        value = compute()
+        # A result the request deadline cut short isn't the result for this text
+        deadline = current_deadline()
+        if value is not None and (deadline is None or not deadline.aborted):
+            result_cache.set(namespace, text, value, model_name, params)
+    return value
+
+def summary_params(sectional, hierarchical=False, profile=None):
+    """Generation parameters that change the summary, used in the cache key."""
+    name, settings = resolve_profile(profile)
+    decoding = dict(settings, profile=name)
+    if sectional:
+        return {
+            "chunk_tokens": Config.SECTION_CHUNK_TOKENS,
+            "overlap": Config.SECTION_CHUNK_OVERLAP,
+            "chunking": "content" if Config.SECTION_INCREMENTAL else "tokens",
+            "decoding": decoding,
+            "length": [Config.SECTION_SUMMARY_MIN_LENGTH, Config.SECTION_SUMMARY_MAX_LENGTH],
+        }
+    params = {
+        "max_input_length": 512,
+        "decoding": decoding,
+        "length": [Config.SUMMARY_MIN_LENGTH, Config.SUMMARY_MAX_LENGTH],
+    }
+    if hierarchical:
+        params.update(
+            mode="hierarchical",
+            chunk_tokens=Config.HIERARCHICAL_CHUNK_TOKENS,
+            overlap=Config.HIERARCHICAL_OVERLAP,
+            fan_in=Config.HIERARCHICAL_FAN_IN,
+            max_depth=Config.HIERARCHICAL_MAX_DEPTH,
+            partial_length=[Config.HIERARCHICAL_PARTIAL_MIN_LENGTH, Config.HIERARCHICAL_PARTIAL_LENGTH],
+        )
+    return params
+
+def section_chunk_stores(profile=None):
+    """
+    Per-chunk stores of the incremental sectional pipeline: chunk summaries, which only depend on
+    the chunk text and the decoding, and chunk entities. Each counts the chunks it gave back.
+    """
+    params = summary_params(True, profile=profile)
+    summaries = ChunkStore(
+        result_cache, "section_chunk", SECTION_MODEL_NAME, {"decoding": params["decoding"], "length": params["length"]}
+    )
+    entities = ChunkStore(result_cache, "entity_chunk", Config.NER_PATH, {"window_size": Config.NER_WINDOW_TOKENS})
+    return summaries, entities
 
 @lru_cache(maxsize=128)
-def cached_citation_analysis(text):
-    return CitationAnalyzer.analyze_citations(text)
+def cached_citation_analysis(text, headings=None):
+    """
+    One scan gives both the citation analysis and the citation-stripped text for the models.
+    The scan is linear and needed for the stripped text anyway, so it isn't persisted.
+    `headings` places the citations of a PDF in its sections (see extract_text_from_request).
+    """
+    with timed("citations"):
+        citations, stripped_text = CitationAnalyzer.analyze_citations(
+            text, sections=headings, return_stripped_text=True
+        )
+    return citations, stripped_text.strip()
+
+@lru_cache(maxsize=128)
+def find_near_duplicate(raw_text):
+    """
+    Preprocessed text of a stored near-duplicate of `raw_text` and its similarity, or None.
+    Exact copies are left to the cache, which already keys on the content.
+    """
+    with timed("near_duplicate"):
+        match = history_db.find_near_duplicate(raw_text, Config.NEAR_DUPLICATE_THRESHOLD)
+        if match is None or match["content_hash"] == content_hash(raw_text):
+            return None
+        duplicate_text = history_db.get_document_text(match["document_id"])
+    if duplicate_text is None:
+        return None
+    _, stripped_text = cached_citation_analysis(duplicate_text)
+    return stripped_text, round(match["similarity"], 3)
+
+def entity_extraction(text, duplicate=None, on_reuse=None):
+    params = {"window_size": Config.NER_WINDOW_TOKENS, "overlap": Config.NER_WINDOW_OVERLAP}
+    return cached_compute(
+        "entities", text, lambda: ner_processor.extract_entities(text), Config.NER_PATH, params, duplicate, on_reuse
+    )
 
 @lru_cache(maxsize=128)
 def cached_entity_extraction(text):
-    return ner_processor.extract_entities(text)
+    return entity_extraction(text)
+
+def compute_summary(text, model_name, sectional, progress_callback=None, hierarchical=False, profile=None,
+                    chunk_store=None):
+    if sectional:
+        summary, chunk_stats = generate_section_summaries(
+            text, load_local_summarizer(), return_stats=True, progress_callback=progress_callback, profile=profile,
+            chunk_store=chunk_store
+        )
+        return {"summary": summary, "chunk_stats": chunk_stats}
+    if hierarchical:
+        result = hierarchical_summarize(
+            text, get_summarizer(model_name), model_path=Config.MODEL_PATHS[model_name], profile=profile
+        )
+        chunk_stats = {"chunks": result["chunks"], "depth": result["depth"]}
+        return {"summary": result["summary"], "chunk_stats": chunk_stats, "summary_tree": result["tree"]}
+    summary = get_summarizer(model_name).summarize(text, profile=profile)
+    return {"summary": summary, "chunk_stats": None} if summary is not None else None
+
+def process_text(text, model_name, sectional=False, progress_callback=None, hierarchical=False, profile=None,
+                 headings=None):
+    """
+    `headings` are the section headings of a PDF's text, for the citation analysis.
+
+    :return: Dict with the summary, citations, entities, stats and timings. "reused" is
+             {"similarity", "stages"} when results of a stored near-duplicate were reused, else None.
+             Sectional summaries reuse stored results chunk by chunk instead (Config.SECTION_INCREMENTAL),
+             counted in chunk_stats as "chunks_reused" and "entity_chunks_reused".
+             "partial" is True when the request deadline cut the summary short: a summary decoded
+             up to the deadline, the parts finished by then, or None if nothing was.
+    """
+    started = time.perf_counter()
+    raw_text = text
+
+    # Citations come from the raw text; the same pass strips them for the models.
+    # The scan is linear, so it always runs on the submitted text, even for a near-duplicate.
+    results, timings = run_stages({"citations": lambda: cached_citation_analysis(text, headings)}, parallel=False)
+    citations, text = results["citations"]
+
+    # Reuse works through the result cache, so it needs the cache. An edited resubmission of a
+    # sectional summary gets its unchanged chunks back and recomputes the rest, which is both
+    # cheap and exact, so it doesn't take a near-duplicate's whole result instead.
+    incremental = sectional and Config.SECTION_INCREMENTAL and result_cache is not None
+    reused = {}
+    duplicate = None
+    if Config.NEAR_DUPLICATE_ENABLED and result_cache is not None and not incremental:
+        duplicate = lambda: find_near_duplicate(raw_text)
 
-def process_text(text, model_name, sectional=False):
-    text = preprocess_text(text)
-    summarizer = get_summarizer(model_name)
-    summary = generate_section_summaries(text, section_summarizer) if sectional else summarizer.summarize(text)
-    citations = cached_citation_analysis(text)
-    entities = cached_entity_extraction(text)
-    return {"summary": summary, "citations": citations, "entities": entities}
+    def on_reuse(namespace, score):
+        reused["similarity"] = score
+        reused.setdefault("stages", []).append(namespace)
+
+    # Summary and NER don't depend on each other, so they run side by side
+    if incremental:
+        summary_store, entity_store = section_chunk_stores(profile)
+        stages = {
+            "summary": lambda: compute_summary(
+                text, model_name, sectional, progress_callback, profile=profile, chunk_store=summary_store
+            ),
+            "entities": lambda: ner_processor.extract_entities(text, chunk_store=entity_store),
+        }
+    else:
+        stages = {
+            "summary": lambda: cached_compute(
+                "summary", text,
+                lambda: compute_summary(text, model_name, sectional, progress_callback, hierarchical, profile),
+                model_name, summary_params(sectional, hierarchical, profile), duplicate, on_reuse
+            ),
+            "entities": (lambda: entity_extraction(text, duplicate, on_reuse)) if duplicate
+                        else (lambda: cached_entity_extraction(text)),
+        }
+    results, model_timings = run_stages(stages)
+    timings.update(model_timings)
+    timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+
+    cached = results["summary"]
+    summary = cached["summary"] if cached else None
+    chunk_stats = cached["chunk_stats"] if cached else None
+    if incremental and chunk_stats is not None:
+        chunk_stats["entity_chunks_reused"] = entity_store.reused
+    deadline = current_deadline()
+    return {
+        "summary": summary,
+        "citations": citations,
+        "entities": results["entities"],
+        "chunk_stats": chunk_stats,
+        "summary_tree": cached.get("summary_tree") if cached else None,
+        "reused": reused or None,
+        "partial": deadline is not None and deadline.aborted,
+        "timings": timings,
+    }
+
+def summarize_and_save(ip_address, text, model_name, hierarchical=False, profile=None, headings=None):
+    """
+    With `hierarchical`, documents longer than the model context are summarized with map-reduce
+    and the response also carries the chunk stats and the tree of partial summaries.
+    `profile` names the decoding profile (default Config.DECODING_PROFILE).
+    """
+    result = process_text(text, model_name, hierarchical=hierarchical, profile=profile, headings=headings)
+    if result["summary"] or not result["partial"]:
+        save_summary_to_db(ip_address, text, result["summary"], json.dumps(result["citations"]), json.dumps(result["entities"]))
+    if not hierarchical:
+        result.pop("chunk_stats")
+        result.pop("summary_tree")
+    return result
+
+def sectional_summarize_and_save(ip_address, text, progress_callback=None, profile=None, headings=None):
+    result = process_text(
+        text, SECTION_MODEL_NAME, sectional=True, progress_callback=progress_callback, profile=profile,
+        headings=headings
+    )
+    result.pop("summary_tree")
+    if result["summary"] or not result["partial"]:
+        save_summary_to_db(ip_address, text, "", json.dumps(result["citations"]), json.dumps(result["entities"]), json.dumps(result["summary"]))
+    return {
+        "section_summaries": result["summary"],
+        "citations": result["citations"],
+        "entities": result["entities"],
+        "chunk_stats": result["chunk_stats"],
+        "reused": result["reused"],
+        "partial": result["partial"],
+        "timings": result["timings"]
+    }
+
+def deadline_response(result, summary_key):
+    """The result as JSON, or 504 with it if the deadline passed before any summary was generated."""
+    if result["partial"] and not result[summary_key]:
+        return jsonify({"error": "The request deadline passed before a summary was generated.", **result}), 504
+    return jsonify(result)
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def stream_summary_events(ip_address, text, summarizer, model_name, decoding, deadline=None, headings=None):
+    """
+    Yields Server-Sent Events for a streamed summary: 'citations', then one 'token' event per
+    decoded piece with 'entities' as soon as NER finishes, then 'done' once the history is saved.
+    Generation stops at `deadline`; 'done' then has "partial": true.
+    """
+    started = time.perf_counter()
+    citations, stripped_text = cached_citation_analysis(text, headings)
+    yield sse_event("citations", citations)
+
+    # NER runs next to generation on the shared stage executor
+    entities_future = stage_executor.submit(contextvars.copy_context().run, cached_entity_extraction, stripped_text)
+    entities = None
+    pieces = []
+    first_token_ms = None
+    try:
+        for piece in summarizer.stream(stripped_text, do_sample=decoding == "sample", deadline=deadline):
+            if first_token_ms is None:
+                first_token = time.perf_counter() - started
+                time_to_first_token.observe(first_token, model=model_name)
+                first_token_ms = round(first_token * 1000, 2)
+            pieces.append(piece)
+            yield sse_event("token", {"text": piece})
+            if entities is None and entities_future.done():
+                entities = entities_future.result()
+                yield sse_event("entities", entities)
+        if entities is None:
+            entities = entities_future.result()
+            yield sse_event("entities", entities)
+    except Exception as e:
+        yield sse_event("error", {"error": str(e)})
+        return
+
+    summary = "".join(pieces).strip()
+    save_summary_to_db(ip_address, text, summary, json.dumps(citations), json.dumps(entities))
+    yield sse_event("done", {
+        "summary": summary,
+        "decoding": decoding,
+        "partial": deadline is not None and deadline.aborted,
+        "timings": {"first_token": first_token_ms, "total": round((time.perf_counter() - started) * 1000, 2)},
+    })
 
 # Routes
+# Model routes are admitted before the text is extracted from the upload, so an overloaded model
+# sheds a burst of PDFs without sending them to GROBID. 'deadline' (seconds) shortens REQUEST_DEADLINE_SECONDS.
 @summarize_bp.route('/summarize', methods=['POST'])
 def summarize():
     ip_address = request.remote_addr
-    text, error = extract_text_from_request(request)
-    if error:
-        return jsonify({"error": error}), 400
     model_name = request.form.get("model", "Computer Science")
-    result = process_text(text, model_name)
-    save_summary_to_db(ip_address, text, result["summary"], json.dumps(result["citations"]), json.dumps(result["entities"]))
-    return jsonify(result)
+    hierarchical = request.form.get("hierarchical", "false").lower() == "true"
+    try:
+        check_model(model_name)
+        profile = profile_from_request(request)
+        deadline = request_deadline(request.form.get("deadline"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    with admitted(model_name, ip_address, deadline):
+        text, headings, error = extract_text_from_request(request)
+        if error:
+            return jsonify({"error": error}), 400
+        return deadline_response(
+            summarize_and_save(ip_address, text, model_name, hierarchical, profile, headings), "summary"
+        )
 
 @summarize_bp.route('/sectional_summary', methods=['POST'])
 def sectional_summary():
     ip_address = request.remote_addr
-    text, error = extract_text_from_request(request)
-    if error:
-        return jsonify({"error": error}), 400
-    result = process_text(text, "Sectional Summarizer", sectional=True)
-    save_summary_to_db(ip_address, text, "", json.dumps(result["citations"]), json.dumps(result["entities"]), json.dumps(result["summary"]))
-    return jsonify({
-        "section_summaries": result["summary"],
-        "citations": result["citations"],
-        "entities": result["entities"]
-    })
+    try:
+        profile = profile_from_request(request)
+        deadline = request_deadline(request.form.get("deadline"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    with admitted(SECTION_MODEL_NAME, ip_address, deadline):
+        text, headings, error = extract_text_from_request(request)
+        if error:
+            return jsonify({"error": error}), 400
+        return deadline_response(
+            sectional_summarize_and_save(ip_address, text, profile=profile, headings=headings), "section_summaries"
+        )
+
+@summarize_bp.route('/summarize/stream', methods=['POST'])
+def summarize_stream():
+    """
+    Like /summarize, but streams the summary as Server-Sent Events while it is generated.
+    Uses greedy decoding, or sampling with decoding=sample, since beam search can't stream.
+    """
+    ip_address = request.remote_addr
+    model_name = request.form.get("model", "Computer Science")
+    decoding = request.form.get("decoding", "greedy")
+    if decoding not in ("greedy", "sample"):
+        return jsonify({"error": "'decoding' must be 'greedy' or 'sample'."}), 400
+    try:
+        check_model(model_name)
+        deadline = request_deadline(request.form.get("deadline"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # The slot is held until the stream is closed, not only while this function runs
+    ticket = admission.acquire(model_name, ip_address, deadline) if admission is not None else None
+    response = None
+    try:
+        text, headings, error = extract_text_from_request(request)
+        if error:
+            return jsonify({"error": error}), 400
+        summarizer = get_summarizer(model_name)
+        response = Response(
+            stream_with_context(
+                stream_summary_events(ip_address, text, summarizer, model_name, decoding, deadline, headings)
+            ),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        return response
+    finally:
+        if ticket is not None:
+            if response is None:
+                ticket.release()
+            else:
+                response.call_on_close(ticket.release)
+
+@summarize_bp.route('/summarize/batch', methods=['POST'])
+def summarize_batch():
+    """
+    Summarizes several uploaded PDFs (form field 'files'). The PDFs go to GROBID in parallel.
+    Set form field 'sectional' to 'true' for sectional summaries, or 'hierarchical' to 'true'
+    for map-reduce summaries of the full text. 'profile' picks the decoding profile.
+    The batch takes one admission slot per file and shares one deadline.
+    """
+    ip_address = request.remote_addr
+    uploads = [f for f in request.files.getlist("files") if f and f.filename]
+    if not uploads:
+        return jsonify({"error": "No files provided."}), 400
+    if len(uploads) > Config.MAX_BATCH_FILES:
+        return jsonify({"error": f"At most {Config.MAX_BATCH_FILES} files per batch."}), 400
+    if any(not f.filename.lower().endswith('.pdf') for f in uploads):
+        return jsonify({"error": "Unsupported file type. Please upload PDF files only."}), 400
+
+    model_name = request.form.get("model", "Computer Science")
+    sectional = request.form.get("sectional", "false").lower() == "true"
+    hierarchical = request.form.get("hierarchical", "false").lower() == "true"
+    try:
+        if not sectional:
+            check_model(model_name)
+        profile = profile_from_request(request)
+        deadline = request_deadline(request.form.get("deadline"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def run(document):
+        if "error" in document:
+            return {"filename": document["filename"], "error": f"Failed to parse PDF: {document['error']}"}
+        if not document["text"]:
+            return {"filename": document["filename"], "error": "No text found in PDF."}
+        if len(document["text"]) > Config.MAX_INPUT_CHARS:
+            return {"filename": document["filename"], "error": f"Text is longer than {Config.MAX_INPUT_CHARS} characters."}
+        if sectional:
+            result = sectional_summarize_and_save(
+                ip_address, document["text"], profile=profile, headings=document["headings"]
+            )
+        else:
+            result = summarize_and_save(
+                ip_address, document["text"], model_name, hierarchical, profile, document["headings"]
+            )
+        return {"filename": document["filename"], "sections": document["sections"], **result}
+
+    with admitted(SECTION_MODEL_NAME if sectional else model_name, ip_address, deadline, slots=len(uploads)):
+        parsed = PDFParser.extract_many_from_bytes([(f.filename, f.read()) for f in uploads])
+
+        # Documents run side by side so the summarizer can batch their generate calls,
+        # each in a copy of this context so the deadline follows it
+        with ThreadPoolExecutor(max_workers=min(len(parsed), Config.BATCH_MAX_SIZE)) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, run, document) for document in parsed]
+            results = [future.result() for future in futures]
+    return jsonify({"results": results})
 
 @summarize_bp.route('/history', methods=['GET'])
 def get_history():
+    """
+    Query parameters:
+        limit: page size (default HISTORY_PAGE_SIZE, capped at HISTORY_MAX_PAGE_SIZE)
+        cursor: `next_cursor` from the previous page
+        fields: 'list' for ids, timestamps, a text preview and summaries, 'full' (default),
+                or a comma-separated list of field names
+    """
     ip_address = request.remote_addr
-    history = history_db.get_history_by_ip(ip_address)
-    return jsonify({"history": history})
+    try:
+        limit = min(int(request.args.get("limit", Config.HISTORY_PAGE_SIZE)), Config.HISTORY_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"error": "'limit' must be an integer"}), 400
+    fields_arg = request.args.get("fields", "full")
+    if fields_arg == "full":
+        fields = HistoryDB.FULL_FIELDS
+    elif fields_arg == "list":
+        fields = HistoryDB.LIST_FIELDS
+    else:
+        fields = tuple(f.strip() for f in fields_arg.split(",") if f.strip())
+    try:
+        history, next_cursor = history_db.get_history_page(ip_address, max(limit, 1), request.args.get("cursor"), fields)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"history": history, "next_cursor": next_cursor})
+
+@summarize_bp.route('/history/<int:item_id>', methods=['GET'])
+def get_history_item(item_id):
+    ip_address = request.remote_addr
+    item = history_db.get_history_item(ip_address, item_id)
+    if item is None:
+        return jsonify({"error": "History item not found"}), 404
+    return jsonify(item)
 
 @summarize_bp.route('/clear-history', methods=['DELETE'])
 def clear_history():
@@ -119,14 +641,86 @@ def delete_history_item(item_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@summarize_bp.route('/history/search', methods=['GET'])
+def search_history():
+    """
+    Full-text search over the caller's history.
+
+    Query parameters:
+        q: words to find; all must match, in any inflection
+        limit: page size (default HISTORY_PAGE_SIZE, capped at HISTORY_MAX_PAGE_SIZE)
+        offset: `next_offset` from the previous page
+    """
+    ip_address = request.remote_addr
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "'q' is required"}), 400
+    try:
+        limit = min(int(request.args.get("limit", Config.HISTORY_PAGE_SIZE)), Config.HISTORY_MAX_PAGE_SIZE)
+        offset = max(int(request.args.get("offset", 0)), 0)
+    except ValueError:
+        return jsonify({"error": "'limit' and 'offset' must be integers"}), 400
+    try:
+        results, next_offset = history_db.search_history(ip_address, query, max(limit, 1), offset)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"results": results, "next_offset": next_offset})
+
+# The JSON stats below describe the worker process that answers (its pid is "worker");
+# /metrics has the totals across the serve.py workers.
+@summarize_bp.route('/batching/stats', methods=['GET'])
+def batching_stats():
+    stats = {
+        name: model.batching_stats()
+        for name, model in model_registry.loaded().items()
+        if hasattr(model, "batching_stats")
+    }
+    return jsonify({"enabled": Config.BATCHING_ENABLED, "worker": os.getpid(), "models": stats})
+
+@summarize_bp.route('/models', methods=['GET'])
+def models_stats():
+    return jsonify(model_registry.stats())
+
+@summarize_bp.route('/admission/stats', methods=['GET'])
+def admission_stats():
+    if admission is None:
+        return jsonify({"enabled": False})
+    return jsonify({
+        "enabled": True, "worker": os.getpid(), "deadline_seconds": Config.REQUEST_DEADLINE_SECONDS,
+        **admission.stats()
+    })
+
+@summarize_bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    if result_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, "worker": os.getpid(), **result_cache.stats()})
+
 @summarize_bp.route("/extract", methods=["POST"])
 def extract_entities():
     data = request.get_json()
     if not data or "text" not in data:
         return jsonify({"error": "Missing 'text' field"}), 400
     text = data["text"]
+    if not isinstance(text, str):
+        return jsonify({"error": "'text' must be a string"}), 400
+    check_input_size(text)
     try:
-        entities = ner_processor.extract_entities(text)
-        return jsonify(entities)
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        window_size = int(data["window_size"]) if data.get("window_size") is not None else None
+        batch_size = int(data["batch_size"]) if data.get("batch_size") is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "'window_size' and 'batch_size' must be integers"}), 400
+    if window_size is not None and window_size < 2:
+        return jsonify({"error": "'window_size' must be at least 2 tokens"}), 400
+    if batch_size is not None and batch_size < 1:
+        return jsonify({"error": "'batch_size' must be at least 1"}), 400
+    try:
+        deadline = request_deadline(data.get("deadline"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    with admitted(Config.NER_MODEL_NAME, request.remote_addr, deadline):
+        try:
+            entities = ner_processor.extract_entities(text, window_size=window_size, batch_size=batch_size)
+            return jsonify(entities)
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
\ No newline at end of file
@@ -0,0 +1,319 @@
+# serve.py
+"""
+Production entry point: a pre-fork master that loads the models once and forks workers
+that share the weights copy-on-write.
+
+The master imports the app, loads and warms up PRELOAD_MODELS, freezes the GC so collections
+in the workers don't write to the pages holding those objects, and forks the workers.
+With --no-preload the workers fork right away and each loads the models in the background
+(faster to bind, but every worker holds its own copy; /readyz tells when they are done).
+Each worker serves the shared listening socket with a threaded WSGI server and gets
+its share of the cores for torch. Workers are recycled after SERVE_MAX_REQUESTS.
+
+Each worker has its own admission gates, batch queues and in-process counters, so the
+ADMISSION_* and BATCH_* limits hold per worker (a client may have workers x ADMISSION_MAX_PER_IP
+requests in flight) and /admission/stats, /batching/stats and /cache/stats describe the worker
+that answers. /metrics adds up all of them: every process writes its metrics to METRICS_DIR
+(a temporary directory unless set), see utils.metrics.SnapshotDirectory.
+
+Usage (from backend/):
+    python serve.py --workers 4 --port 5000
+
+Signals to the master:
+    SIGHUP           graceful reload: the master re-executes itself (new code, config and models)
+                     on the same socket, then retires the old workers once the new ones are up
+    SIGTERM, SIGINT  graceful shutdown
+"""
+import argparse
+import gc
+import logging
+import os
+import random
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+LISTEN_FD_ENV = "SERVE_LISTEN_FD"
+OLD_WORKERS_ENV = "SERVE_OLD_WORKERS"
+REQUESTED_THREADS_ENV = "SERVE_REQUESTED_TORCH_THREADS"
+METRICS_DIR_ENV = "METRICS_DIR"
+OWN_METRICS_DIR_ENV = "SERVE_OWN_METRICS_DIR"  # set when the directory is ours to remove on shutdown
+
+
+def parse_args():
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Pre-fork server for the summarizer API")
+    parser.add_argument("--host", default=Config.HOST)
+    parser.add_argument("--port", type=int, default=Config.PORT)
+    parser.add_argument("--workers", type=int, default=Config.SERVE_WORKERS)
+    parser.add_argument("--max-requests", type=int, default=Config.SERVE_MAX_REQUESTS)
+    parser.add_argument("--max-requests-jitter", type=int, default=Config.SERVE_MAX_REQUESTS_JITTER)
+    parser.add_argument("--preload", action=argparse.BooleanOptionalAction, default=Config.SERVE_PRELOAD,
+                        help="load the models in the master before forking")
+    parser.add_argument("--graceful-timeout", type=float, default=Config.SERVE_GRACEFUL_TIMEOUT)
+    return parser.parse_args()
+
+
+def create_listener(host, port):
+    """Opens the listening socket, or takes over the one inherited through a reload."""
+    fd = os.environ.pop(LISTEN_FD_ENV, None)
+    if fd is not None:
+        sock = socket.socket(fileno=int(fd))
+    else:
+        family = socket.AF_INET6 if ":" in host else socket.AF_INET
+        sock = socket.create_server((host, port), family=family, backlog=2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def load_app(preload):
+    """
+    Imports the app in the master and, with `preload`, loads the models once for all workers.
+    Torch runs single-threaded here so no OpenMP thread pool exists when the workers fork.
+    """
+    from app import app
+    from config import Config
+    from models.registry import model_registry
+    from routes.jobs_route import job_queue
+
+    if preload:
+        import torch
+        torch.set_num_threads(1)
+        model_registry.preload(Config.PRELOAD_MODELS)
+
+    for name, model in model_registry.loaded().items():
+        module = getattr(model, "model", None)
+        if module is not None and hasattr(module, "requires_grad_"):
+            module.eval()
+            module.requires_grad_(False)
+        logging.info(f"Preloaded '{name}' in the master")
+
+    # Only the master requeues jobs interrupted by a restart, before any worker claims jobs
+    job_queue.requeue_interrupted()
+
+    # Keep the collector from touching (and so copying) the objects loaded so far
+    gc.collect()
+    gc.freeze()
+    return app
+
+
+class RequestCounter:
+    """WSGI middleware that counts a worker's requests and those still in flight."""
+
+    def __init__(self, app, max_requests, on_limit):
+        self.app = app
+        self.max_requests = max_requests
+        self.on_limit = on_limit
+        self.total = 0
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def _done(self):
+        with self._lock:
+            self.active -= 1
+
+    def __call__(self, environ, start_response):
+        from werkzeug.wsgi import ClosingIterator
+
+        with self._lock:
+            self.total += 1
+            self.active += 1
+            limit_reached = self.max_requests and self.total == self.max_requests
+        if limit_reached:
+            self.on_limit()
+        try:
+            # Streaming responses stay in flight until their iterator is closed
+            return ClosingIterator(self.app(environ, start_response), [self._done])
+        except Exception:
+            self._done()
+            raise
+
+
+def run_worker(app, sock, args, cores):
+    """Body of a forked worker; never returns."""
+    from werkzeug.serving import make_server
+    from config import Config
+    from models.registry import model_registry
+    from routes.jobs_route import job_queue
+    from routes.metrics_route import metric_snapshots
+    from routes.summarize_route import history_db
+    from utils.metrics import metrics
+    from utils.stages import configure_torch_threads
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C reaches the whole group; the master coordinates
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    random.seed()
+
+    # What the master recorded before the fork is in its own snapshot; count it only there
+    metrics.reset()
+    metric_snapshots.start(Config.METRICS_SNAPSHOT_INTERVAL)
+
+    requested = os.environ.get(REQUESTED_THREADS_ENV, "")
+    Config.TORCH_THREADS = int(requested or 0)
+    if args.preload:
+        threads = configure_torch_threads(cores=cores)
+    else:
+        threads = "lazily set"  # torch is only imported with the first model
+        model_registry.preload_in_background(
+            Config.PRELOAD_MODELS, before=lambda: configure_torch_threads(cores=cores)
+        )
+
+    if Config.JOB_WORKERS:
+        job_queue.start(requeue=False)
+
+    stopping = threading.Event()
+    server = None
+
+    def stop():
+        if stopping.is_set():
+            return
+        stopping.set()
+        # shutdown() waits for serve_forever() to return, so it can't run on the serving thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    max_requests = 0
+    if args.max_requests:
+        max_requests = args.max_requests + random.randint(0, max(0, args.max_requests_jitter))
+    counter = RequestCounter(app, max_requests, stop)
+    server = make_server(args.host, args.port, counter, threaded=True, fd=sock.fileno())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop())
+    logging.info(f"Worker {os.getpid()} serving with {threads} torch threads")
+
+    exit_code = 0
+    try:
+        server.serve_forever()
+    except Exception:
+        logging.exception(f"Worker {os.getpid()} crashed")
+        exit_code = 1
+
+    # Let in-flight requests finish before leaving
+    deadline = time.time() + args.graceful_timeout
+    while counter.active > 0 and time.time() < deadline:
+        time.sleep(0.1)
+    job_queue.stop()
+    history_db.close()
+    metric_snapshots.write()
+    logging.info(f"Worker {os.getpid()} exiting after {counter.total} requests")
+    os._exit(exit_code)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(process)d - %(levelname)s - %(message)s')
+    # Fast tokenizers' own thread pool doesn't survive a fork
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    # Job workers start per forked worker, not when the master creates the app
+    os.environ["JOB_QUEUE_AUTOSTART"] = "0"
+    # Same for the models: the master preloads them, or each worker does after the fork
+    os.environ["WARMUP_AUTOSTART"] = "0"
+    # The master itself runs torch single-threaded; remember what the workers should use
+    if REQUESTED_THREADS_ENV not in os.environ:
+        os.environ[REQUESTED_THREADS_ENV] = os.environ.get("TORCH_THREADS", "")
+    os.environ["TORCH_THREADS"] = "1"
+    # Config reads it on import; a reload keeps the directory, and with it the counters
+    if not os.environ.get(METRICS_DIR_ENV):
+        os.environ[METRICS_DIR_ENV] = tempfile.mkdtemp(prefix="summarizer-metrics-")
+        os.environ[OWN_METRICS_DIR_ENV] = "1"
+    reloading = LISTEN_FD_ENV in os.environ
+
+    args = parse_args()
+    sock = create_listener(args.host, args.port)
+    app = load_app(args.preload)
+    cores = max(1, (os.cpu_count() or 1) // args.workers)
+
+    from routes.metrics_route import metric_snapshots
+    if reloading:
+        metric_snapshots.retire(os.getpid())  # the previous master's snapshot, same pid
+    else:
+        metric_snapshots.clear()
+    metric_snapshots.write()
+
+    workers = {}  # pid -> fork time
+    old_workers = {int(pid) for pid in os.environ.pop(OLD_WORKERS_ENV, "").split(",") if pid}
+    state = {"stop": False, "reload": False}
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(app, sock, args, cores)
+            finally:
+                os._exit(1)
+        workers[pid] = time.time()
+
+    for _ in range(args.workers):
+        spawn()
+    logging.info(f"Master {os.getpid()} listening on {args.host}:{args.port} with {args.workers} workers")
+
+    # A reload brought up a new generation; the previous one finishes its requests and exits
+    for pid in old_workers:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: state.update(stop=True))
+    signal.signal(signal.SIGINT, lambda signum, frame: state.update(stop=True))
+    signal.signal(signal.SIGHUP, lambda signum, frame: state.update(reload=True))
+
+    while True:
+        # Reap exited workers and replace them
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            old_workers.discard(pid)
+            metric_snapshots.retire(pid)
+            started = workers.pop(pid, None)
+            if started is None or state["stop"]:
+                continue
+            if time.time() - started < 1:
+                # Crashing on startup; don't fork in a tight loop
+                logging.error(f"Worker {pid} exited right after starting (status {status})")
+                time.sleep(1)
+            spawn()
+
+        if state["stop"]:
+            break
+        if state["reload"]:
+            logging.info("Reloading: re-executing the master")
+            os.environ[LISTEN_FD_ENV] = str(sock.fileno())
+            os.environ[OLD_WORKERS_ENV] = ",".join(str(pid) for pid in list(workers) + list(old_workers))
+            os.execv(sys.executable, [sys.executable] + sys.argv)
+        time.sleep(0.2)
+
+    logging.info("Shutting down workers")
+    children = set(workers) | old_workers
+    for pid in children:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    deadline = time.time() + args.graceful_timeout + 5
+    while children and time.time() < deadline:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            time.sleep(0.1)
+            continue
+        children.discard(pid)
+    for pid in children:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    if os.environ.get(OWN_METRICS_DIR_ENV):
+        shutil.rmtree(os.environ[METRICS_DIR_ENV], ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from utils.metrics import admission_active, admission_queue_depth, admission_shed, admission_wait_seconds, deadline_aborts
+
+# Deadline of the current request; None outside a request (background jobs, batch runs)
+_current_deadline = ContextVar("request_deadline", default=None)
+
+
+def current_deadline():
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(deadline):
+    """
+    Makes `deadline` the current one for the block, so model stages (including the ones on the
+    stage executor, which copy the context) stop at it.
+    """
+    token = _current_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _current_deadline.reset(token)
+
+
+class Overloaded(RuntimeError):
+    """
+    Raised when a request is turned away before any model work. `retry_after` is the
+    suggested wait in seconds, `status` the HTTP status to answer with (503, or 429 for
+    a client over its own limit).
+    """
+
+    def __init__(self, message, retry_after, status=503):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status = status
+
+
+class Deadline:
+    """
+    The point after which nobody waits for a request's result any more. Model stages check it
+    between batches and pass the time left to generate, which stops decoding once it runs out.
+    """
+
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+        self.aborted = False
+
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def abort(self, model):
+        """Records that the deadline cut the model work short; counted once per request."""
+        if not self.aborted:
+            self.aborted = True
+            deadline_aborts.inc(model=model)
+
+
+class _ModelGate:
+    """Up to `max_active` slots in use for one model, with at most `max_queue` requests waiting for one."""
+
+    def __init__(self, name, max_active, max_queue):
+        self.name = name
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting = 0
+        self.admitted_total = 0
+        self.shed_total = {}
+        self.avg_hold_seconds = None  # moving average, for Retry-After
+        self.cond = threading.Condition()
+
+    def retry_after(self, default):
+        """Seconds until the queue ahead has likely drained: its length in rounds of `max_active` holds."""
+        if self.avg_hold_seconds is None:
+            return default
+        rounds = (self.waiting + self.active) / self.max_active
+        return max(1, math.ceil(rounds * self.avg_hold_seconds))
+
+    def shed(self, reason):
+        self.shed_total[reason] = self.shed_total.get(reason, 0) + 1
+        admission_shed.inc(model=self.name, reason=reason)
+
+    def publish(self):
+        admission_active.set(self.active, model=self.name)
+        admission_queue_depth.set(self.waiting, model=self.name)
+
+
+class Ticket:
+    """An admitted request's slots; `release` gives them back and is safe to call more than once."""
+
+    def __init__(self, controller, gate, ip_address, slots):
+        self._controller = controller
+        self._gate = gate
+        self._ip_address = ip_address
+        self._slots = slots
+        self._admitted_at = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(self._gate, self._ip_address, self._slots, time.monotonic() - self._admitted_at)
+
+
+class AdmissionController:
+    def __init__(self, max_active=8, max_queue=32, max_per_ip=4, retry_after=5):
+        """
+        Bounds the work the models take on. Each model admits requests into `max_active` slots;
+        up to `max_queue` more wait for one, in no strict order, and anything beyond that is
+        shed at once, since a request that would wait behind a long queue is better retried
+        elsewhere. Each client IP has at most `max_per_ip` requests in flight across all models.
+
+        :param retry_after: Retry-After in seconds before a model has finished any request
+        """
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.max_per_ip = max_per_ip
+        self.default_retry_after = retry_after
+        self._gates = {}
+        self._lock = threading.Lock()
+        self._in_flight = {}  # ip -> admitted requests
+
+    def _gate(self, model):
+        with self._lock:
+            gate = self._gates.get(model)
+            if gate is None:
+                gate = self._gates[model] = _ModelGate(model, self.max_active, self.max_queue)
+            return gate
+
+    def acquire(self, model, ip_address, deadline=None, slots=1):
+        """
+        Waits for `slots` slots of `model` (a batch of documents takes one per document, up to
+        all of them) and returns a Ticket. Raises Overloaded without waiting when the client is
+        at its limit or the queue is full, or once the deadline passes while queued.
+        """
+        gate = self._gate(model)
+        slots = max(1, min(slots, gate.max_active))
+        with self._lock:
+            if self._in_flight.get(ip_address, 0) >= self.max_per_ip:
+                with gate.cond:
+                    gate.shed("per_ip")
+                    retry_after = gate.retry_after(self.default_retry_after)
+                raise Overloaded(
+                    f"Too many requests in flight from this client (limit {self.max_per_ip}).", retry_after, 429
+                )
+            self._in_flight[ip_address] = self._in_flight.get(ip_address, 0) + 1
+
+        try:
+            self._enter(gate, slots, deadline)
+        except BaseException:
+            self._leave_ip(ip_address)
+            raise
+        return Ticket(self, gate, ip_address, slots)
+
+    def _enter(self, gate, slots, deadline):
+        started = time.monotonic()
+        with gate.cond:
+            if gate.active + slots > gate.max_active:
+                if gate.waiting >= gate.max_queue:
+                    gate.shed("queue_full")
+                    raise Overloaded(
+                        f"Model '{gate.name}' is overloaded ({gate.waiting} requests queued).",
+                        gate.retry_after(self.default_retry_after),
+                    )
+                gate.waiting += 1
+                gate.publish()
+                try:
+                    while gate.active + slots > gate.max_active:
+                        timeout = deadline.remaining() if deadline is not None else None
+                        if timeout is not None and timeout <= 0:
+                            gate.shed("deadline")
+                            raise Overloaded(
+                                f"Model '{gate.name}' did not free up before the request deadline.",
+                                gate.retry_after(self.default_retry_after),
+                            )
+                        gate.cond.wait(timeout)
+                finally:
+                    gate.waiting -= 1
+                    gate.publish()
+            gate.active += slots
+            gate.admitted_total += 1
+            gate.publish()
+        admission_wait_seconds.observe(time.monotonic() - started, model=gate.name)
+
+    def _release(self, gate, ip_address, slots, held_seconds):
+        with gate.cond:
+            gate.active -= slots
+            gate.avg_hold_seconds = held_seconds if gate.avg_hold_seconds is None else (
+                0.9 * gate.avg_hold_seconds + 0.1 * held_seconds
+            )
+            gate.publish()
+            gate.cond.notify_all()
+        self._leave_ip(ip_address)
+
+    def _leave_ip(self, ip_address):
+        with self._lock:
+            count = self._in_flight.get(ip_address, 0) - 1
+            if count > 0:
+                self._in_flight[ip_address] = count
+            else:
+                self._in_flight.pop(ip_address, None)
+
+    @contextmanager
+    def admit(self, model, ip_address, deadline=None, slots=1):
+        """Holds the slots for the block, with `deadline` as the current deadline (see deadline_scope)."""
+        ticket = self.acquire(model, ip_address, deadline, slots)
+        try:
+            with deadline_scope(deadline):
+                yield ticket
+        finally:
+            ticket.release()
+
+    def stats(self):
+        """Slots, queue and shed counts per model, for sizing the deployment."""
+        models = {}
+        for name, gate in list(self._gates.items()):
+            with gate.cond:
+                models[name] = {
+                    "active": gate.active,
+                    "queued": gate.waiting,
+                    "max_active": gate.max_active,
+                    "max_queue": gate.max_queue,
+                    "admitted_total": gate.admitted_total,
+                    "shed_total": dict(gate.shed_total),
+                    "avg_hold_ms": round(gate.avg_hold_seconds * 1000, 1) if gate.avg_hold_seconds is not None else None,
+                }
+        with self._lock:
+            clients = len(self._in_flight)
+        return {"max_per_ip": self.max_per_ip, "clients_in_flight": clients, "models": models}
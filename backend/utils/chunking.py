@@ -0,0 +1,61 @@
+import re
+import zlib
+from bisect import bisect_left
+
+# Content-defined chunking: a chunk ends after a sentence whose hash hits 1 in CUT_EVERY, once it
+# holds MIN_SHARE of the token budget, or where the next sentence would overflow the budget.
+# A cut depends on the sentence before it, not on its position, so an edit only moves the
+# boundaries around it up to the next content-defined cut; every other chunk keeps its exact
+# text, which is what per-chunk results are stored under.
+CUT_EVERY = 4
+MIN_SHARE = 0.7
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+
+def _is_cut(sentence):
+    # Whitespace is normalized so re-wrapped lines don't move the boundaries
+    return zlib.crc32(" ".join(sentence.split()).encode("utf-8")) % CUT_EVERY == 0
+
+
+def content_defined_split(text, tokenizer, max_tokens):
+    """
+    Splits text at sentence ends into chunks of at most `max_tokens` tokens of the given
+    tokenizer. The tokenizer must be a fast one, for the offset mapping.
+
+    :return: List of (start, end) character spans of the chunks in `text`
+    """
+    offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)["offset_mapping"]
+    if not offsets:
+        return []
+    token_starts = [start for start, _ in offsets]
+
+    # Sentences as token ranges; one longer than the budget is cut into budget-sized pieces
+    units = []
+    first = 0
+    sentence_start = 0
+    ends = [match.end() for match in SENTENCE_END.finditer(text)] + [len(text)]
+    for end in ends:
+        last = bisect_left(token_starts, end)
+        if last > first:
+            for start in range(first, last, max_tokens):
+                units.append([start, min(start + max_tokens, last), False])
+            units[-1][2] = _is_cut(text[sentence_start:end])
+            first = last
+        sentence_start = end
+
+    min_tokens = int(max_tokens * MIN_SHARE)
+    chunks = []
+    chunk_start = None
+    for start, end, cut in units:
+        if chunk_start is None:
+            chunk_start = start
+        elif end - chunk_start > max_tokens:
+            chunks.append((chunk_start, start))
+            chunk_start = start
+        if cut and end - chunk_start >= min_tokens:
+            chunks.append((chunk_start, end))
+            chunk_start = None
+    if chunk_start is not None:
+        chunks.append((chunk_start, units[-1][1]))
+    return [(offsets[start][0], offsets[end - 1][1]) for start, end in chunks]
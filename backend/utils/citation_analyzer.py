@@ -1,36 +1,141 @@
 import re
 import logging
+from bisect import bisect_right
 from collections import Counter
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# --- Citation Extraction ---
+# --- Patterns ---
 
-def extract_citations(text):
+# Numeric citations like:
+# [1], [1, 2], [1–3], [1-3, 5], [1,2; 4-6]
+# Written without nested quantifiers so unclosed brackets can't cause catastrophic backtracking
+NUMERIC_PATTERN = r'\[\d+(?:[–\-,;\s]+\d+)*[–\-,;\s]*\]'
+
+# Author citations like:
+# "Smith et al. (2020)", "Brown and Green (2019)", "Taylor (2015)"
+AUTHOR_PATTERN = r'\b[A-Z][a-z]+(?:\s(?:et al\.|and\s[A-Z][a-z]+))?\s*\(\d{4}\)'
+
+# Section headings on their own line, e.g. "2. RELATED WORK" or "Introduction"
+HEADING_PATTERN = r'^[ \t]*(?:\d+(?:\.\d+)*\.?[ \t]+)?(?:[A-Z][A-Z0-9&:,\- ]{2,80}|Abstract|Introduction|Conclusions?|References)[ \t]*$'
+
+# One pattern, one scan: each match is a heading, a numeric citation or an author citation.
+# The lookahead skips positions where none of the alternatives can start.
+CITATION_PATTERN = re.compile(
+    f"(?=[\\[A-Z \\t\\d])(?:(?P<numeric>{NUMERIC_PATTERN})|(?P<author>{AUTHOR_PATTERN})|(?P<heading>{HEADING_PATTERN}))",
+    re.MULTILINE,
+)
+NUMBER_PATTERN = re.compile(r'\d+')
+RANGE_PATTERN = re.compile(r'(\d+)\s*[–\-]\s*(\d+)')
+LIST_SEPARATOR = re.compile(r'[,;]')
+
+# Ranges wider than this are kept as their two endpoints rather than expanded
+MAX_RANGE_SIZE = 100
+
+
+def expand_reference_ids(citation):
     """
-    Extracts numeric and author-year style citations from a given text.
-    Returns:
-        tuple: (list of numeric refs, list of author-year refs)
+    Expands a numeric citation into individual reference ids.
+    "[1–3, 5]" -> [1, 2, 3, 5]
+    """
+    ids = []
+    for part in LIST_SEPARATOR.split(citation.strip("[]")):
+        match = RANGE_PATTERN.search(part)
+        if match:
+            start, end = int(match.group(1)), int(match.group(2))
+            if start <= end and end - start <= MAX_RANGE_SIZE:
+                ids.extend(range(start, end + 1))
+                continue
+        ids.extend(int(number) for number in NUMBER_PATTERN.findall(part))
+    return ids
+
+
+# --- Single-pass scan ---
+
+class CitationScan:
+    """
+    Result of one pass over a document: occurrences of every reference id and author
+    citation with their character offsets and sections, plus the citation-stripped text.
     """
 
-    # Improved pattern for numeric citations like:
-    # [1], [1, 2], [1–3], [1-3, 5], [1,2; 4-6]
-    ref_pattern = r'\[(?:\d+[–\-,;\s]*)+\]'
+    def __init__(self):
+        self.references = {}   # reference id -> {"count", "offsets", "sections"}
+        self.authors = {}      # author citation -> {"count", "offsets", "sections"}
+        self.stripped_text = ""
 
-    # Improved pattern for author citations like:
-    # "Smith et al. (2020)", "Brown and Green (2019)", "Taylor (2015)"
-    author_pattern = r'\b[A-Z][a-z]+(?:\s(?:et al\.|and\s[A-Z][a-z]+))?\s*\(\d{4}\)'
+    @staticmethod
+    def _record(table, key, start, end, section):
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = {"count": 0, "offsets": [], "sections": []}
+        entry["count"] += 1
+        entry["offsets"].append([start, end])
+        sections = entry["sections"]
+        if section and (not sections or sections[-1] != section) and section not in sections:
+            sections.append(section)
 
-    # Find matches
-    numeric_refs = re.findall(ref_pattern, text)
-    author_refs = re.findall(author_pattern, text)
 
-    # Clean and deduplicate
-    numeric_refs = list(set(ref.strip() for ref in numeric_refs))
-    author_refs = list(set(author.strip() for author in author_refs))
+def scan_citations(text, sections=None):
+    """
+    Scans the text once for numeric and author-year citations.
+
+    :param text: Document text
+    :param sections: Optional list of (start offset, title) for documents whose headings aren't
+                     on their own lines; otherwise headings are detected while scanning
+    :return: CitationScan
+    """
+    scan = CitationScan()
+    section_starts = [start for start, _ in sections] if sections else None
+    current_section = None
+    stripped_parts = []
+    last = 0
+    expanded = {}  # the same citation string tends to repeat, so expand it once
+    record = CitationScan._record
+
+    for match in CITATION_PATTERN.finditer(text):
+        kind = match.lastgroup
+        start, end = match.span()
+        if kind == "heading":
+            current_section = match.group().strip()
+            continue
+
+        section = current_section
+        if section_starts:
+            index = bisect_right(section_starts, start) - 1
+            section = sections[index][1] if index >= 0 else None
+
+        if kind == "numeric":
+            citation = match.group()
+            ref_ids = expanded.get(citation)
+            if ref_ids is None:
+                ref_ids = expanded[citation] = expand_reference_ids(citation)
+            for ref_id in ref_ids:
+                record(scan.references, ref_id, start, end, section)
+            # Numeric references only confuse the summarizer, so they're cut from its input
+            stripped_parts.append(text[last:start])
+            last = end
+        else:
+            record(scan.authors, match.group().strip(), start, end, section)
+
+    stripped_parts.append(text[last:])
+    scan.stripped_text = "".join(stripped_parts)
+    return scan
+
 
-    logging.info(f"Found {len(numeric_refs)} numeric references and {len(author_refs)} author citations")
+# --- Citation Extraction ---
+
+def extract_citations(text):
+    """
+    Extracts numeric and author-year style citations from a given text.
+    Returns:
+        tuple: (list of reference ids, list of author-year refs), one entry per occurrence
+    """
+    scan = scan_citations(text)
+    numeric_refs = [ref for ref, entry in scan.references.items() for _ in range(entry["count"])]
+    author_refs = [author for author, entry in scan.authors.items() for _ in range(entry["count"])]
+
+    logging.info(f"Found {len(scan.references)} numeric references and {len(scan.authors)} author citations")
     return numeric_refs, author_refs
 
 
@@ -45,13 +150,25 @@ def count_citations(refs, authors):
     return ref_counts, author_counts
 
 
-def format_results(ref_counts, author_counts):
+def format_results(ref_counts, author_counts, ref_details=None, author_details=None):
     """
     Formats the results into a structured dictionary.
+    Details, when given, add the offsets and sections of every citation.
     """
-    ref_data = [{"Reference": ref, "Frequency": freq} for ref, freq in ref_counts.items()]
-    author_data = [{"Author Citation": author, "Frequency": freq} for author, freq in author_counts.items()]
-    
+    ref_data = []
+    for ref, freq in ref_counts.items():
+        item = {"Reference": f"[{ref}]", "Frequency": freq}
+        if ref_details:
+            item.update(offsets=ref_details[ref]["offsets"], sections=ref_details[ref]["sections"])
+        ref_data.append(item)
+
+    author_data = []
+    for author, freq in author_counts.items():
+        item = {"Author Citation": author, "Frequency": freq}
+        if author_details:
+            item.update(offsets=author_details[author]["offsets"], sections=author_details[author]["sections"])
+        author_data.append(item)
+
     result = {
         "references": sorted(ref_data, key=lambda x: x["Frequency"], reverse=True),
         "author_citations": sorted(author_data, key=lambda x: x["Frequency"], reverse=True),
@@ -64,27 +181,34 @@ def format_results(ref_counts, author_counts):
 
 # --- Main Entry Point ---
 
-def analyze_citations(input_text, return_raw_text=False):
+def analyze_citations(input_text, return_raw_text=False, sections=None, return_stripped_text=False):
     """
     Analyzes citations in the input text.
     Args:
         input_text (str): The text to analyze.
         return_raw_text (bool): Whether to include raw text in the output.
+        sections (list): Optional (start offset, title) pairs, see `scan_citations`.
+        return_stripped_text (bool): Also return the text with numeric citations removed.
     Returns:
-        dict: Analysis results.
+        dict: Analysis results, or (dict, str) with `return_stripped_text`.
     """
     if not input_text or not isinstance(input_text, str):
         logging.error("Input must be a non-empty string.")
-        return {"error": "Input must be a non-empty string."}
-    
+        error = {"error": "Input must be a non-empty string."}
+        return (error, input_text or "") if return_stripped_text else error
+
     # Extract citations
-    refs, authors = extract_citations(input_text)
-    ref_counts, author_counts = count_citations(refs, authors)
+    scan = scan_citations(input_text, sections)
+    logging.info(f"Found {len(scan.references)} numeric references and {len(scan.authors)} author citations")
+    ref_counts = Counter({ref: entry["count"] for ref, entry in sorted(scan.references.items())})
+    author_counts = Counter({author: entry["count"] for author, entry in scan.authors.items()})
 
     # Format results
-    results = format_results(ref_counts, author_counts)
-    
+    results = format_results(ref_counts, author_counts, scan.references, scan.authors)
+
     if return_raw_text:
         results["raw_text"] = input_text[:1000] + "..." if len(input_text) > 1000 else input_text
 
-    return results
\ No newline at end of file
+    if return_stripped_text:
+        return results, scan.stripped_text
+    return results
@@ -1,59 +1,189 @@
+import io
 import re
-import requests
-from bs4 import BeautifulSoup
+import xml.etree.ElementTree as ET
+from config import Config
+from utils.grobid_client import GrobidClient
+from utils.metrics import timed
 
-class PDFParser:
-    GROBID_URL = "http://localhost:8070/api/processFulltextDocument"
+HYPHEN_BREAK = re.compile(r"-\s*\n")
+UNWANTED_CHARS = re.compile(r"[^\w\s.,;:'\"!?()\[\]{}—–\-]+")
+
+def _local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+_grobid_client = None
 
+def get_grobid_client():
+    global _grobid_client
+    if _grobid_client is None:
+        _grobid_client = GrobidClient(
+            Config.GROBID_URL,
+            max_concurrency=Config.GROBID_MAX_CONCURRENCY,
+            retries=Config.GROBID_RETRIES,
+            backoff=Config.GROBID_BACKOFF,
+            timeout=Config.GROBID_TIMEOUT,
+        )
+    return _grobid_client
+
+class PDFParser:
     @staticmethod
     def extract_text_from_pdf(file):
         """
         Extracts raw body text from a PDF file using GROBID.
         `file` is expected to be a file-like object (e.g., from Flask's request.files).
         """
+        return PDFParser.extract_document_from_pdf(file)[0]
+
+    @staticmethod
+    def extract_document_from_pdf(file):
+        """
+        Same as `extract_text_from_pdf`, but returns (text, headings), with the (start offset, title)
+        of each section heading in the text; see `sections_to_clean_text`.
+        """
         # Ensure the file is valid and has content
         if not file or not file.filename.lower().endswith('.pdf'):
             raise ValueError("Invalid file type. Please upload a PDF file.")
 
-        files = {'input': (file.filename, file.stream, file.mimetype)}
-        try:
-            response = requests.post(PDFParser.GROBID_URL, files=files, timeout=30)
-            response.raise_for_status()
-        except requests.RequestException as e:
-            raise RuntimeError(f"GROBID request failed: {str(e)}")
+        return PDFParser._process_with_grobid(file.filename, file.stream, file.mimetype)
 
-        tei_xml = response.text
-        text = PDFParser.parse_tei_to_text(tei_xml)
-        return PDFParser.clean_pdf_text(text)
+    @staticmethod
+    def extract_text_from_bytes(filename, data):
+        """
+        Same as `extract_text_from_pdf`, for a PDF that was stored as bytes (e.g. by a background job).
+        """
+        return PDFParser.extract_document_from_bytes(filename, data)[0]
 
     @staticmethod
-    def parse_tei_to_text(tei_xml):
+    def extract_document_from_bytes(filename, data):
         """
-        Parses TEI XML returned by GROBID and extracts main text content.
+        Same as `extract_document_from_pdf`, for a PDF that was stored as bytes.
         """
-        soup = BeautifulSoup(tei_xml, "lxml-xml")
-        body = soup.find("body")
+        if not filename or not filename.lower().endswith('.pdf'):
+            raise ValueError("Invalid file type. Please upload a PDF file.")
+        return PDFParser._process_with_grobid(filename, data, "application/pdf")
 
-        if not body:
-            return ""
+    @staticmethod
+    def _process_with_grobid(filename, stream, mimetype):
+        with timed("grobid"):
+            tei_xml = get_grobid_client().process_pdf(filename, stream, mimetype)
+        with timed("tei_parse"):
+            return PDFParser.sections_to_clean_text(PDFParser.parse_tei_sections(tei_xml))
 
-        # Extract paragraphs and section titles
-        paragraphs = body.find_all(["p", "head"])  # Include section headings (`<head>`)
-        text_parts = []
+    @staticmethod
+    def extract_many_from_bytes(pdfs):
+        """
+        Sends several PDFs to GROBID in parallel and parses each into sections.
+
+        :param pdfs: List of (filename, bytes) tuples
+        :return: List of {"filename", "text", "sections", "headings"} or {"filename", "error"} dicts,
+                 in input order; headings as returned by `sections_to_clean_text`
+        """
+        with timed("grobid"):
+            tei_documents = get_grobid_client().process_many(pdfs)
+        results = []
+        for (filename, _), tei_xml in zip(pdfs, tei_documents):
+            if isinstance(tei_xml, Exception):
+                results.append({"filename": filename, "error": str(tei_xml)})
+                continue
+            with timed("tei_parse"):
+                sections = PDFParser.parse_tei_sections(tei_xml)
+                text, headings = PDFParser.sections_to_clean_text(sections)
+            results.append({"filename": filename, "text": text, "sections": sections, "headings": headings})
+        return results
+
+    @staticmethod
+    def parse_tei_sections(tei_xml):
+        """
+        Streams through TEI XML returned by GROBID and collects the body's section titles
+        and paragraphs without building a document tree.
 
-        for element in paragraphs:
-            tag_name = element.name
-            content = element.get_text(separator=" ", strip=True)
+        :param tei_xml: TEI XML as str, bytes or a binary file-like object
+        :return: List of {"title": str, "paragraphs": [str]}; paragraphs before the first
+                 heading go to a section whose title is None
+        """
+        if isinstance(tei_xml, str):
+            tei_xml = tei_xml.encode("utf-8")
+        if isinstance(tei_xml, bytes):
+            tei_xml = io.BytesIO(tei_xml)
 
-            if tag_name == "head":  # Section headers
-                content = f"\n\n{content.upper()}\n"  # Add formatting for section headers
-            elif tag_name == "p":  # Paragraphs
-                content = f"{content}"
+        sections = []
+        body_depth = 0
+        seen_body = False
+        try:
+            for event, element in ET.iterparse(tei_xml, events=("start", "end")):
+                name = _local_name(element.tag)
+                if event == "start":
+                    if name == "body" and not seen_body:
+                        body_depth = 1
+                        seen_body = True
+                    elif body_depth:
+                        body_depth += 1
+                    continue
 
-            text_parts.append(content)
+                if not body_depth:
+                    continue
+                body_depth -= 1
 
+                if name in ("head", "p"):
+                    content = " ".join(part.strip() for part in element.itertext() if part.strip())
+                    if name == "head":  # Section headers
+                        sections.append({"title": content, "paragraphs": []})
+                    else:
+                        if not sections:
+                            sections.append({"title": None, "paragraphs": []})
+                        sections[-1]["paragraphs"].append(content)
+                    element.clear()
+                if body_depth == 0:
+                    # Only the first <body> is extracted
+                    break
+        except ET.ParseError:
+            if not seen_body:
+                return []
+        return sections
+
+    @staticmethod
+    def sections_to_text(sections):
+        text_parts = []
+        for section in sections:
+            if section["title"] is not None:
+                text_parts.append(f"\n\n{section['title'].upper()}\n")  # Add formatting for section headers
+            text_parts.extend(section["paragraphs"])
         return "\n".join(text_parts).strip()
 
+    @staticmethod
+    def sections_to_clean_text(sections):
+        """
+        Cleaned text of the sections, as clean_pdf_text(sections_to_text(sections)) gives it, along
+        with where each section starts in it. Cleaning puts the whole text on one line, so the
+        headings can't be found in it afterwards; citation_analyzer.scan_citations takes these instead.
+
+        :return: (text, tuple of (start offset, title) pairs, one per titled section)
+        """
+        parts = []
+        headings = []
+        length = 0
+        for section in sections:
+            title = section["title"]
+            pieces = [title.upper()] if title is not None else []
+            for i, piece in enumerate(pieces + section["paragraphs"]):
+                piece = PDFParser.clean_pdf_text(piece)
+                if not piece:
+                    continue
+                if parts:
+                    length += 1  # the joining space
+                if i == 0 and title is not None:
+                    headings.append((length, title))
+                parts.append(piece)
+                length += len(piece)
+        return " ".join(parts), tuple(headings)
+
+    @staticmethod
+    def parse_tei_to_text(tei_xml):
+        """
+        Parses TEI XML returned by GROBID and extracts main text content.
+        """
+        return PDFParser.sections_to_text(PDFParser.parse_tei_sections(tei_xml))
+
     @staticmethod
     def clean_pdf_text(text):
         """
@@ -61,14 +191,10 @@ class PDFParser:
         and removing unwanted characters.
         """
         # Fix hyphenated words split across lines
-        text = re.sub(r"-\s*\n", "", text)  # Remove hyphens followed by a newline
-        text = re.sub(r"\n+", " ", text)    # Replace multiple newlines with a single space
-
-        # Normalize whitespace
-        text = re.sub(r"\s{2,}", " ", text)  # Replace multiple spaces with a single space
+        text = HYPHEN_BREAK.sub("", text)
 
         # Remove special characters and control characters (except common punctuation)
-        text = re.sub(r"[^\w\s.,;:'\"!?()\[\]{}—–\-]", "", text)
+        text = UNWANTED_CHARS.sub("", text)
 
-        # Strip leading/trailing whitespace
-        return text.strip()
\ No newline at end of file
+        # Newlines and whitespace runs become single spaces; this also strips both ends
+        return " ".join(text.split())
@@ -0,0 +1,68 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class GrobidClient:
+    def __init__(self, url, max_concurrency=4, retries=3, backoff=0.5, timeout=30):
+        """
+        GROBID client with a pooled keep-alive session, bounded concurrency and retries.
+
+        :param url: Full URL of GROBID's processFulltextDocument endpoint
+        :param max_concurrency: Maximum number of requests in flight at once (GROBID answers 503 when saturated)
+        :param retries: Retries for connection errors and 429/5xx answers
+        :param backoff: Exponential backoff factor in seconds between retries
+        :param timeout: Per-request timeout in seconds
+        """
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["POST"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def process_pdf(self, filename, data, mimetype="application/pdf"):
+        """
+        Sends one PDF (bytes or file-like object) to GROBID and returns the TEI XML as bytes.
+        """
+        files = {'input': (filename, data, mimetype)}
+        with self._slots:
+            try:
+                response = self.session.post(self.url, files=files, timeout=self.timeout)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                raise RuntimeError(f"GROBID request failed: {str(e)}")
+        return response.content
+
+    def process_many(self, pdfs):
+        """
+        Sends several PDFs to GROBID in parallel.
+
+        :param pdfs: List of (filename, bytes) tuples
+        :return: List with the TEI XML bytes or the raised exception for each PDF, in input order
+        """
+        def run(pdf):
+            try:
+                return self.process_pdf(*pdf)
+            except Exception as e:
+                return e
+
+        if not pdfs:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(pdfs))) as executor:
+            return list(executor.map(run, pdfs))
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,101 @@
+import logging
+import threading
+import time
+import traceback
+import uuid
+
+
+class JobQueue:
+    """
+    Runs long summarization jobs on a bounded pool of worker threads.
+
+    The queue itself lives in the 'jobs' table of HistoryDB, so queued jobs survive a restart
+    and several processes can share one queue. Handlers are registered per job kind and are
+    called as handler(job, report_progress); their return value becomes the job result.
+    """
+
+    def __init__(self, history_db, workers=2, poll_interval=1.0, retention_seconds=24 * 3600):
+        self.history_db = history_db
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self._handlers = {}
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._last_cleanup = 0.0
+
+    def register(self, kind, handler):
+        self._handlers[kind] = handler
+
+    def submit(self, kind, ip_address, params=None, input_text=None, input_filename=None, input_file=None):
+        """
+        Queues a job and returns its id immediately.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind '{kind}'.")
+        job_id = uuid.uuid4().hex
+        self.history_db.create_job(job_id, kind, ip_address, params, input_text, input_filename, input_file)
+        self._wakeup.set()
+        return job_id
+
+    def start(self, requeue=True):
+        """
+        Starts the worker threads. With several processes sharing the queue, only one of them
+        should requeue interrupted jobs (before the others start), so pass `requeue=False` elsewhere.
+        """
+        if self._threads:
+            return
+        if requeue:
+            self.requeue_interrupted()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def requeue_interrupted(self):
+        requeued = self.history_db.requeue_interrupted_jobs()
+        if requeued:
+            logging.info(f"Requeued {requeued} jobs interrupted by a restart")
+        return requeued
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._cleanup()
+            job = self.history_db.claim_next_job()
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._execute(job)
+
+    def _execute(self, job):
+        handler = self._handlers.get(job["kind"])
+
+        def report_progress(event):
+            self.history_db.append_job_progress(job["id"], event)
+
+        started = time.perf_counter()
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown job kind '{job['kind']}'.")
+            result = handler(job, report_progress)
+            self.history_db.finish_job(job["id"], result=result)
+            logging.info(f"Job {job['id']} ({job['kind']}) done in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            logging.error(f"Job {job['id']} ({job['kind']}) failed: {e}\n{traceback.format_exc()}")
+            # Some exceptions have no message (KeyError(), bare Exception()); the job still failed
+            self.history_db.finish_job(job["id"], error=str(e) or type(e).__name__)
+
+    def _cleanup(self):
+        now = time.time()
+        if now - self._last_cleanup < 60:
+            return
+        self._last_cleanup = now
+        deleted = self.history_db.delete_finished_jobs(now - self.retention_seconds)
+        if deleted:
+            logging.info(f"Deleted {deleted} jobs past the retention period")
@@ -0,0 +1,373 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Seconds; covers a citation scan (ms) up to a sectional summary of a long paper (minutes)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+# Stage durations of the current request, for the Server-Timing header; None outside a request
+_request_timings = ContextVar("request_timings", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _copy(self, value):
+        return value
+
+    def _merge(self, value, other):
+        return value + other
+
+    def snapshot(self):
+        """The current values as [label values, value] pairs that survive a JSON round trip."""
+        with self._lock:
+            return [[list(key), self._copy(value)] for key, value in self._values.items()]
+
+    def merged(self, snapshots):
+        """Label values -> value, adding up several snapshots of this metric."""
+        values = {}
+        for pairs in snapshots:
+            for key, value in pairs:
+                key = tuple(key)
+                values[key] = self._copy(value) if key not in values else self._merge(values[key], value)
+        return values
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self, others=()):
+        """Text exposition of this metric, with snapshots of it from other processes added in."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples(self.merged([self.snapshot(), *others])))
+        return lines
+
+    def _samples(self, values):
+        for key, value in values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), aggregate="sum"):
+        """
+        :param aggregate: How the values of several processes combine: "sum" for per-process
+                          quantities (requests in flight), "max" for ones they share (memory
+                          of models loaded before the fork)
+        """
+        super().__init__(name, documentation, labelnames)
+        self.aggregate = aggregate
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _merge(self, value, other):
+        return max(value, other) if self.aggregate == "max" else value + other
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per-bucket counts (not cumulative) plus +Inf, then sum and count
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def _copy(self, value):
+        counts, total, count = value
+        return [list(counts), total, count]
+
+    def _merge(self, value, other):
+        return [[a + b for a, b in zip(value[0], other[0])], value[1] + other[1], value[2] + other[2]]
+
+    def _samples(self, values):
+        for key, (counts, total, count) in values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), aggregate="sum"):
+        return self.register(Gauge(name, documentation, labelnames, aggregate))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self):
+        """Metric name -> values, for SnapshotDirectory."""
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def merge(self, snapshots, gauges=True):
+        """Adds up registry snapshots into one; without `gauges`, gauges are left out."""
+        merged = {}
+        for metric in self._metrics:
+            if gauges or metric.kind != "gauge":
+                values = metric.merged(snapshot.get(metric.name, []) for snapshot in snapshots)
+                merged[metric.name] = [[list(key), value] for key, value in values.items()]
+        return merged
+
+    def reset(self):
+        """Drops every value, e.g. the ones a forked worker inherited from the master."""
+        for metric in self._metrics:
+            metric.reset()
+
+    def render(self, others=()):
+        """
+        Prometheus text exposition format (version 0.0.4).
+        `others` are snapshots of other processes serving the same app, added in.
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render([other.get(metric.name, []) for other in others]))
+        return "\n".join(lines) + "\n"
+
+
+class SnapshotDirectory:
+    """
+    Metrics of a pre-fork server, one JSON snapshot per process in a directory they share.
+
+    Each worker keeps its own registry and writes it out every `interval` seconds and whenever it
+    answers /metrics, before adding up the other processes' files. A scrape then covers every
+    worker whichever one answers, and a counter never reads lower than in an earlier scrape.
+    The other workers' part can be up to `interval` seconds old. When a worker exits, the master
+    folds its counters and histograms into retired.json and drops its gauges.
+    """
+
+    RETIRED = "retired.json"
+
+    def __init__(self, path, registry):
+        self.path = path
+        self.registry = registry
+        os.makedirs(path, exist_ok=True)
+        self._writer = None
+        self._write_lock = threading.Lock()  # the writer thread and /metrics share the tmp file
+
+    def _file(self, pid):
+        return os.path.join(self.path, f"{pid}.json")
+
+    def _locked(self, operation):
+        """Readers list and read the files under a shared lock, so retiring a worker looks atomic."""
+        import fcntl  # serve.py only runs where fork does
+        lock_file = open(os.path.join(self.path, ".lock"), "a")
+        fcntl.flock(lock_file, getattr(fcntl, operation))
+        return lock_file
+
+    def _read(self, file_path):
+        try:
+            with open(file_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, file_path, snapshot):
+        # Readers never see a half-written file
+        tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, file_path)
+
+    def write(self):
+        """Writes this process's snapshot."""
+        with self._write_lock:
+            self._write(self._file(os.getpid()), self.registry.snapshot())
+
+    def others(self):
+        """Snapshots of every other process, exited workers included."""
+        own = os.path.basename(self._file(os.getpid()))
+        with self._locked("LOCK_SH"):
+            return [
+                self._read(os.path.join(self.path, filename))
+                for filename in os.listdir(self.path)
+                if filename.endswith(".json") and filename != own
+            ]
+
+    def render(self):
+        """/metrics across all processes."""
+        self.write()
+        return self.registry.render(self.others())
+
+    def retire(self, pid):
+        """Folds the snapshot of exited process `pid` into the retired total (master only)."""
+        path = self._file(pid)
+        with self._locked("LOCK_EX"):
+            if not os.path.exists(path):
+                return
+            retired_path = os.path.join(self.path, self.RETIRED)
+            retired = self.registry.merge([self._read(retired_path), self._read(path)], gauges=False)
+            self._write(retired_path, retired)
+            os.remove(path)
+
+    def clear(self):
+        """Removes the snapshots of an earlier run (master only, before forking)."""
+        with self._locked("LOCK_EX"):
+            for filename in os.listdir(self.path):
+                if filename.endswith((".json", ".tmp")):
+                    os.remove(os.path.join(self.path, filename))
+
+    def start(self, interval):
+        """Writes this process's snapshot every `interval` seconds on a daemon thread."""
+        def run():
+            while True:
+                time.sleep(interval)
+                self.write()
+
+        self._writer = threading.Thread(target=run, name="metrics-snapshots", daemon=True)
+        self._writer.start()
+
+
+metrics = MetricsRegistry()
+
+stage_seconds = metrics.histogram(
+    "summarizer_stage_duration_seconds", "Time spent in each pipeline stage.", ["stage"]
+)
+request_seconds = metrics.histogram(
+    "summarizer_http_request_duration_seconds", "HTTP request latency.", ["endpoint", "method", "status"]
+)
+generate_input_tokens = metrics.histogram(
+    "summarizer_generate_input_tokens", "Input tokens per sequence passed to generate.", ["model"], TOKEN_BUCKETS
+)
+generate_output_tokens = metrics.histogram(
+    "summarizer_generate_output_tokens", "Generated tokens per sequence.", ["model"], TOKEN_BUCKETS
+)
+generate_batch_size = metrics.histogram(
+    "summarizer_generate_batch_size", "Sequences per generate call.", ["model"], BATCH_BUCKETS
+)
+model_load_seconds = metrics.histogram(
+    "summarizer_model_load_seconds", "Time to load a model into memory.", ["model"]
+)
+model_evictions = metrics.counter(
+    "summarizer_model_evictions_total", "Models evicted to stay within the memory budget.", ["model"]
+)
+models_loaded_bytes = metrics.gauge(
+    "summarizer_models_loaded_bytes", "Estimated memory of the loaded models.", aggregate="max"
+)
+time_to_first_token = metrics.histogram(
+    "summarizer_time_to_first_token_seconds", "Time from request to the first streamed summary token.", ["model"]
+)
+cache_requests = metrics.counter(
+    "summarizer_cache_requests_total", "Result cache lookups by outcome.", ["namespace", "result"]
+)
+admission_active = metrics.gauge(
+    "summarizer_admission_active", "Slots held by admitted requests, per model.", ["model"]
+)
+admission_queue_depth = metrics.gauge(
+    "summarizer_admission_queue_depth", "Requests waiting for a slot, per model.", ["model"]
+)
+admission_shed = metrics.counter(
+    "summarizer_admission_shed_total", "Requests turned away before any model work, by reason.", ["model", "reason"]
+)
+admission_wait_seconds = metrics.histogram(
+    "summarizer_admission_wait_seconds", "Time admitted requests waited for a slot.", ["model"]
+)
+deadline_aborts = metrics.counter(
+    "summarizer_deadline_aborts_total", "Requests whose model work was cut short by their deadline.", ["model"]
+)
+
+
+def record_timing(stage, seconds):
+    stage_seconds.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage):
+    """Times the block into the stage histogram and the current request's Server-Timing breakdown."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(stage, time.perf_counter() - started)
+
+
+def start_request_timings():
+    """Starts collecting stage timings for the current request; returns a token for `end_request_timings`."""
+    return _request_timings.set({})
+
+
+def end_request_timings(token):
+    _request_timings.reset(token)
+
+
+def request_timings():
+    return _request_timings.get()
+
+
+def server_timing_header(timings, total_seconds=None):
+    """Formats stage timings as a Server-Timing header value, e.g. 'ner;dur=12.5, total;dur=80.1'."""
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+    if total_seconds is not None:
+        entries.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(entries)
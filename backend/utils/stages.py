@@ -0,0 +1,63 @@
+import contextvars
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+
+# Shared by all requests so concurrent requests can't oversubscribe the CPU with threads
+stage_executor = ThreadPoolExecutor(max_workers=Config.STAGE_WORKERS, thread_name_prefix="stage")
+
+# Stages that run torch inference and compete for intra-op threads
+MODEL_STAGES = 2
+
+
+def in_worker_process():
+    """
+    True inside multiprocessing pool workers. Spawned workers re-import the main module,
+    so startup side effects (preloading models, starting job workers) check this first.
+    """
+    return multiprocessing.current_process().name != "MainProcess"
+
+
+def configure_torch_threads(parallel=Config.PARALLEL_STAGES, cores=None):
+    """
+    Splits torch intra-op threads between the model stages (summary and NER) when they run
+    concurrently, so two forward passes don't each try to use every core.
+
+    :param cores: Cores available to this process (default: all of them)
+    """
+    import torch
+
+    cores = cores or os.cpu_count() or 1
+    threads = Config.TORCH_THREADS or (max(1, cores // MODEL_STAGES) if parallel else cores)
+    torch.set_num_threads(threads)
+    return threads
+
+
+def run_stages(stages, parallel=Config.PARALLEL_STAGES):
+    """
+    Runs independent stages and waits for all of them.
+
+    :param stages: Dict of stage name -> zero-argument callable
+    :param parallel: Run the stages on the shared executor instead of one after another
+    :return: (dict of stage name -> result, dict of stage name -> duration in ms)
+    """
+    timings = {}
+
+    def timed(name, fn):
+        started = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            timings[name] = round((time.perf_counter() - started) * 1000, 2)
+
+    if not parallel:
+        return {name: timed(name, fn) for name, fn in stages.items()}, timings
+
+    # Each stage runs in a copy of the caller's context so per-request metrics follow it to the executor
+    futures = {
+        name: stage_executor.submit(contextvars.copy_context().run, timed, name, fn)
+        for name, fn in stages.items()
+    }
+    return {name: future.result() for name, future in futures.items()}, timings
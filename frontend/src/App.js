@@ -1,5 +1,5 @@
 import React, { useState, useEffect, useRef } from 'react';
-import { getHistory } from './utils/api';
+import { getHistory, getHistoryItem } from './utils/api';
 import { SunIcon, MoonIcon } from '@heroicons/react/24/solid';
 import ModelDropdown from './components/ModelDropdown';
 
@@ -13,6 +13,7 @@ function App() {
   const [isSidebarOpen, setIsSidebarOpen] = useState(false);
   const [isCitationBarOpen, setIsCitationBarOpen] = useState(false);
   const [history, setHistory] = useState([]);
+  const [historyCursor, setHistoryCursor] = useState(null); // Cursor of the next history page, null on the last
   const [selectedHistory, setSelectedHistory] = useState(null);
   const [citationData, setCitationData] = useState(null);
   const [entities, setEntities] = useState([]);
@@ -124,14 +125,50 @@ function App() {
 
   const fetchHistory = async () => {
     try {
-      const historyData = await getHistory();
+      const { history: historyData, nextCursor } = await getHistory();
       setHistory(historyData);
+      setHistoryCursor(nextCursor);
     } catch (error) {
       setAlertMessage('Failed to fetch history. Please try again.');
       setShowAlert(true);
     }
   };
 
+  const loadMoreHistory = async () => {
+    try {
+      const { history: historyData, nextCursor } = await getHistory(historyCursor);
+      setHistory((prevHistory) => [...prevHistory, ...historyData]);
+      setHistoryCursor(nextCursor);
+    } catch (error) {
+      setAlertMessage('Failed to fetch history. Please try again.');
+      setShowAlert(true);
+    }
+  };
+
+  // The history list carries only previews; the full entry is fetched when it is opened
+  const openHistoryItem = async (item) => {
+    try {
+      const fullItem = await getHistoryItem(item.id);
+      setInputText(fullItem.original_text);
+      if (fullItem.section_summaries) {
+        setSectionSummary(Object.values(fullItem.section_summaries));
+        setResponseText('');
+        setUseSectional(true);
+      } else {
+        setResponseText(fullItem.summary);
+        setSectionSummary([]);
+        setUseSectional(false);
+      }
+      setSelectedHistory(item);
+      setCitationData(fullItem.citations ? JSON.parse(fullItem.citations) : []);
+      setEntities(fullItem.entities ? JSON.parse(fullItem.entities) : []);
+      setIsSidebarOpen(false);
+    } catch (error) {
+      setAlertMessage('Failed to open history item. Please try again.');
+      setShowAlert(true);
+    }
+  };
+
   const truncateText = (text) => {
     if (!text) return '';
     const firstSentence = text.split(/[.!?]/)[0];
@@ -143,6 +180,7 @@ function App() {
       const response = await fetch('http://localhost:5000/clear-history', { method: 'DELETE' });
       if (!response.ok) throw new Error(`HTTP error! Status: ${response.status}`);
       setHistory([]);
+      setHistoryCursor(null);
       setAlertMessage('History cleared successfully!');
       setShowAlert(true);
     } catch (error) {
@@ -263,22 +301,7 @@ function App() {
               className={`relative group border dark:border-gray-700 p-4 rounded-lg transition-colors duration-300 cursor-pointer ${
                 selectedHistory === item ? 'bg-indigo-100 dark:bg-indigo-900' : 'bg-gray-50 dark:bg-gray-700'
               } hover:bg-indigo-100 dark:hover:bg-indigo-800`}
-              onClick={() => {
-                setInputText(item.original_text);
-                if (item.section_summaries) {
-                  setSectionSummary(Object.values(item.section_summaries));
-                  setResponseText('');
-                  setUseSectional(true);
-                } else {
-                  setResponseText(item.summary);
-                  setSectionSummary([]);
-                  setUseSectional(false);
-                }
-                setSelectedHistory(item);
-                setCitationData(item.citations ? JSON.parse(item.citations) : []);
-                setEntities(item.entities ? JSON.parse(item.entities) : []);
-                setIsSidebarOpen(false);
-              }}
+              onClick={() => openHistoryItem(item)}
             >
               {/* Delete Button */}
               <button
@@ -294,7 +317,7 @@ function App() {
               {/* Content */}
               <strong className="transition-colors duration-300">Original Text:</strong>{' '}
               <span className="block text-sm text-gray-700 dark:text-gray-200 line-clamp-2 transition-colors duration-300">
-                {truncateText(item.original_text)}
+                {truncateText(item.preview)}
               </span>
               <strong className="transition-colors duration-300">Summary:</strong>{' '}
               <span className="block text-sm text-gray-700 dark:text-gray-200 line-clamp-2 mt-2 transition-colors duration-300">
@@ -307,6 +330,14 @@ function App() {
           ))}
         </ul>
       )}
+      {historyCursor && (
+        <button
+          onClick={loadMoreHistory}
+          className="w-full mt-4 bg-gray-200 dark:bg-gray-700 text-gray-800 dark:text-gray-100 px-3 py-1 rounded-md text-sm hover:bg-gray-300 dark:hover:bg-gray-600 transition-colors duration-300"
+        >
+          Load More
+        </button>
+      )}
     </div>
   </aside>
   {/* Main Content */}
@@ -1,10 +1,13 @@
 import React from "react";
+import { getHistoryItem } from "../utils/api";
 
 function Sidebar({
   isSidebarOpen,
   setIsSidebarOpen,
   history,
   setHistory,
+  hasMoreHistory,
+  loadMoreHistory,
   selectedHistory,
   setSelectedHistory,
   setInputText,
@@ -28,6 +31,29 @@ function Sidebar({
     }
   };
 
+  // The history list carries only previews; the full entry is fetched when it is opened
+  const openHistoryItem = async (item) => {
+    try {
+      const fullItem = await getHistoryItem(item.id);
+      setInputText(fullItem.original_text);
+      if (fullItem.section_summaries) {
+        setSectionSummary(Object.values(fullItem.section_summaries));
+        setResponseText("");
+        setUseSectional(true);
+      } else {
+        setResponseText(fullItem.summary);
+        setSectionSummary([]);
+        setUseSectional(false);
+      }
+      setSelectedHistory(item);
+      setCitationData(fullItem.citations ? JSON.parse(fullItem.citations) : []);
+      setEntities(fullItem.entities ? JSON.parse(fullItem.entities) : []);
+      setIsSidebarOpen(false);
+    } catch {
+      alert("Failed to open history item. Please try again.");
+    }
+  };
+
   const deleteHistoryItem = async (itemId) => {
     try {
       const res = await fetch(`http://localhost:5000/history/${itemId}`, { method: "DELETE" });
@@ -68,22 +94,7 @@ function Sidebar({
                 className={`relative group border dark:border-gray-700 p-4 rounded-lg transition-colors cursor-pointer ${
                   selectedHistory === item ? "bg-indigo-100 dark:bg-indigo-900" : "bg-gray-50 dark:bg-gray-700"
                 } hover:bg-indigo-100 dark:hover:bg-indigo-800`}
-                onClick={() => {
-                  setInputText(item.original_text);
-                  if (item.section_summaries) {
-                    setSectionSummary(Object.values(item.section_summaries));
-                    setResponseText("");
-                    setUseSectional(true);
-                  } else {
-                    setResponseText(item.summary);
-                    setSectionSummary([]);
-                    setUseSectional(false);
-                  }
-                  setSelectedHistory(item);
-                  setCitationData(item.citations ? JSON.parse(item.citations) : []);
-                  setEntities(item.entities ? JSON.parse(item.entities) : []);
-                  setIsSidebarOpen(false);
-                }}
+                onClick={() => openHistoryItem(item)}
               >
                 <button
                   onClick={(e) => {
@@ -96,7 +107,7 @@ function Sidebar({
                   &times;
                 </button>
                 <strong>Original Text:</strong>{" "}
-                <span className="block text-sm line-clamp-2">{item.original_text}</span>
+                <span className="block text-sm line-clamp-2">{item.preview}</span>
                 <strong>Summary:</strong>{" "}
                 <span className="block text-sm line-clamp-2 mt-2">{item.summary}</span>
                 <small className="block mt-2 text-xs text-gray-500 dark:text-gray-400">
@@ -106,6 +117,14 @@ function Sidebar({
             ))}
           </ul>
         )}
+        {hasMoreHistory && (
+          <button
+            onClick={loadMoreHistory}
+            className="w-full bg-gray-200 dark:bg-gray-700 py-2 rounded-lg hover:bg-gray-300 dark:hover:bg-gray-600"
+          >
+            Load More
+          </button>
+        )}
       </div>
     </aside>
   );
@@ -28,24 +28,51 @@ export const summarizeText = async (formData, useSectional) => {
   }
 };
 
+// Entries per history page (the backend caps it at HISTORY_MAX_PAGE_SIZE)
+const HISTORY_PAGE_SIZE = 50;
+
 /**
- * Fetches the history of summaries from the backend.
- * @returns {Promise<Array>} - An array of history items.
+ * Fetches one page of history, newest first, without the original texts, citations and entities;
+ * open an entry with getHistoryItem to get those.
+ * @param {string|null} cursor - `nextCursor` of the previous page, or null for the first page.
+ * @returns {Promise<Object>} - `{ history, nextCursor }`; nextCursor is null on the last page.
  */
-export const getHistory = async () => {
+export const getHistory = async (cursor = null) => {
   try {
-    const response = await fetch(`${API_BASE_URL}/history`);
+    const params = new URLSearchParams({ limit: HISTORY_PAGE_SIZE, fields: 'list' });
+    if (cursor) {
+      params.set('cursor', cursor);
+    }
+    const response = await fetch(`${API_BASE_URL}/history?${params}`);
     if (!response.ok) {
       throw new Error(`HTTP error! Status: ${response.status}`);
     }
     const result = await response.json();
-    return result.history || [];
+    return { history: result.history || [], nextCursor: result.next_cursor || null };
   } catch (error) {
     console.error('Error fetching history:', error);
     throw error;
   }
 };
 
+/**
+ * Fetches a single history entry with its original text, citations and entities.
+ * @param {number} itemId - The id of the history entry.
+ * @returns {Promise<Object>} - The full history item.
+ */
+export const getHistoryItem = async (itemId) => {
+  try {
+    const response = await fetch(`${API_BASE_URL}/history/${itemId}`);
+    if (!response.ok) {
+      throw new Error(`HTTP error! Status: ${response.status}`);
+    }
+    return await response.json();
+  } catch (error) {
+    console.error('Error fetching history item:', error);
+    throw error;
+  }
+};
+
 /**
  * Analyzes citations from the provided form data.
  * @param {FormData} formData - The form data containing text/file.